@@ -1,4 +1,7 @@
-from typing import Dict
+import gc
+import logging
+import time
+from typing import Dict, List
 
 import os
 from src.helper.util import disable_tqdm
@@ -8,8 +11,23 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from transformers import SeamlessM4TTokenizer, SeamlessM4Tv2ForTextToText
 
 from src.helper.config import CONFIG
+from src.helper.translation_cache import TranslationCache
 from src.helper.types.translation_consts import LANGUAGE_MAP, POSSIBLE_LANGUAGES
 
+LOGGER = logging.getLogger(__name__)
+
+# Padded input tokens of a translation batch, i.e. batch size times longest input
+DEFAULT_BATCH_TOKENS = 4096
+
+# Seconds without a translation after which the model is unloaded
+DEFAULT_IDLE_UNLOAD_SECONDS = 600
+
+DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
+
 
 def check_language_supported_guard(language: str):
     language = LANGUAGE_MAP[language] if language in LANGUAGE_MAP else language
@@ -20,25 +38,127 @@ def check_language_supported_guard(language: str):
         )
 
 
+def create_translation_cache() -> TranslationCache | None:
+    """Creates the translation cache of the config, None if it is disabled."""
+    if CONFIG["translation_cache_size_mb"] <= 0:
+        return None
+    return TranslationCache(
+        os.path.join(os.getcwd(), CONFIG["translation_cache_path"]),
+        max_memory_entries=CONFIG["translation_cache_memory_entries"],
+        max_size_bytes=CONFIG["translation_cache_size_mb"] * 1024 * 1024,
+        ttl_seconds=CONFIG["translation_cache_ttl_hours"] * 3600,
+    )
+
+
+def resolve_dtype(device: str, dtype: str, quantization: str) -> torch.dtype:
+    """
+    Returns the torch dtype to load the model in, falls back to a supported one.
+
+    float16 is only used on cuda, bfloat16 on CPUs and on GPUs that support it. The
+    int8 quantization is only available on CPU and needs the float32 weights.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported translation_dtype: {dtype}")
+    if quantization not in ["none", "int8"]:
+        raise ValueError(f"Unsupported translation_quantization: {quantization}")
+    if quantization == "int8":
+        if not device.startswith("cpu"):
+            raise ValueError("translation_quantization int8 is only supported on cpu")
+        if dtype != "float32":
+            LOGGER.warning(f"Quantizing the translation model, ignoring {dtype}")
+        return torch.float32
+    if dtype == "float16" and not device.startswith("cuda"):
+        LOGGER.warning("float16 is only supported on cuda, using float32")
+        return torch.float32
+    if (
+        dtype == "bfloat16"
+        and device.startswith("cuda")
+        and not torch.cuda.is_bf16_supported()
+    ):
+        LOGGER.warning("bfloat16 is not supported by the GPU, using float16")
+        return torch.float16
+    return DTYPES[dtype]
+
+
 class Translator:
+    """
+    Translates texts with SeamlessM4T.
+
+    The model is loaded on first use and unloaded again by `unload_if_idle` after
+    `translation_idle_unload_seconds` without a translation, so runners that rarely
+    translate do not keep it in memory. It is loaded in `translation_dtype`, on CPU
+    its linear layers can be quantized to int8 instead (`translation_quantization`).
+    """
+
     def __init__(self, config: Dict[str, str]):
-        full_model_path = os.path.join(os.getcwd(), CONFIG["model_path"])
         self.device: str = (
             f"cuda:{config['device_index']}"
             if config["translation_device"] == "cuda"
             else config["translation_device"]
         )
+        self.model_name: str = config["translation_model"]
+        self.quantization: str = config.get("translation_quantization", "none")
+        self.dtype = resolve_dtype(
+            self.device,
+            config.get("translation_dtype", "float32"),
+            self.quantization,
+        )
+        # Translations of another precision may differ, they are cached apart
+        self.cache_model: str = (
+            f"{self.model_name}:{str(self.dtype).removeprefix('torch.')}"
+            + f":{self.quantization}"
+        )
+        self.idle_unload_seconds: float = config.get(
+            "translation_idle_unload_seconds", DEFAULT_IDLE_UNLOAD_SECONDS
+        )
+        self.batch_tokens: int = config.get(
+            "translation_batch_tokens", DEFAULT_BATCH_TOKENS
+        )
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=512)
+        self.cache = create_translation_cache()
+        self.tokenizer: SeamlessM4TTokenizer | None = None
+        self.model: SeamlessM4Tv2ForTextToText | None = None
+        self.last_used = time.monotonic()
+
+    def load(self) -> None:
+        """Loads the tokenizer and the model if they are not loaded."""
+        self.last_used = time.monotonic()
+        if self.model is not None:
+            return
+        full_model_path = os.path.join(os.getcwd(), CONFIG["model_path"])
+        LOGGER.info(
+            f"Loading translation model {self.model_name} ({self.dtype}, "
+            + f"quantization {self.quantization}) on {self.device}"
+        )
         with disable_tqdm():
-            self.tokenizer = SeamlessM4TTokenizer.from_pretrained(
-                config["translation_model"],
-                cache_dir=full_model_path
+            if self.tokenizer is None:
+                self.tokenizer = SeamlessM4TTokenizer.from_pretrained(
+                    self.model_name, cache_dir=full_model_path
+                )
+            model = SeamlessM4Tv2ForTextToText.from_pretrained(
+                self.model_name, cache_dir=full_model_path, torch_dtype=self.dtype
             )
-            self.model = SeamlessM4Tv2ForTextToText.from_pretrained(
-                config["translation_model"], cache_dir=full_model_path
+
+        model.config.max_new_tokens = 512
+        model.eval()
+        if self.quantization == "int8":
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
             )
+        self.model = model.to(self.device)
 
-        self.model.config.max_new_tokens = 512
-        self.model.to(self.device)
+    def unload_if_idle(self) -> bool:
+        """Unloads the model if it was not used for `idle_unload_seconds`."""
+        if self.model is None or self.idle_unload_seconds <= 0:
+            return False
+        if time.monotonic() - self.last_used < self.idle_unload_seconds:
+            return False
+        LOGGER.info(f"Unloading idle translation model {self.model_name}")
+        self.model = None
+        gc.collect()
+        if self.device.startswith("cuda"):
+            torch.cuda.empty_cache()
+        return True
 
     def translate_text(self, text: str, from_code: str, to_code: str) -> str:
         """
@@ -52,9 +172,14 @@ class Translator:
         Returns:
             str: The translated text.
         """
+        cached = self._get_cached([text], from_code, to_code)
+        if text in cached:
+            # Records the use of the cached translation
+            self._store({}, from_code, to_code)
+            return cached[text]
         try:
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=512)
-            text_splitted: list[str] = text_splitter.split_text(text)
+            self.load()
+            text_splitted: list[str] = self.text_splitter.split_text(text)
             translated_chunks: list[str] = []
             for chunk in text_splitted:
                 inputs = self.tokenizer(
@@ -72,9 +197,132 @@ class Translator:
                 )[0]
                 translated_chunks.append(translated_text)
 
-            return " ".join(translated_chunks)
+            translated = " ".join(translated_chunks)
+            self._store({text: translated}, from_code, to_code)
+            return translated
 
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error during translation: {e}"
             )
+        finally:
+            # A long translation counts as use until it finishes
+            self.last_used = time.monotonic()
+
+    def translate_batch(
+        self, texts: List[str], from_code: str, to_code: str
+    ) -> List[str]:
+        """
+        Translates several texts, e.g. the segments of a transcript, in batches.
+
+        The chunks of all texts are sorted by their token length and packed into
+        batches of at most `batch_tokens` padded tokens, so similar lengths are
+        translated together with little padding. Texts in the translation cache are
+        not translated again.
+
+        Parameters:
+            texts (List[str]): The texts to translate.
+            from_code (str): The code of the origin language (e.g., 'en' for English).
+            to_code (str): The code of the target language (e.g., 'de' for German).
+
+        Returns:
+            List[str]: The translated texts in the order of `texts`.
+        """
+        # Texts that occur several times, e.g. repeated phrases, are translated once
+        unique_texts = list(dict.fromkeys(texts))
+        translated = self._get_cached(unique_texts, from_code, to_code)
+        missing = [text for text in unique_texts if text not in translated]
+
+        new_translations: Dict[str, str] = {}
+        if missing:
+            new_translations = dict(
+                zip(missing, self._translate_batch(missing, from_code, to_code))
+            )
+            translated.update(new_translations)
+        # One write for the new translations and the use of the cached ones
+        self._store(new_translations, from_code, to_code)
+        return [translated[text] for text in texts]
+
+    def _translate_batch(
+        self, texts: List[str], from_code: str, to_code: str
+    ) -> List[str]:
+        """Translates the texts without the cache, see `translate_batch`."""
+        try:
+            chunks: list[str] = []
+            chunk_owners: list[int] = []
+            for index, text in enumerate(texts):
+                for chunk in self.text_splitter.split_text(text):
+                    chunks.append(chunk)
+                    chunk_owners.append(index)
+
+            if not chunks:
+                return [""] * len(texts)
+
+            self.load()
+            src_lang = LANGUAGE_MAP[from_code]
+            token_ids = self.tokenizer(chunks, src_lang=src_lang)["input_ids"]
+            lengths = [len(input_ids) for input_ids in token_ids]
+
+            translated_chunks: list[str] = [""] * len(chunks)
+            for batch in pack_batches(lengths, self.batch_tokens):
+                inputs = self.tokenizer(
+                    [chunks[i] for i in batch],
+                    return_tensors="pt",
+                    padding=True,
+                    src_lang=src_lang,
+                ).to(self.device)
+
+                with torch.no_grad():
+                    outputs = self.model.generate(
+                        **inputs, tgt_lang=LANGUAGE_MAP[to_code]
+                    )
+                decoded = self.tokenizer.batch_decode(
+                    outputs, skip_special_tokens=True
+                )
+                for i, translated_text in zip(batch, decoded):
+                    translated_chunks[i] = translated_text
+
+            translated_texts: list[list[str]] = [[] for _ in texts]
+            for owner, translated_text in zip(chunk_owners, translated_chunks):
+                translated_texts[owner].append(translated_text)
+            return [" ".join(parts) for parts in translated_texts]
+
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=f"Error during translation: {e}"
+            )
+        finally:
+            # A long translation counts as use until it finishes
+            self.last_used = time.monotonic()
+
+    def _get_cached(
+        self, texts: List[str], from_code: str, to_code: str
+    ) -> Dict[str, str]:
+        if self.cache is None:
+            return {}
+        return self.cache.get_many(texts, from_code, to_code, self.cache_model)
+
+    def _store(self, translations: Dict[str, str], from_code: str, to_code: str):
+        if self.cache is not None:
+            self.cache.put_many(translations, from_code, to_code, self.cache_model)
+
+
+def pack_batches(lengths: List[int], max_tokens: int) -> List[List[int]]:
+    """
+    Packs the indices of inputs with the given token lengths into batches.
+
+    The inputs are sorted by length, a batch is closed before its padded size, i.e.
+    its size times its longest input, exceeds `max_tokens`. An input that is longer
+    than `max_tokens` gets a batch of its own.
+    """
+    batches: list[list[int]] = []
+    batch: list[int] = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted ascending, so the new input is the longest of the batch
+        if batch and (len(batch) + 1) * lengths[index] > max_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
@@ -1,13 +1,19 @@
+import bisect
 import json
 import logging
 import os
+from typing import List
 
+import numpy as np
 from fastapi import HTTPException
 
 from src.helper.types.transcription_data import Segment, Transcript, Word
 
 LOGGER = logging.getLogger(__name__)
 
+# Words (original and translated) from which the word mapping uses NumPy
+VECTORIZE_MIN_WORDS = 256
+
 
 def align_segments(original_transcript: Transcript, translated_text: str) -> Transcript:
     """
@@ -21,108 +27,86 @@ def align_segments(original_transcript: Transcript, translated_text: str) -> Tra
     If multiple translated words map to the same original word, they are combined.
     """
 
-    # Gather *all* original words into a flat list (tracking where they came from).
-    flat_words = []
-    for segment_index, seg in enumerate(original_transcript["segments"]):
-        for word_index, w in enumerate(seg["words"]):
-            flat_words.append((segment_index, word_index, w))
+    word_count = sum(len(seg["words"]) for seg in original_transcript["segments"])
 
-    if not flat_words or not translated_text.strip():
+    if not word_count or not translated_text.strip():
         raise HTTPException(
             status_code=400,
             detail="Alignment not possible without translation or transcript",
         )
 
     translated_words = translated_text.split()
+    # Translated words of the i-th original word: word_bounds[i]:word_bounds[i + 1]
+    word_bounds = proportional_word_bounds(word_count, len(translated_words))
 
-    N = len(flat_words)
-    M = len(translated_words)
-
-    # We'll store, for each original word i, a list of translated words assigned.
-    aligned_words_per_word = [[] for _ in range(N)]
-
-    # Walk through original words (i) and translated words (j) in parallel.
-    i = 0  # index for original words
-    j = 0  # index for translated words
-
-    # A function to get the fraction range of i-th original word => [i/N, (i+1)/N)
-    def original_range(i):
-        return (i / N, (i + 1) / N)
-
-    # A function to get the fraction range of j-th translated word => [j/M, (j+1)/M)
-    def translated_range(j):
-        return (j / M, (j + 1) / M)
-
-    while i < N and j < M:
-        i_start, i_end = original_range(i)
-        j_start, j_end = translated_range(j)
-
-        # Overlap is the intersection of [i_start, i_end) and [j_start, j_end)
-        overlap_start = max(i_start, j_start)
-        overlap_end = min(i_end, j_end)
-        overlap = overlap_end - overlap_start
-
-        if overlap > 0:
-            aligned_words_per_word[i].append(translated_words[j])
-            j += 1
-
-        # Whichever fraction ends first, we advance that pointer
-        if i_end <= j_end:
-            i += 1
-        if i_end >= j_end and overlap <= 0:
-            j += 1
-
-    new_transcript = Transcript(text=translated_text, segments=[])
-
-    # Initialize new segments
-    for seg in original_transcript["segments"]:
-        new_segment = Segment(text="", start=seg["start"], end=seg["end"], words=[])
-        new_transcript["segments"].append(new_segment)
-
-    # Fill words
+    # Segments are built in a single pass, empty ones are squashed into the previous
+    segments = []
+    idx = 0
     pending_start_time = None
-    for idx, (segment_index, word_index, old_word) in enumerate(flat_words):
-        new_word_text = " ".join(aligned_words_per_word[idx])
-
-        # If first word is empty, store its start time for the next word
-        if (
-            not new_word_text
-            and len(new_transcript["segments"][segment_index]["words"]) == 0
-        ):
-            pending_start_time = old_word["start"]
+    for seg in original_transcript["segments"]:
+        words = []
+        for old_word in seg["words"]:
+            first, last = word_bounds[idx], word_bounds[idx + 1]
+            idx += 1
+            if first == last:
+                if not words:
+                    # If first word is empty, store its start time for the next word
+                    pending_start_time = old_word["start"]
+                else:
+                    # if word exists prior, replace prior end with this end
+                    words[-1]["end"] = old_word["end"]
+                continue
+
+            words.append(
+                Word(
+                    text=" ".join(translated_words[first:last]),
+                    start=(
+                        pending_start_time if pending_start_time else old_word["start"]
+                    ),
+                    end=old_word["end"],
+                    probability=old_word["probability"],
+                )
+            )
+            pending_start_time = None  # Reset after applying
+
+        if segments and not words:
+            segments[-1]["end"] = seg["end"]
             continue
+        segments.append(
+            Segment(
+                text=" ".join(word["text"] for word in words),
+                start=seg["start"],
+                end=seg["end"],
+                words=words,
+            )
+        )
 
-        # if word exists prior, replace prior end with this end
-        if not new_word_text and word_index > 0:
-            new_transcript["segments"][segment_index]["words"][-1]["end"] = old_word[
-                "end"
-            ]
-            continue
+    return Transcript(text=translated_text, segments=segments)
 
-        new_word = Word(
-            text=new_word_text,
-            start=pending_start_time if pending_start_time else old_word["start"],
-            end=old_word["end"],
-            probability=old_word["probability"],
-        )
-        pending_start_time = None  # Reset after applying
-        new_transcript["segments"][segment_index]["words"].append(new_word)
-
-    # Fix segment texts
-    for seg in new_transcript["segments"]:
-        seg["text"] = " ".join(word["text"] for word in seg["words"] if word["text"])
-
-    # Squash segments in place (back to front)
-    i = len(new_transcript["segments"]) - 1  # Start from the end
-    while i > 0:
-        if not new_transcript["segments"][i]["text"]:
-            new_transcript["segments"][i - 1]["end"] = new_transcript["segments"][i][
-                "end"
-            ]
-            del new_transcript["segments"][i]
-        i -= 1
-
-    return new_transcript
+
+def proportional_word_bounds(original_count: int, translated_count: int) -> List[int]:
+    """
+    Maps the translated words to the original words by their relative position.
+
+    The i-th of N original words covers the fraction [i/N, (i+1)/N) of the text, the
+    j-th of M translated words [j/M, (j+1)/M). A translated word belongs to the first
+    original word it overlaps, i.e. the first one that ends after j/M. As the words
+    are in order, the translated words of original word i are
+    `translated_words[bounds[i]:bounds[i + 1]]` of the returned bounds.
+    """
+    if original_count + translated_count < VECTORIZE_MIN_WORDS:
+        # The same fractions in plain Python, NumPy only pays off for long texts
+        ends = [(i + 1) / original_count for i in range(original_count)]
+        owners = [
+            bisect.bisect_right(ends, j / translated_count)
+            for j in range(translated_count)
+        ]
+        return [bisect.bisect_left(owners, i) for i in range(original_count + 1)]
+
+    original_ends = np.arange(1, original_count + 1) / original_count
+    translated_starts = np.arange(translated_count) / translated_count
+    owners = np.searchsorted(original_ends, translated_starts, side="right")
+    return np.searchsorted(owners, np.arange(original_count + 1), side="left").tolist()
 
 
 def load_status_file(file_path: str) -> dict:
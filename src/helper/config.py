@@ -22,21 +22,53 @@ class RestRunnerConfigResponse(BaseModel):
     device_index: int
     num_workers: int
     cpu_threads: int
+    max_loaded_models: int | None = None
+    model_memory_budget_mb: int | None = None
+    model_switch_cost_seconds: int | None = None
+    max_job_wait_seconds: int | None = None
     translation_enabled: bool
     translation_model: str
     translation_device: str
+    translation_batch_tokens: int | None = None
+    translation_dtype: str | None = None
+    translation_quantization: str | None = None
+    translation_idle_unload_seconds: int | None = None
+
+
+class TranslationWorkerConfigResponse(BaseModel):
+    translation_model: str
+    translation_device: str
+    device_index: int | None = None
+    concurrency: int | None = None
+    translation_batch_tokens: int | None = None
+    translation_dtype: str | None = None
+    translation_quantization: str | None = None
+    translation_idle_unload_seconds: int | None = None
 
 
 class WebsocketStreamDeviceConfigResponse(BaseModel):
     active: bool
     model: WhisperModels
-    device_index: int
+    device_index: int | List[int]
     worker_seats: int
+    transcription_mode: str | None = None
+    batch_size: int | None = None
+    batch_wait_ms: int | None = None
+
+
+class WebsocketStreamVadConfigResponse(BaseModel):
+    active: bool
+    threshold: float | None = None
+    min_silence_duration_ms: int | None = None
 
 
 class WebsocketStreamConfigResponse(BaseModel):
     cpu: WebsocketStreamDeviceConfigResponse
     cuda: WebsocketStreamDeviceConfigResponse
+    export_audio: bool = True
+    max_queue_size: int | None = None
+    workers: List[dict] | None = None
+    vad: WebsocketStreamVadConfigResponse | None = None
 
 
 class TranscriptionDefaultConfigResponse(BaseModel):
@@ -49,11 +81,19 @@ class ConfigResponse(BaseModel):
     log_level: str
     rest_runner: List[RestRunnerConfigResponse]
     rest_models: List[WhisperModels]
+    translation_workers: List[TranslationWorkerConfigResponse] | None = None
     websocket_stream: WebsocketStreamConfigResponse
     rest_port: int
     websocket_port: int
     host: str
     status_file_path: str
+    job_index_path: str
+    job_lease_seconds: int
+    status_fsync_mode: str
+    upload_conversion_workers: int
+    api_io_workers: int
+    result_file_path: str
+    result_compression: str
     model_path: str
     audio_file_path: str
     export_file_path: str
@@ -62,6 +102,10 @@ class ConfigResponse(BaseModel):
     cleanup_schedule_in_minutes: int
     transcription_default: TranscriptionDefaultConfigResponse
     supported_language_codes: List[LanguageCode]
+    translation_cache_path: str | None = None
+    translation_cache_size_mb: int | None = None
+    translation_cache_memory_entries: int | None = None
+    translation_cache_ttl_hours: float | None = None
 
 
 def read_config(config_yml_path: str) -> dict:
@@ -103,6 +147,8 @@ def read_config(config_yml_path: str) -> dict:
         "rest_runner": get_config("rest_runner"),
         "rest_models": get_extracted_field_from_config("rest_runner", "models"),
         "websocket_stream": get_config("websocket_stream"),
+        # Runner processes that only translate, next to the ones of rest_runner
+        "translation_workers": get_config("translation_workers", default=[]) or [],
         # Networking Configuration
         #   Port that the REST API will listen on
         "rest_port": int(get_config("rest_port", default="8393")),
@@ -114,6 +160,22 @@ def read_config(config_yml_path: str) -> dict:
         # File System Configuration
         #   Path to the status file folder
         "status_file_path": get_config("status_file_path", default="data/status"),
+        #   Path to the SQLite index of the jobs
+        "job_index_path": get_config("job_index_path", default="data/jobs.db"),
+        #   When status files are forced to disk: always | batched | never
+        "status_fsync_mode": get_config("status_fsync_mode", default="always"),
+        #   Seconds a runner holds a job without renewing its lease
+        "job_lease_seconds": int(get_config("job_lease_seconds", default=60)),
+        #   Number of uploads that are converted to WAV at the same time
+        "upload_conversion_workers": int(
+            get_config("upload_conversion_workers", default=2)
+        ),
+        #   Number of threads of the REST API for blocking file system work
+        "api_io_workers": int(get_config("api_io_workers", default=8)),
+        #   Path to the folder of the transcripts, stored apart from the status files
+        "result_file_path": get_config("result_file_path", default="data/results"),
+        #   Compression of the stored transcripts: gzip | none
+        "result_compression": get_config("result_compression", default="gzip"),
         #   Path to the model folder
         "model_path": get_config("model_path", default="models"),
         #   Path to the audio file folder
@@ -135,6 +197,22 @@ def read_config(config_yml_path: str) -> dict:
         "translation_default_method": get_config(
             "translation_default_method", default="segmented"
         ),
+        #   Path to the SQLite cache of the translated texts
+        "translation_cache_path": get_config(
+            "translation_cache_path", default="data/translations.db"
+        ),
+        #   Size budget of the translation cache, 0 disables it
+        "translation_cache_size_mb": int(
+            get_config("translation_cache_size_mb", default=256)
+        ),
+        #   Most recently used translations that are also kept in memory
+        "translation_cache_memory_entries": int(
+            get_config("translation_cache_memory_entries", default=10000)
+        ),
+        #   Hours after which a cached translation is translated again
+        "translation_cache_ttl_hours": float(
+            get_config("translation_cache_ttl_hours", default=720)
+        ),
         "supported_language_codes": list(_LANGUAGE_CODES),
     }
 
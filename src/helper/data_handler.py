@@ -5,14 +5,23 @@ import json
 import logging
 import os
 import time
+import wave
 from datetime import datetime, timezone
+from typing import BinaryIO, Callable
 
 from pydub import AudioSegment
 
 from src.helper.config import CONFIG
-from src.helper.file_handler import FileHandler
+from src.helper.file_handler import GZIP_SUFFIX, TEMP_FILE_SUFFIX, FileHandler
+from src.helper.job_queue import JobCandidate, JobQueue, oldest_first
 from src.helper.types.transcription_status import TranscriptionStatus
 
+# Bytes copied at once when exporting audio from a file
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Result folder files with the transcript a translation job was posted with
+INPUT_SUFFIX = ".input"
+
 
 class DataHandler:
     """This class handles the data folder."""
@@ -23,6 +32,9 @@ class DataHandler:
         audio_file_path: str = CONFIG["audio_file_path"],
         audio_file_format: str = CONFIG["audio_file_format"],
         export_file_path: str = CONFIG["export_file_path"],
+        job_index_path: str = CONFIG["job_index_path"],
+        result_file_path: str = CONFIG["result_file_path"],
+        result_compression: str = CONFIG["result_compression"],
     ):
         self.log = logging.getLogger(__name__)
         self.root_path = os.getcwd()
@@ -32,10 +44,15 @@ class DataHandler:
         self.audio_file_path = os.path.join(self.root_path, audio_file_path)
         self.audio_file_format = audio_file_format
         self.export_file_path = os.path.join(self.root_path, export_file_path)
+        self.result_path = os.path.join(self.root_path, result_file_path)
+        self.result_compression = result_compression
 
         DataHandler.create_dir_if_not_exist(self.audio_file_path)
         DataHandler.create_dir_if_not_exist(self.status_path)
         DataHandler.create_dir_if_not_exist(self.export_file_path)
+        DataHandler.create_dir_if_not_exist(self.result_path)
+
+        self.job_queue = JobQueue(os.path.join(self.root_path, job_index_path))
 
     def get_status_file_by_id(self, transcription_id: str) -> dict:
         """Returns the status file by the given transcription_id."""
@@ -46,6 +63,24 @@ class DataHandler:
             return data
         return None
 
+    def get_transcription_by_id(self, transcription_id: str) -> dict:
+        """Returns the status file together with the transcript, if there is one."""
+        data = self.get_status_file_by_id(transcription_id)
+        if data and "transcript" not in data:
+            transcript = self.get_result_file_by_id(transcription_id)
+            if transcript is not None:
+                data["transcript"] = transcript
+        return data
+
+    def get_transcript_by_id(self, transcription_id: str) -> dict:
+        """Returns the transcript of a job, also from status files of older versions."""
+        transcript = self.get_result_file_by_id(transcription_id)
+        if transcript is None:
+            data = self.get_status_file_by_id(transcription_id)
+            if data:
+                return data.get("transcript")
+        return transcript
+
     def get_all_status_filenames(self) -> list[str]:
         """Returns all status files."""
         status_files = []
@@ -60,18 +95,75 @@ class DataHandler:
         file_path = os.path.join(self.status_path, file_name)
         # Ensure the directory exists
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        self.file_handler.write_json(file_path, data)
+        if self.file_handler.write_json(file_path, data):
+            self.job_queue.upsert(transcription_id, data, os.path.getsize(file_path))
 
     def delete_status_file(self, transcription_id: str) -> bool:
         """Deletes the status file by the given transcription_id."""
         file_name = f"{transcription_id}.json"
         file_path = os.path.join(self.status_path, file_name)
+        self.job_queue.delete(transcription_id)
         if os.path.isfile(file_path):
             os.remove(file_path)
             return True
         self.log.error(f"Status file {file_name} not found.")
         return False
 
+    def _result_file_paths(
+        self, transcription_id: str, suffix: str = ""
+    ) -> list[str]:
+        """Returns the possible paths of a result file, the configured format first."""
+        plain = os.path.join(self.result_path, f"{transcription_id}{suffix}.json")
+        compressed = plain + GZIP_SUFFIX
+        if self.result_compression == "gzip":
+            return [compressed, plain]
+        return [plain, compressed]
+
+    def get_result_file_by_id(self, transcription_id: str) -> dict:
+        """Returns the stored transcript of a job."""
+        for file_path in self._result_file_paths(transcription_id):
+            if os.path.isfile(file_path):
+                return self.file_handler.read_json(file_path)
+        return None
+
+    def write_result_file(self, transcription_id: str, transcript: dict) -> bool:
+        """Writes the transcript of a job, it is kept apart from the status file."""
+        file_path, other_path = self._result_file_paths(transcription_id)
+        if not self.file_handler.write_json(file_path, transcript):
+            return False
+        # Left over if the compression was changed in between
+        if os.path.isfile(other_path):
+            os.remove(other_path)
+        return True
+
+    def get_input_file_by_id(self, transcription_id: str) -> dict:
+        """Returns the transcript a translation job was posted with."""
+        for file_path in self._result_file_paths(transcription_id, INPUT_SUFFIX):
+            if os.path.isfile(file_path):
+                return self.file_handler.read_json(file_path)
+        return None
+
+    def write_input_file(self, transcription_id: str, transcript: dict) -> bool:
+        """
+        Writes the transcript to translate. It is kept apart from the result, so a
+        job that is processed again never translates its own translation.
+        """
+        file_path, other_path = self._result_file_paths(transcription_id, INPUT_SUFFIX)
+        if not self.file_handler.write_json(file_path, transcript):
+            return False
+        if os.path.isfile(other_path):
+            os.remove(other_path)
+        return True
+
+    def delete_result_file(self, transcription_id: str) -> bool:
+        """Deletes the stored transcript of a job."""
+        deleted = False
+        for file_path in self._result_file_paths(transcription_id):
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                deleted = True
+        return deleted
+
     def get_audio_file_path_by_id(self, transcription_id: str) -> str:
         """Returns the audio file path by the given transcription_id."""
         file_name = f"{transcription_id}{self.audio_file_format}"
@@ -84,32 +176,86 @@ class DataHandler:
         self, status: str, transcription_id: str, error_message: str = None
     ) -> None:
         """Updates the status file with the given status."""
+        file_path = self._write_status(status, transcription_id, error_message)
+        if file_path is not None:
+            self.job_queue.update_status(
+                transcription_id, status, os.path.getsize(file_path)
+            )
+
+    def _write_status(
+        self, status: str, transcription_id: str, error_message: str = None
+    ) -> str | None:
+        """Sets the status in the status file only, returns its path if it exists."""
         file_name = f"{transcription_id}.json"
         file_path = os.path.join(self.status_path, file_name)
         data = self.file_handler.read_json(file_path)
-        if data:
-            data["status"] = status
-            if status == TranscriptionStatus.FINISHED.value:
-                data["end_time"] = (
-                    datetime.now(timezone.utc).replace(microsecond=0).isoformat()
-                )
-            if error_message is not None:
-                data["error_message"] = error_message
-            self.file_handler.write_json(file_path, data)
-            self.log.info(f"Status file {file_name} updated (status: {status})")
-        else:
+        if not data:
             self.log.error(
                 f"File for transcription ID {transcription_id} not found, PATH: {self.status_path}"
             )
+            return None
+        data["status"] = status
+        if status == TranscriptionStatus.FINISHED.value:
+            data["end_time"] = (
+                datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+            )
+        if error_message is not None:
+            data["error_message"] = error_message
+        self.file_handler.write_json(file_path, data)
+        self.log.info(f"Status file {file_name} updated (status: {status})")
+        return file_path
+
+    def claim_next_job(
+        self,
+        tasks: list[str],
+        models: list[str | None],
+        owner: str,
+        lease_seconds: float = CONFIG["job_lease_seconds"],
+        rank: Callable[[JobCandidate], tuple] = oldest_first,
+    ) -> tuple[str, str] | None:
+        """
+        Claims the next pending job of the given tasks and models for `owner`, by
+        default the oldest one. `rank` orders the candidates, see JobQueue.claim_next.
+
+        Jobs whose lease expired (e.g. their runner crashed) are put back into the
+        queue first, so they can be claimed again.
+
+        Returns (transcription_id, task) of the claimed job or None if nothing is pending.
+        """
+        # The status files are written within the requeue transaction, a runner
+        # that claims the job afterwards can not be overwritten by them
+        requeued = self.job_queue.requeue_expired_leases(
+            lambda transcription_id: self._write_status(
+                TranscriptionStatus.IN_QUERY.value, transcription_id
+            )
+        )
+        for transcription_id in requeued:
+            self.log.warning(f"Lease of job {transcription_id} expired, requeued it")
 
-    def merge_transcript_to_status(
-        self, transcription_id: str, transcript_data: dict
-    ) -> bool:
-        """Merges the transcript file to the status file."""
-        status_data = self.get_status_file_by_id(transcription_id)
-        if transcript_data and status_data:
-            status_data["transcript"] = transcript_data
-            self.write_status_file(transcription_id, status_data)
+        while True:
+            job = self.job_queue.claim_next(
+                tasks, models, owner, lease_seconds, rank
+            )
+            if job is None:
+                return None
+            transcription_id, task = job
+            if self.get_status_file_by_id(transcription_id) is None:
+                # Status file has been removed while the job was still indexed
+                self.log.warning(f"Dropping index entry without status file {job}")
+                self.job_queue.delete(transcription_id)
+                continue
+            self.update_status_file(
+                TranscriptionStatus.IN_PROGRESS.value, transcription_id
+            )
+            return job
+
+    def store_transcript(self, transcription_id: str, transcript_data: dict) -> bool:
+        """Stores the transcript of a job and marks the job as finished."""
+        status_file = os.path.join(self.status_path, f"{transcription_id}.json")
+        if transcript_data and os.path.isfile(status_file):
+            # The result is written first, finished jobs always have a transcript
+            if not self.write_result_file(transcription_id, transcript_data):
+                return False
             self.log.info(f"Transcript added for {transcription_id}")
             self.update_status_file(
                 TranscriptionStatus.FINISHED.value, transcription_id
@@ -130,6 +276,7 @@ class DataHandler:
                     # 3600 seconds in an hour
                     if (time.time() - file_time) / 3600 > keep_data_for_hours:
                         os.remove(file_path)
+                        self.job_queue.delete(filename[:-5])
                         self.log.debug(f"Deleted status file {filename}")
             for filename in os.listdir(self.audio_file_path):
                 if filename.endswith(CONFIG["audio_file_format"]):
@@ -149,6 +296,16 @@ class DataHandler:
                     if (time.time() - file_time) / 3600 > keep_data_for_hours:
                         os.remove(file_path)
                         self.log.debug(f"Deleted export file {filename}")
+            for filename in os.listdir(self.result_path):
+                if filename.endswith(".json") or filename.endswith(
+                    ".json" + GZIP_SUFFIX
+                ):
+                    file_path = os.path.join(self.result_path, filename)
+                    file_time = os.path.getmtime(file_path)
+                    # 3600 seconds in an hour
+                    if (time.time() - file_time) / 3600 > keep_data_for_hours:
+                        os.remove(file_path)
+                        self.log.debug(f"Deleted result file {filename}")
 
         except Exception as e:
             self.log.error(f"Error while cleaning up files: {str(e)}")
@@ -165,23 +322,6 @@ class DataHandler:
             self.log.error(f"Error getting settings from status file: {str(e)}" + e)
         return None
 
-    def save_audio_file(self, audio, transcription_id) -> dict:
-        """
-        Convert an audio file to 16kHz mono WAV format and save it to a directory.
-        """
-        try:
-            os.makedirs(self.audio_file_path, exist_ok=True)
-            audio.set_frame_rate(16000).set_channels(1).export(
-                os.path.join(
-                    self.audio_file_path, f"{transcription_id}{self.audio_file_format}"
-                )
-            )
-            return {"success": True, "message": "Conversion successful."}
-        except Exception as e:
-            error_message = f"Audio File creation failed for: {str(e)}"
-            self.log.error(error_message)
-            return {"success": False, "message": error_message}
-
     def delete_audio_file(self, transcription_id: str) -> bool:
         """Deletes the audio file by the given transcription_id."""
         file_name = f"{transcription_id}{self.audio_file_format}"
@@ -205,23 +345,24 @@ class DataHandler:
         ]
         return len(audio_files)
 
-    def export_wav_file(self, audio_chunk: bytes, name: str) -> str:
-        """Exports a WAV file from an audio chunk to the export folder with a given base name."""
+    def export_wav_file(self, audio_chunk: bytes | BinaryIO, name: str) -> str:
+        """
+        Exports a WAV file from raw 16 kHz mono PCM audio to the export folder with a
+        given base name. The audio is either bytes or a file, which is copied in chunks.
+        """
         file_name = f"{name}.wav"
         export_path = os.path.join(self.export_file_path, file_name)
         os.makedirs(os.path.dirname(export_path), exist_ok=True)
 
-        # Assuming audio_chunk is raw audio data, create an AudioSegment
-        audio_segment = AudioSegment(
-            data=audio_chunk,
-            sample_width=2,  # Assuming 16-bit PCM
-            frame_rate=16000,
-            channels=1,
-        )
-
-        # Export the AudioSegment as a WAV file
-        with open(export_path, "wb") as out_f:
-            audio_segment.export(out_f, format="wav")
+        with wave.open(export_path, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)  # 16-bit PCM
+            wav_file.setframerate(16000)
+            if isinstance(audio_chunk, bytes):
+                wav_file.writeframes(audio_chunk)
+            else:
+                while chunk := audio_chunk.read(EXPORT_CHUNK_SIZE):
+                    wav_file.writeframesraw(chunk)
 
         self.log.debug(f"WAV file exported: {export_path}")
         return export_path
@@ -265,10 +406,14 @@ class DataHandler:
     @staticmethod
     def cleanup_interrupted_jobs() -> None:
         """
-        Finds and removes jobs/status files for jobs that were running when a previous instance terminated.
-        These jobs could never be recovered and stuck in "in_progress"
+        Finds jobs that were running when a previous instance terminated and puts them
+        back into the queue. Transcription jobs whose audio file is already gone can not
+        be recovered, they are marked as failed. Corrupted status files are removed.
+
+        The job index is rebuilt from the remaining status files afterwards.
         """
         status_dir_base_path = os.path.join(os.getcwd(), CONFIG["status_file_path"])
+        audio_dir_base_path = os.path.join(os.getcwd(), CONFIG["audio_file_path"])
         DataHandler.create_dir_if_not_exist(status_dir_base_path)
         existing_status_files = [
             x
@@ -279,15 +424,22 @@ class DataHandler:
             )
         ]
 
-        # Files that are stuck in progress
-        removed_stuck_counter = 0
+        # Jobs that were stuck in progress and could be requeued
+        requeued_counter = 0
+        # Jobs that were stuck in progress but lost their audio file
+        failed_counter = 0
         # Files with unreadable json
         removed_corrupted_counter = 0
+        remaining_jobs = []
         for file in existing_status_files:
             # This file is allowed to be there even though it is not valid json
             if file == ".gitignore":
                 continue
             filepath = os.path.join(status_dir_base_path, file)
+            # Leftover of a write that was interrupted, the previous file is intact
+            if file.endswith(TEMP_FILE_SUFFIX):
+                os.remove(filepath)
+                continue
             try:
                 with open(filepath) as f:
                     data = json.load(f)
@@ -295,11 +447,33 @@ class DataHandler:
                 os.remove(filepath)
                 removed_corrupted_counter += 1
                 continue
-            if data["status"] != TranscriptionStatus.IN_PROGRESS.value:
-                continue
-            os.remove(filepath)
-            removed_stuck_counter += 1
+            if data["status"] == TranscriptionStatus.IN_PROGRESS.value:
+                audio_file = os.path.join(
+                    audio_dir_base_path, file[:-5] + CONFIG["audio_file_format"]
+                )
+                if data.get("task") == "translate" or os.path.isfile(audio_file):
+                    data["status"] = TranscriptionStatus.IN_QUERY.value
+                    requeued_counter += 1
+                else:
+                    data["status"] = TranscriptionStatus.ERROR.value
+                    data["error_message"] = "Job was interrupted by a restart"
+                    failed_counter += 1
+                FileHandler().write_json(filepath, data)
+            if file.endswith(".json"):
+                remaining_jobs.append((file[:-5], data, os.path.getsize(filepath)))
+
+        # Leftovers of interrupted result writes and uploads
+        for path in [CONFIG["result_file_path"], CONFIG["audio_file_path"]]:
+            dir_base_path = os.path.join(os.getcwd(), path)
+            DataHandler.create_dir_if_not_exist(dir_base_path)
+            for file in os.listdir(dir_base_path):
+                if file.endswith(TEMP_FILE_SUFFIX):
+                    os.remove(os.path.join(dir_base_path, file))
+
+        JobQueue(os.path.join(os.getcwd(), CONFIG["job_index_path"])).rebuild(
+            remaining_jobs
+        )
 
         logging.getLogger(__name__).info(
-            f"Initial file cleanup removed {removed_stuck_counter+removed_corrupted_counter} Status files ({removed_corrupted_counter} corrupted files, {removed_stuck_counter} irrecoverable files)"
+            f"Initial file cleanup removed {removed_corrupted_counter} corrupted status files, requeued {requeued_counter} interrupted jobs and marked {failed_counter} irrecoverable jobs as failed"
         )
@@ -1,53 +1,66 @@
 """This module contains a JSON FileHandler to simplify reading and writing JSON files."""
 
+import atexit
+import gzip
 import json
 import logging
 import os
-from typing import List, Tuple
+import tempfile
+import threading
+import time
+from typing import Literal
 
-from fastapi import UploadFile
-from pydub import AudioSegment
-from pydub.exceptions import CouldntDecodeError
+from src.helper.config import CONFIG
 
 LOGGER = logging.getLogger(__name__)
 
 # 5 hours in seconds
 MAX_AUDIO_LENGTH = 5 * 60 * 60
 
-class FileHandler:
-    """This class handles the reading and writing of JSON files."""
+# Suffix of partially written files, these are never read as JSON files
+TEMP_FILE_SUFFIX = ".tmp"
 
-    @staticmethod
-    def load_into_valid_audiosegment(file: UploadFile) -> Tuple[(AudioSegment | None), List[str]]:
-        errors: List[str] = []
-        audio: AudioSegment | None = None
-        # If this is none we will just assume it is okay...
-        # There should (tm) be no way for this to be none
-        # if file.filename is not None:
-        #     if not file.filename.endswith('.wav'):
-        #         return (None, ["Uploaded audio file should be of type wav"])
-        try:
-            # Load audio using pydub
-            loaded_audio = AudioSegment.from_file(file.file)
+# In batched mode, written files are synced to disk after this many writes or seconds
+FSYNC_BATCH_SIZE = 32
+FSYNC_BATCH_SECONDS = 1.0
 
-            # # Check sample rate
-            # if loaded_audio.frame_rate != 16000:
-            #     errors.append("Invalid sample rate. Must be 16 kHz.")
+FsyncMode = Literal["always", "batched", "never"]
 
-            if loaded_audio.duration_seconds > MAX_AUDIO_LENGTH:
-                errors.append(f"Maximum allowed audio length exceeded. Max audio length is at {MAX_AUDIO_LENGTH} seconds.")
+# Temporary files are created with mode 0600, the written files get the mode that
+# open() would give them. The umask can only be read by setting it.
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
 
-            audio = loaded_audio
-        except CouldntDecodeError:
-            errors.append("Could not decode file using pydub. This is an indicator that the uploaded file is corrupted or not supported.")
-        except Exception as e:
-            raise e
-        return (audio, errors)
+# JSON files with this suffix are stored gzip compressed
+GZIP_SUFFIX = ".gz"
+
+
+class FileHandler:
+    """
+    This class handles the reading and writing of JSON files.
+
+    JSON files are written to a temporary file and then moved over the target, so readers
+    only ever see the old or the new content. The `fsync_mode` defines when the data is
+    forced to disk: "always" on every write, "batched" for groups of writes and "never".
+    Files ending with GZIP_SUFFIX are transparently compressed.
+    """
+
+    def __init__(self, fsync_mode: FsyncMode = CONFIG["status_fsync_mode"]):
+        self.fsync_mode = fsync_mode
+        self._pending_sync: set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._last_sync = time.time()
+        # Syncs the pending files of a batch that is not completed by further writes
+        self._sync_timer: threading.Timer | None = None
+        if fsync_mode == "batched":
+            atexit.register(self.sync)
 
     def read_json(self, file_path):
         """Reads a JSON file and returns the data."""
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
+            opener = gzip.open if file_path.endswith(GZIP_SUFFIX) else open
+            with opener(file_path, "rt", encoding="utf-8") as file:
                 data = json.load(file)
             return data
         except Exception as e:
@@ -55,15 +68,78 @@ class FileHandler:
             return None
 
     def write_json(self, file_path, data) -> bool:
-        """Writes a JSON file."""
+        """Atomically writes a JSON file."""
+        temp_path = None
         try:
-            with open(file_path, "w", encoding="utf-8") as file:
-                json.dump(data, file)
+            directory, file_name = os.path.split(file_path)
+            file_descriptor, temp_path = tempfile.mkstemp(
+                dir=directory or ".", prefix=f".{file_name}.", suffix=TEMP_FILE_SUFFIX
+            )
+            content = json.dumps(data).encode("utf-8")
+            if file_path.endswith(GZIP_SUFFIX):
+                content = gzip.compress(content, mtime=0)
+            os.fchmod(file_descriptor, FILE_MODE)
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(content)
+                file.flush()
+                if self.fsync_mode == "always":
+                    os.fsync(file.fileno())
+            os.replace(temp_path, file_path)
+            if self.fsync_mode == "always":
+                FileHandler._fsync_path(directory or ".")
+            elif self.fsync_mode == "batched":
+                self._schedule_sync(file_path)
             return True
         except Exception as e:
             LOGGER.error("Error writing JSON file: " + str(e))
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
             return False
 
+    def sync(self) -> None:
+        """Forces all files written in batched mode to disk."""
+        with self._pending_lock:
+            pending = self._pending_sync
+            self._pending_sync = set()
+            self._last_sync = time.time()
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+        directories = set()
+        for file_path in pending:
+            FileHandler._fsync_path(file_path)
+            directories.add(os.path.dirname(file_path) or ".")
+        for directory in directories:
+            FileHandler._fsync_path(directory)
+
+    def _schedule_sync(self, file_path: str) -> None:
+        """Remembers a written file and syncs the batch once it is due."""
+        with self._pending_lock:
+            self._pending_sync.add(file_path)
+            due = (
+                len(self._pending_sync) >= FSYNC_BATCH_SIZE
+                or time.time() - self._last_sync >= FSYNC_BATCH_SECONDS
+            )
+            if not due and self._sync_timer is None:
+                # The last writes before an idle period are synced by the timer
+                self._sync_timer = threading.Timer(FSYNC_BATCH_SECONDS, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+        if due:
+            self.sync()
+
+    @staticmethod
+    def _fsync_path(path: str) -> None:
+        """Forces a file or directory to disk, ignoring files that are gone by now."""
+        try:
+            file_descriptor = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            os.fsync(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+
     def create(self, file_path, data) -> bool:
         """Creates a JSON file."""
         try:
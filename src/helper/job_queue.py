@@ -0,0 +1,483 @@
+"""This module contains a persistent index of the jobs stored in the data folder."""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, NamedTuple, Tuple
+
+from src.helper.types.transcription_status import TranscriptionStatus
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds a connection waits for a lock held by another process
+BUSY_TIMEOUT_SECONDS = 30
+
+# Columns added after the first version of the index
+ADDED_COLUMNS = {
+    "lease_owner": "TEXT",
+    "lease_expires": "REAL",
+    "updated_at": "REAL",
+    "size": "INTEGER",
+    "seq": "INTEGER",
+}
+
+
+class JobChange(NamedTuple):
+    """A job as seen by readers of the index, see `JobQueue.get_changes`."""
+
+    transcription_id: str
+    status: str | None
+    start_time: str | None
+    updated_at: float | None
+    size: int | None
+
+
+class JobCandidate(NamedTuple):
+    """The next pending job of one (task, model) pair, see `JobQueue.claim_next`."""
+
+    transcription_id: str
+    task: str
+    model: str | None
+    priority: int
+    start_time: str
+
+
+def oldest_first(candidate: JobCandidate) -> tuple:
+    """Default order of the pending jobs: higher priority first, then the oldest."""
+    return (-candidate.priority, candidate.start_time)
+
+
+class JobQueue:
+    """
+    SQLite (WAL mode) backed index of all jobs.
+
+    The status files stay the source of truth for the job content, this index only
+    mirrors the fields needed to find and claim the next job. Pending jobs are
+    ordered by (priority, start_time) per task and model, so the next job of a
+    (task, model) pair is a single index lookup instead of a scan of all status files.
+
+    Claimed jobs are leased to their runner. A runner keeps renewing the lease while it
+    processes the job, leases that expire (e.g. the runner crashed) can be requeued.
+
+    Every visible change of a job stamps its row with a new sequence number and every
+    removal bumps the generation of the index, so readers can follow the index
+    incrementally (see `get_state` and `get_changes`).
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._local = threading.local()
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns a connection for the current process and thread."""
+        connection = getattr(self._local, "connection", None)
+        # Connections must not be shared with forked processes
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _setup(self) -> None:
+        """Creates the table and indexes if they do not exist."""
+        connection = self._connection()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                transcription_id TEXT PRIMARY KEY,
+                task TEXT,
+                model TEXT,
+                status TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                start_time TEXT,
+                lease_owner TEXT,
+                lease_expires REAL,
+                updated_at REAL,
+                size INTEGER,
+                seq INTEGER
+            )
+            """
+        )
+        existing_columns = [
+            row[1] for row in connection.execute("PRAGMA table_info(jobs)")
+        ]
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing_columns:
+                connection.execute(
+                    f"ALTER TABLE jobs ADD COLUMN {column} {column_type}"
+                )
+        connection.execute(
+            """
+            CREATE INDEX IF NOT EXISTS jobs_pending
+            ON jobs (status, task, model, priority DESC, start_time)
+            """
+        )
+        connection.execute(
+            """
+            CREATE INDEX IF NOT EXISTS jobs_leases
+            ON jobs (lease_expires) WHERE lease_expires IS NOT NULL
+            """
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_changes ON jobs (seq)")
+        # Single row with the last sequence number and the generation of the index
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_index_state (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                seq INTEGER NOT NULL,
+                generation INTEGER NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO job_index_state (id, seq, generation) VALUES (0, 0, 0)"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """Runs the enclosed statements in one write transaction."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _next_seq(connection: sqlite3.Connection, removed: bool = False) -> int:
+        """Returns a new sequence number, must be called within a transaction."""
+        connection.execute(
+            "UPDATE job_index_state SET seq = seq + 1, generation = generation + ?",
+            (1 if removed else 0,),
+        )
+        return connection.execute("SELECT seq FROM job_index_state").fetchone()[0]
+
+    def upsert(
+        self, transcription_id: str, data: dict, size: int | None = None
+    ) -> None:
+        """
+        Inserts or replaces the index entry of a job from its status data.
+        `size` is the size of the status file in bytes, if known.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                INSERT INTO jobs (
+                    transcription_id, task, model, status, priority, start_time,
+                    size, updated_at, seq
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (transcription_id) DO UPDATE SET
+                    task = excluded.task,
+                    model = excluded.model,
+                    status = excluded.status,
+                    priority = excluded.priority,
+                    start_time = excluded.start_time,
+                    size = excluded.size,
+                    updated_at = excluded.updated_at,
+                    seq = excluded.seq,
+                    lease_owner = CASE WHEN excluded.status = ? THEN lease_owner END,
+                    lease_expires = CASE WHEN excluded.status = ? THEN lease_expires END
+                """,
+                JobQueue._row_from_data(transcription_id, data, size)
+                + (time.time(), JobQueue._next_seq(connection))
+                + (TranscriptionStatus.IN_PROGRESS.value,) * 2,
+            )
+
+    def update_status(
+        self, transcription_id: str, status: str, size: int | None = None
+    ) -> None:
+        """
+        Updates the status (and the status file size, if given) of an indexed job,
+        the lease ends with the progress.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                UPDATE jobs SET
+                    status = ?,
+                    size = COALESCE(?, size),
+                    updated_at = ?,
+                    seq = ?,
+                    lease_owner = CASE WHEN ? THEN lease_owner END,
+                    lease_expires = CASE WHEN ? THEN lease_expires END
+                WHERE transcription_id = ?
+                """,
+                (
+                    status,
+                    size,
+                    time.time(),
+                    JobQueue._next_seq(connection),
+                    status == TranscriptionStatus.IN_PROGRESS.value,
+                    status == TranscriptionStatus.IN_PROGRESS.value,
+                    transcription_id,
+                ),
+            )
+
+    def delete(self, transcription_id: str) -> None:
+        """Removes a job from the index."""
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "DELETE FROM jobs WHERE transcription_id = ?", (transcription_id,)
+            )
+            if cursor.rowcount:
+                JobQueue._next_seq(connection, removed=True)
+
+    def clear(self) -> None:
+        """Removes all jobs from the index."""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM jobs")
+            JobQueue._next_seq(connection, removed=True)
+
+    def rebuild(self, entries: Iterable[Tuple[str, dict, int | None]]) -> None:
+        """
+        Replaces the whole index with the given (transcription_id, data, size) entries.
+        """
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM jobs")
+            seq = JobQueue._next_seq(connection, removed=True)
+            now = time.time()
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO jobs (
+                    transcription_id, task, model, status, priority, start_time,
+                    size, updated_at, seq
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    JobQueue._row_from_data(id, data, size) + (now, seq)
+                    for id, data, size in entries
+                ],
+            )
+
+    def get_state(self) -> Tuple[int, int]:
+        """Returns the last sequence number and the generation of the index."""
+        return (
+            self._connection()
+            .execute("SELECT seq, generation FROM job_index_state")
+            .fetchone()
+        )
+
+    def get_changes(self, since_seq: int | None = None) -> List[JobChange]:
+        """
+        Returns the jobs that changed after `since_seq`, or all jobs if it is None.
+        Removed jobs are not reported, readers detect them by a new generation.
+        """
+        query = (
+            "SELECT transcription_id, status, start_time, updated_at, size FROM jobs"
+        )
+        if since_seq is None:
+            rows = self._connection().execute(query + " ORDER BY start_time, rowid")
+        else:
+            rows = self._connection().execute(
+                query + " WHERE seq > ? ORDER BY seq", (since_seq,)
+            )
+        return [JobChange(*row) for row in rows]
+
+    def get_status(self, transcription_id: str) -> str | None:
+        """Returns the indexed status of a job."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT status FROM jobs WHERE transcription_id = ?",
+                (transcription_id,),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def claim_next(
+        self,
+        tasks: List[str],
+        models: List[str | None],
+        owner: str,
+        lease_seconds: float,
+        rank: Callable[[JobCandidate], tuple] = oldest_first,
+    ) -> Tuple[str, str] | None:
+        """
+        Atomically claims the next pending job for one of the given tasks and models.
+
+        Every (task, model) pair is resolved with one lookup on the pending index,
+        the best candidate is then marked as in progress and leased to `owner` within
+        the same write transaction, so no other runner can claim it as well.
+        The candidate with the lowest `rank` is claimed.
+
+        Returns:
+            (transcription_id, task) of the claimed job or None if nothing is pending.
+        """
+        with self._transaction() as connection:
+            best = None
+            best_rank = None
+            for task in tasks:
+                for model in models:
+                    row = connection.execute(
+                        """
+                        SELECT transcription_id, task, priority, start_time FROM jobs
+                        WHERE status = ? AND task = ? AND model IS ?
+                            AND start_time IS NOT NULL
+                        ORDER BY priority DESC, start_time
+                        LIMIT 1
+                        """,
+                        (TranscriptionStatus.IN_QUERY.value, task, model),
+                    ).fetchone()
+                    # Jobs without a start time are skipped, NULLs would sort first
+                    if row is None:
+                        continue
+                    candidate = JobCandidate(row[0], row[1], model, row[2], row[3])
+                    candidate_rank = rank(candidate)
+                    if best is None or candidate_rank < best_rank:
+                        best = row
+                        best_rank = candidate_rank
+
+            if best is None:
+                return None
+
+            now = time.time()
+            connection.execute(
+                """
+                UPDATE jobs SET
+                    status = ?, lease_owner = ?, lease_expires = ?, updated_at = ?, seq = ?
+                WHERE transcription_id = ?
+                """,
+                (
+                    TranscriptionStatus.IN_PROGRESS.value,
+                    owner,
+                    now + lease_seconds,
+                    now,
+                    JobQueue._next_seq(connection),
+                    best[0],
+                ),
+            )
+            return (best[0], best[1])
+
+    def renew_lease(
+        self, transcription_id: str, owner: str, lease_seconds: float
+    ) -> bool:
+        """Extends the lease of a job, returns False if `owner` does not hold it."""
+        cursor = self._connection().execute(
+            """
+            UPDATE jobs SET lease_expires = ?
+            WHERE transcription_id = ? AND lease_owner = ? AND status = ?
+            """,
+            (
+                time.time() + lease_seconds,
+                transcription_id,
+                owner,
+                TranscriptionStatus.IN_PROGRESS.value,
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def holds_lease(self, transcription_id: str, owner: str) -> bool:
+        """Returns True if `owner` holds the lease of the job."""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT lease_owner FROM jobs WHERE transcription_id = ?",
+                (transcription_id,),
+            )
+            .fetchone()
+        )
+        return row is not None and row[0] == owner
+
+    @contextmanager
+    def hold_lease(self, transcription_id: str, owner: str, lease_seconds: float):
+        """Keeps renewing the lease of a job in the background while the context is open."""
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(lease_seconds / 3):
+                try:
+                    renewed = self.renew_lease(transcription_id, owner, lease_seconds)
+                except sqlite3.Error as e:
+                    # E.g. the index is locked, the lease holds until it expires
+                    LOGGER.error(f"Could not renew lease of job {transcription_id}: {e}")
+                    continue
+                if not renewed:
+                    # The lease also ends when the job finished right before stopping
+                    if not stopped.is_set():
+                        LOGGER.error(f"Lost lease of job {transcription_id} ({owner})")
+                    return
+
+        thread = threading.Thread(
+            target=heartbeat, name=f"lease_{transcription_id}", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def requeue_expired_leases(
+        self, on_requeue: Callable[[str], None] | None = None
+    ) -> List[str]:
+        """
+        Puts jobs with an expired lease back into the queue and returns their ids.
+
+        `on_requeue` is called with every requeued id before the transaction commits,
+        e.g. to update the status file, so no runner can claim the job meanwhile.
+        """
+        with self._transaction() as connection:
+            expired = [
+                row[0]
+                for row in connection.execute(
+                    """
+                    SELECT transcription_id FROM jobs
+                    WHERE lease_expires IS NOT NULL AND lease_expires < ?
+                    """,
+                    (time.time(),),
+                )
+            ]
+            now = time.time()
+            connection.executemany(
+                """
+                UPDATE jobs SET
+                    status = ?,
+                    lease_owner = NULL,
+                    lease_expires = NULL,
+                    updated_at = ?,
+                    seq = ?
+                WHERE transcription_id = ?
+                """,
+                [
+                    (
+                        TranscriptionStatus.IN_QUERY.value,
+                        now,
+                        JobQueue._next_seq(connection),
+                        id,
+                    )
+                    for id in expired
+                ],
+            )
+            if on_requeue is not None:
+                for transcription_id in expired:
+                    on_requeue(transcription_id)
+            return expired
+
+    @staticmethod
+    def _row_from_data(
+        transcription_id: str, data: dict, size: int | None = None
+    ) -> tuple:
+        """Maps the status data of a job to a row of the index."""
+        return (
+            transcription_id,
+            data.get("task"),
+            data.get("model"),
+            data.get("status"),
+            int(data.get("priority") or 0),
+            data.get("start_time"),
+            size,
+        )
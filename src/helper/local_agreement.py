@@ -25,6 +25,14 @@ class LocalAgreement:
         self.confirmed_contains_sentence_end = any([symbol in self.confirmed for symbol in SENTENCE_TERMINATION_CHARACTERS])
         return  flushed
 
+    def confirm_unconfirmed(self) -> None:
+        # Used when no further transcription can confirm the words, e.g. at the end of speech
+        if len(self.unconfirmed) > 0 and not self.confirmed_contains_sentence_end:
+            unconfirmed_text = " ".join([w.word for w in self.unconfirmed])
+            self.confirmed_contains_sentence_end = any([symbol in unconfirmed_text for symbol in SENTENCE_TERMINATION_CHARACTERS])
+        self.confirmed += self.unconfirmed
+        self.unconfirmed = []
+
     def flush_at_sentence_end(self) -> List[Word]:
         # Get highest index of allowed termination symbol
         i = len(self.confirmed) - 1
@@ -6,6 +6,7 @@
 import datetime
 import json
 import os
+import shutil
 
 from pydub import AudioSegment
 
@@ -20,6 +21,18 @@ EXAMPLE_AUDIO_FILE_PATH = os.getcwd() + "/src/helper/test_base/example.wav"
 DATA_HANDLER = DataHandler()
 
 
+def copy_audio_file(transcription_id: str) -> None:
+    """Places the example audio file like an upload converted by AudioIngest."""
+    os.makedirs(DATA_HANDLER.audio_file_path, exist_ok=True)
+    shutil.copy(
+        EXAMPLE_AUDIO_FILE_PATH,
+        os.path.join(
+            DATA_HANDLER.audio_file_path,
+            f"{transcription_id}{DATA_HANDLER.audio_file_format}",
+        ),
+    )
+
+
 def test_get_status_file_by_id_success(cleanup_data: None):
     """Tests getting a existing status file by id."""
     DATA_HANDLER.write_status_file("example", {"test": "test"})
@@ -76,11 +89,7 @@ def test_delete_status_file_fail():
 
 def test_get_audio_file_path_by_id(cleanup_data: None):
     """Tests getting a audio file path by id."""
-    # copy example.wav to example-save.wav
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    # save example-save.wav
-    res = DATA_HANDLER.save_audio_file(example_audio_data, "example")
-    assert res == {"success": True, "message": "Conversion successful."}
+    copy_audio_file("example")
     path = DATA_HANDLER.get_audio_file_path_by_id("example")
     assert (DATA_HANDLER.audio_file_path in path) is True
 
@@ -126,56 +135,68 @@ def test_update_status_file_with_error_message(cleanup_data: None):
     assert DATA_HANDLER.get_status_file_by_id("write") == check_data
 
 
-def test_merge_transcript_to_status_success(cleanup_data: None):
-    """Tests merging a transcript to a status file."""
+def test_store_transcript_success(cleanup_data: None):
+    """Tests storing a transcript apart from the status file."""
     # prepare write.json file
     data = {"status": TranscriptionStatus.IN_PROGRESS.value}
     DATA_HANDLER.write_status_file("write", data)
-    # merge transcript to status file
+    # store transcript
     transcript_data = {"transcript": "test"}
-    DATA_HANDLER.merge_transcript_to_status("write", transcript_data)
-    # check status file
-    check_data = {
-        "status": TranscriptionStatus.FINISHED.value,
-        "transcript": {"transcript": "test"},
-    }
-    actual_data = DATA_HANDLER.get_status_file_by_id("write")
-    assert actual_data["status"] == check_data["status"]
+    assert DATA_HANDLER.store_transcript("write", transcript_data)
+    # the status file only holds the metadata
+    status_data = DATA_HANDLER.get_status_file_by_id("write")
+    assert status_data["status"] == TranscriptionStatus.FINISHED.value
+    assert "transcript" not in status_data
+    assert DATA_HANDLER.get_result_file_by_id("write") == transcript_data
     assert (
-        actual_data["transcript"]["transcript"]
-        == check_data["transcript"]["transcript"]
+        DATA_HANDLER.get_transcription_by_id("write")["transcript"] == transcript_data
     )
 
 
-def test_merge_transcript_to_status_fail():
-    """Tests merging a transcript to a non existing status file."""
-    assert DATA_HANDLER.merge_transcript_to_status("non_existing", {}) is False
+def test_store_transcript_fail():
+    """Tests storing a transcript for a non existing status file."""
+    assert DATA_HANDLER.store_transcript("non_existing", {"text": ""}) is False
 
 
-def test_save_audio_file_success(cleanup_data: None):
-    """Tests saving an audio file."""
-    # copy example.wav to example-save.wav
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    # save example-save.wav
-    res = DATA_HANDLER.save_audio_file(example_audio_data, "example-save")
-    assert res == {"success": True, "message": "Conversion successful."}
-    # cleanup
-    DATA_HANDLER.delete_audio_file("example-save")
-
-
-def test_save_audio_file_fail():
-    """Tests saving an audio file."""
-    res = DATA_HANDLER.save_audio_file("/non_existing/path", "example-save")
-    assert res == {
-        "success": False,
-        "message": "Audio File creation failed for: 'str' object has no attribute 'set_frame_rate'",
-    }
+def test_result_file_compression(cleanup_data: None):
+    """Tests that result files are compressed as configured and readable either way."""
+    transcript_data = {"text": "test", "segments": []}
+    compressed = DataHandler(result_compression="gzip")
+    plain = DataHandler(result_compression="none")
+
+    assert compressed.write_result_file("result", transcript_data)
+    assert os.path.isfile(os.path.join(compressed.result_path, "result.json.gz"))
+    assert plain.get_result_file_by_id("result") == transcript_data
+
+    assert plain.write_result_file("result", transcript_data)
+    assert not os.path.isfile(os.path.join(plain.result_path, "result.json.gz"))
+    assert compressed.get_result_file_by_id("result") == transcript_data
+
+    assert plain.delete_result_file("result")
+    assert compressed.get_result_file_by_id("result") is None
+
+
+def test_input_file_is_kept_apart_from_result(cleanup_data: None):
+    """Tests that storing the translation does not replace the posted transcript."""
+    assert DATA_HANDLER.write_input_file("translate", {"text": "original"})
+    assert DATA_HANDLER.write_result_file("translate", {"text": "translation"})
+
+    assert DATA_HANDLER.get_input_file_by_id("translate") == {"text": "original"}
+    assert DATA_HANDLER.get_result_file_by_id("translate") == {"text": "translation"}
+    assert DATA_HANDLER.get_input_file_by_id("missing") is None
+
+
+def test_get_transcript_of_legacy_status_file(cleanup_data: None):
+    """Tests reading a transcript that is still part of the status file."""
+    data = {"status": TranscriptionStatus.FINISHED.value, "transcript": {"text": "a"}}
+    DATA_HANDLER.write_status_file("legacy", data)
+    assert DATA_HANDLER.get_transcript_by_id("legacy") == {"text": "a"}
+    assert DATA_HANDLER.get_transcription_by_id("legacy") == data
 
 
 def test_delete_audio_file_success():
     """Tests deleting an audio file."""
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    res = DATA_HANDLER.save_audio_file(example_audio_data, "example-delete")
+    copy_audio_file("example-delete")
 
     # delete example-delete.wav
     res = DATA_HANDLER.delete_audio_file("example-delete")
@@ -192,8 +213,7 @@ def test_delete_audio_file_fail():
 def test_get_number_of_audio_files(cleanup_data: None):
     """Tests getting the number of audio files."""
     assert DATA_HANDLER.get_number_of_audio_files() == 0
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    DATA_HANDLER.save_audio_file(example_audio_data, "example-file")
+    copy_audio_file("example-file")
     assert DATA_HANDLER.get_number_of_audio_files() == 1
     DATA_HANDLER.delete_audio_file("example-file")
     assert DATA_HANDLER.get_number_of_audio_files() == 0
@@ -202,8 +222,7 @@ def test_get_number_of_audio_files(cleanup_data: None):
 def test_clean_up_audio_and_status_files(cleanup_data: None):
     """Tests cleaning up audio and status files."""
     DATA_HANDLER.write_status_file("example", {"test": "test"})
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    DATA_HANDLER.save_audio_file(example_audio_data, "example")
+    copy_audio_file("example")
 
     assert DATA_HANDLER.get_number_of_audio_files() == 1
     assert DATA_HANDLER.get_status_file_by_id("example") is not None
@@ -216,8 +235,7 @@ def test_clean_up_audio_and_status_files(cleanup_data: None):
 def test_clean_up_audio_and_status_files_do_keep(cleanup_data: None):
     """Tests cleaning up audio and status files."""
     DATA_HANDLER.write_status_file("example", {"test": "test"})
-    example_audio_data = AudioSegment.from_wav(EXAMPLE_AUDIO_FILE_PATH)
-    DATA_HANDLER.save_audio_file(example_audio_data, "example")
+    copy_audio_file("example")
 
     assert DATA_HANDLER.get_number_of_audio_files() == 1
     assert DATA_HANDLER.get_status_file_by_id("example") is not None
@@ -288,7 +306,12 @@ def test_cleanup_interrupted_jobs():
 
     base_amount = len(os.listdir(DATA_HANDLER.status_path))
 
-    DATA_HANDLER.write_status_file("example_irrecoverable", {"status": "in_progress"})
+    DATA_HANDLER.write_status_file(
+        "example_irrecoverable", {"status": "in_progress", "task": "transcribe"}
+    )
+    DATA_HANDLER.write_status_file(
+        "example_requeued", {"status": "in_progress", "task": "translate"}
+    )
     DATA_HANDLER.write_status_file("example_fine", {"status": "error"})
     file_path = os.path.join(DATA_HANDLER.status_path, "invalid_json")
     with open(file_path, "w", encoding="utf-8") as file:
@@ -296,10 +319,63 @@ def test_cleanup_interrupted_jobs():
 
     assert DATA_HANDLER.get_status_file_by_id("example_irrecoverable") is not None
     assert DATA_HANDLER.get_status_file_by_id("example_fine") is not None
-    assert len(os.listdir(DATA_HANDLER.status_path)) == base_amount + 3
+    assert len(os.listdir(DATA_HANDLER.status_path)) == base_amount + 4
 
     DATA_HANDLER.cleanup_interrupted_jobs()
-    assert DATA_HANDLER.get_status_file_by_id("example_irrecoverable") is None
+    # Transcriptions without audio file can not be recovered
+    irrecoverable = DATA_HANDLER.get_status_file_by_id("example_irrecoverable")
+    assert irrecoverable["status"] == TranscriptionStatus.ERROR.value
+    assert (
+        DATA_HANDLER.get_status_file_by_id("example_requeued")["status"]
+        == TranscriptionStatus.IN_QUERY.value
+    )
+    assert (
+        DATA_HANDLER.job_queue.get_status("example_requeued")
+        == TranscriptionStatus.IN_QUERY.value
+    )
     assert DATA_HANDLER.get_status_file_by_id("example_fine") is not None
-    # 2 Files should be cleaned up
-    assert len(os.listdir(DATA_HANDLER.status_path)) == base_amount + 1
+    # Only the corrupted file should be cleaned up
+    assert len(os.listdir(DATA_HANDLER.status_path)) == base_amount + 3
+    for transcription_id in [
+        "example_irrecoverable",
+        "example_requeued",
+        "example_fine",
+    ]:
+        DATA_HANDLER.delete_status_file(transcription_id)
+
+
+def test_claim_next_job(cleanup_data: None):
+    """Tests claiming the next job updates the status file."""
+    data = {
+        "transcription_id": "claim",
+        "status": TranscriptionStatus.IN_QUERY.value,
+        "start_time": "2025-01-01T00:00:00+00:00",
+        "task": "transcribe",
+        "model": "tiny",
+    }
+    DATA_HANDLER.write_status_file("claim", data)
+
+    assert DATA_HANDLER.claim_next_job(["transcribe"], ["tiny"], "test-runner") == (
+        "claim",
+        "transcribe",
+    )
+    assert (
+        DATA_HANDLER.get_status_file_by_id("claim")["status"]
+        == TranscriptionStatus.IN_PROGRESS.value
+    )
+    assert DATA_HANDLER.claim_next_job(["transcribe"], ["tiny"], "test-runner") is None
+
+
+def test_claim_next_job_without_status_file(cleanup_data: None):
+    """Tests that index entries without a status file are dropped."""
+    DATA_HANDLER.job_queue.upsert(
+        "missing",
+        {
+            "status": TranscriptionStatus.IN_QUERY.value,
+            "start_time": "2025-01-01T00:00:00+00:00",
+            "task": "transcribe",
+            "model": "tiny",
+        },
+    )
+    assert DATA_HANDLER.claim_next_job(["transcribe"], ["tiny"], "test-runner") is None
+    assert DATA_HANDLER.job_queue.get_status("missing") is None
@@ -6,10 +6,18 @@
 import datetime
 import json
 import os
+import stat
+import time
 
 import pytest
 
-from src.helper.file_handler import FileHandler
+from src.helper.file_handler import (
+    FILE_MODE,
+    FSYNC_BATCH_SECONDS,
+    TEMP_FILE_SUFFIX,
+    UMASK,
+    FileHandler,
+)
 
 FILE_HANDLER = FileHandler()
 TEST_FILE_PATH = os.getcwd() + "/src/helper/test/test.json"
@@ -55,6 +63,44 @@ def test_write_json_fail():
     assert success is False
 
 
+def test_write_json_replaces_atomically(setup_and_teardown_file):
+    """Tests that writing leaves no temporary files and keeps the old file on errors."""
+    success = FILE_HANDLER.write_json(TEST_FILE_PATH, {"not": {"serializable"}})
+    assert success is False
+    assert FILE_HANDLER.read_json(TEST_FILE_PATH) == TEST_FILE_DATA
+
+    assert FILE_HANDLER.write_json(TEST_FILE_PATH, {"new": "data"}) is True
+    assert FILE_HANDLER.read_json(TEST_FILE_PATH) == {"new": "data"}
+    directory = os.path.dirname(TEST_FILE_PATH)
+    assert not [f for f in os.listdir(directory) if f.endswith(TEMP_FILE_SUFFIX)]
+
+
+def test_write_json_batched_fsync(setup_and_teardown_file):
+    """Tests that batched mode remembers written files until they are synced."""
+    file_handler = FileHandler(fsync_mode="batched")
+    assert file_handler.write_json(TEST_FILE_PATH, {"batched": True}) is True
+    assert file_handler.read_json(TEST_FILE_PATH) == {"batched": True}
+    file_handler.sync()
+    assert file_handler._pending_sync == set()
+
+
+def test_write_json_batched_fsync_flushes_when_idle(setup_and_teardown_file):
+    """Tests that the last writes of a batch are synced without further writes."""
+    file_handler = FileHandler(fsync_mode="batched")
+    assert file_handler.write_json(TEST_FILE_PATH, {"batched": True}) is True
+    assert file_handler._pending_sync == {TEST_FILE_PATH}
+    time.sleep(FSYNC_BATCH_SECONDS + 0.5)
+    assert file_handler._pending_sync == set()
+
+
+def test_write_json_keeps_default_file_mode(setup_and_teardown_file):
+    """Tests that written files get the mode of open(), not the one of mkstemp."""
+    os.remove(TEST_FILE_PATH)
+    assert FILE_HANDLER.write_json(TEST_FILE_PATH, TEST_FILE_DATA) is True
+    assert stat.S_IMODE(os.stat(TEST_FILE_PATH).st_mode) == FILE_MODE
+    assert FILE_MODE == 0o666 & ~UMASK
+
+
 def test_delete_file():
     """Tests deleting a file."""
     data = {"test": "test"}
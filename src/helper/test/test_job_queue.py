@@ -0,0 +1,219 @@
+"""This File contains tests for the JobQueue class."""
+
+import os
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.helper.job_queue import JobCandidate, JobQueue
+from src.helper.types.transcription_status import TranscriptionStatus
+
+TEST_DB_PATH = os.getcwd() + "/src/helper/test/test_jobs.db"
+OWNER = "test-runner"
+
+
+@pytest.fixture
+def job_queue():
+    """Creates an empty job index and deletes it after the test."""
+    yield JobQueue(TEST_DB_PATH)
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(TEST_DB_PATH + suffix):
+            os.remove(TEST_DB_PATH + suffix)
+
+
+def pending_job(task: str, model: str | None, start_time: str, priority: int = 0):
+    return {
+        "status": TranscriptionStatus.IN_QUERY.value,
+        "task": task,
+        "model": model,
+        "start_time": start_time,
+        "priority": priority,
+    }
+
+
+def test_claim_next_returns_oldest_job(job_queue: JobQueue):
+    """Tests that the oldest pending job is claimed first."""
+    job_queue.upsert("new", pending_job("transcribe", "tiny", "2025-01-02T00:00:00"))
+    job_queue.upsert("old", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) == (
+        "old",
+        "transcribe",
+    )
+    assert job_queue.get_status("old") == TranscriptionStatus.IN_PROGRESS.value
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) == (
+        "new",
+        "transcribe",
+    )
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) is None
+
+
+def test_claim_next_respects_priority(job_queue: JobQueue):
+    """Tests that a job with a higher priority is claimed before older jobs."""
+    job_queue.upsert("old", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.upsert(
+        "urgent", pending_job("align", "small", "2025-01-03T00:00:00", priority=1)
+    )
+
+    job = job_queue.claim_next(["transcribe", "align"], ["tiny", "small"], OWNER, 60)
+    assert job == ("urgent", "align")
+
+
+def test_claim_next_uses_rank(job_queue: JobQueue):
+    """Tests that the candidate with the lowest rank is claimed."""
+    job_queue.upsert("old", pending_job("transcribe", "small", "2025-01-01T00:00:00"))
+    job_queue.upsert("new", pending_job("transcribe", "tiny", "2025-01-02T00:00:00"))
+
+    def tiny_first(candidate: JobCandidate) -> tuple:
+        return (candidate.model != "tiny", candidate.start_time)
+
+    models = ["tiny", "small"]
+    assert job_queue.claim_next(["transcribe"], models, OWNER, 60, tiny_first) == (
+        "new",
+        "transcribe",
+    )
+    assert job_queue.claim_next(["transcribe"], models, OWNER, 60, tiny_first) == (
+        "old",
+        "transcribe",
+    )
+
+
+def test_claim_next_filters_task_and_model(job_queue: JobQueue):
+    """Tests that only jobs of the requested tasks and models are claimed."""
+    job_queue.upsert("large", pending_job("transcribe", "large", "2025-01-01T00:00:00"))
+    job_queue.upsert("translate", pending_job("translate", None, "2025-01-01T00:00:00"))
+
+    assert job_queue.claim_next(["transcribe"], ["tiny", None], OWNER, 60) is None
+    assert job_queue.claim_next(["translate"], [None], OWNER, 60) == (
+        "translate",
+        "translate",
+    )
+
+
+def test_claim_next_skips_jobs_without_start_time(job_queue: JobQueue):
+    """Tests that a job without a start time does not block the other jobs."""
+    job_queue.upsert("broken", pending_job("transcribe", "tiny", None))
+    job_queue.upsert("valid", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) == (
+        "valid",
+        "transcribe",
+    )
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) is None
+
+
+def test_rebuild_and_delete(job_queue: JobQueue):
+    """Tests rebuilding the index from status data and deleting entries."""
+    job_queue.upsert("stale", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.rebuild(
+        [("fresh", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"), 100)]
+    )
+    assert job_queue.get_status("stale") is None
+    assert job_queue.get_status("fresh") == TranscriptionStatus.IN_QUERY.value
+
+    job_queue.delete("fresh")
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) is None
+
+
+def test_claimed_job_is_leased(job_queue: JobQueue):
+    """Tests that a claimed job is leased to its owner until it is finished."""
+    job_queue.upsert("job", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60)
+
+    assert job_queue.holds_lease("job", OWNER)
+    assert job_queue.renew_lease("job", OWNER, 60)
+    assert not job_queue.renew_lease("job", "other-runner", 60)
+
+    job_queue.update_status("job", TranscriptionStatus.FINISHED.value)
+    assert not job_queue.holds_lease("job", OWNER)
+    assert not job_queue.renew_lease("job", OWNER, 60)
+
+
+def test_expired_lease_is_requeued(job_queue: JobQueue):
+    """Tests that a job of a crashed runner can be claimed by another runner."""
+    job_queue.upsert("job", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.claim_next(["transcribe"], ["tiny"], "crashed-runner", -1)
+
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) is None
+    assert job_queue.requeue_expired_leases() == ["job"]
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) == (
+        "job",
+        "transcribe",
+    )
+    assert job_queue.requeue_expired_leases() == []
+
+
+def test_hold_lease_renews_in_background(job_queue: JobQueue):
+    """Tests that the lease does not expire while it is held."""
+    job_queue.upsert("job", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 0.3)
+
+    with job_queue.hold_lease("job", OWNER, 0.3):
+        time.sleep(0.5)
+        assert job_queue.requeue_expired_leases() == []
+    assert job_queue.holds_lease("job", OWNER)
+
+
+def test_requeue_calls_back_within_transaction(job_queue: JobQueue):
+    """Tests that the requeued jobs can not be claimed before the callback ran."""
+    job_queue.upsert("job", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.claim_next(["transcribe"], ["tiny"], "crashed-runner", -1)
+    claims = []
+
+    def on_requeue(transcription_id: str):
+        # Another runner can not start the write transaction of a claim meanwhile
+        other = sqlite3.connect(TEST_DB_PATH, timeout=0, isolation_level=None)
+        with pytest.raises(sqlite3.OperationalError):
+            other.execute("BEGIN IMMEDIATE")
+        other.close()
+        claims.append(transcription_id)
+
+    assert job_queue.requeue_expired_leases(on_requeue) == ["job"]
+    assert claims == ["job"]
+    assert job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 60) == (
+        "job",
+        "transcribe",
+    )
+
+
+def test_hold_lease_survives_index_errors(job_queue: JobQueue):
+    """Tests that a failed renewal is retried instead of ending the heartbeat."""
+    job_queue.upsert("job", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"))
+    job_queue.claim_next(["transcribe"], ["tiny"], OWNER, 0.3)
+    renew_lease = job_queue.renew_lease
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_renew_lease(*args):
+        if failures:
+            raise failures.pop()
+        return renew_lease(*args)
+
+    with patch.object(job_queue, "renew_lease", side_effect=flaky_renew_lease):
+        with job_queue.hold_lease("job", OWNER, 0.3):
+            time.sleep(0.6)
+            assert job_queue.requeue_expired_leases() == []
+    assert not failures
+
+
+def test_changes_are_sequenced(job_queue: JobQueue):
+    """Tests that readers can follow the index by sequence number and generation."""
+    seq, generation = job_queue.get_state()
+    job_queue.upsert("a", pending_job("transcribe", "tiny", "2025-01-01T00:00:00"), 10)
+    job_queue.upsert("b", pending_job("transcribe", "tiny", "2025-01-02T00:00:00"), 20)
+    assert [change.transcription_id for change in job_queue.get_changes(seq)] == [
+        "a",
+        "b",
+    ]
+
+    seq, _ = job_queue.get_state()
+    job_queue.update_status("a", TranscriptionStatus.FINISHED.value, 30)
+    changes = job_queue.get_changes(seq)
+    assert len(changes) == 1
+    assert changes[0].status == TranscriptionStatus.FINISHED.value
+    assert changes[0].size == 30
+
+    job_queue.delete("b")
+    assert job_queue.get_state()[1] > generation
+    assert [change.transcription_id for change in job_queue.get_changes()] == ["a"]
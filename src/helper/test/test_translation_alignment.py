@@ -1,8 +1,13 @@
+from unittest.mock import patch
 
 import pytest
 from fastapi import HTTPException
 
-from src.helper.align_translation_segments import Transcript, align_segments
+from src.helper.align_translation_segments import (
+    Transcript,
+    align_segments,
+    proportional_word_bounds,
+)
 
 
 def test_align_segments_basic():
@@ -101,5 +106,46 @@ def test_align_segments_mismatched_length():
     assert result["segments"][0]["words"][2]["end"] == end
 
 
+def test_proportional_word_bounds():
+    # More translated than original words, the extra ones join the earlier words
+    assert proportional_word_bounds(2, 3) == [0, 2, 3]
+    # Fewer translated than original words, some original words stay empty
+    assert proportional_word_bounds(3, 2) == [0, 1, 2, 2]
+    assert proportional_word_bounds(1, 4) == [0, 4]
+    # Long texts are mapped with NumPy, the result is the same
+    for original_count, translated_count in [(200, 300), (300, 200), (1, 1000)]:
+        bounds = proportional_word_bounds(original_count, translated_count)
+        with patch("src.helper.align_translation_segments.VECTORIZE_MIN_WORDS", 10**9):
+            assert bounds == proportional_word_bounds(original_count, translated_count)
+
+
+def test_align_segments_squashes_empty_segments():
+    def segment(text, start, end):
+        return {
+            "text": text,
+            "start": start,
+            "end": end,
+            "words": [{"text": text, "start": start, "end": end, "probability": 0.9}],
+        }
+
+    original_transcript = Transcript(
+        text="one two three four",
+        segments=[
+            segment("one", 0.0, 1.0),
+            segment("two", 1.0, 2.0),
+            segment("three", 2.0, 3.0),
+            segment("four", 3.0, 4.0),
+        ],
+    )
+
+    result = align_segments(original_transcript, "eins drei")
+
+    # "two" and "four" get no translated word, their time goes to the segment before
+    assert [(seg["text"], seg["start"], seg["end"]) for seg in result["segments"]] == [
+        ("eins", 0.0, 2.0),
+        ("drei", 2.0, 4.0),
+    ]
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,124 @@
+"""This File contains tests for the TranslationCache class."""
+
+import os
+import time
+
+import pytest
+
+from src.helper.translation_cache import TranslationCache
+
+TEST_DB_PATH = os.getcwd() + "/src/helper/test/test_translations.db"
+MODEL = "seamless"
+
+
+@pytest.fixture
+def cache():
+    """Creates an empty translation cache and deletes it after the test."""
+    yield TranslationCache(TEST_DB_PATH)
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(TEST_DB_PATH + suffix):
+            os.remove(TEST_DB_PATH + suffix)
+
+
+def test_get_returns_stored_translation(cache: TranslationCache):
+    assert cache.get("Hello", "en", "de", MODEL) is None
+    cache.put("Hello", "en", "de", MODEL, "Hallo")
+
+    assert cache.get("Hello", "en", "de", MODEL) == "Hallo"
+    assert cache.get("Hello", "en", "fr", MODEL) is None
+    assert cache.get("Hello", "en", "de", "other-model") is None
+    assert cache.get_stats() == {
+        "memory_hits": 1,
+        "disk_hits": 0,
+        "misses": 3,
+        "hit_rate": 0.25,
+    }
+
+
+def test_translations_persist_across_instances(cache: TranslationCache):
+    cache.put("Hello", "en", "de", MODEL, "Hallo")
+
+    other = TranslationCache(TEST_DB_PATH)
+    assert other.get("Hello", "en", "de", MODEL) == "Hallo"
+    assert other.get("Hello", "en", "de", MODEL) == "Hallo"
+    assert other.disk_hits == 1
+    assert other.memory_hits == 1
+
+
+def test_memory_front_keeps_most_recently_used(cache: TranslationCache):
+    cache.max_memory_entries = 2
+    cache.put("one", "en", "de", MODEL, "eins")
+    cache.put("two", "en", "de", MODEL, "zwei")
+    cache.get("one", "en", "de", MODEL)
+    cache.put("three", "en", "de", MODEL, "drei")
+
+    # "two" was dropped from memory, but is still on disk
+    assert cache.get("two", "en", "de", MODEL) == "zwei"
+    assert cache.disk_hits == 1
+
+
+def test_expired_translations_are_misses(cache: TranslationCache):
+    cache.ttl_seconds = 0.05
+    cache.put("Hello", "en", "de", MODEL, "Hallo")
+    time.sleep(0.1)
+
+    assert cache.get("Hello", "en", "de", MODEL) is None
+    cache.evict()
+    count = cache._connection().execute("SELECT COUNT(*) FROM translations")
+    assert count.fetchone()[0] == 0
+
+
+def test_evict_drops_least_recently_used_over_budget(cache: TranslationCache):
+    for text in ["one", "two", "three"]:
+        cache.put(text, "en", "de", MODEL, text.upper())
+        time.sleep(0.01)
+    # The disk lookup marks "one" as used
+    cache._memory.clear()
+    cache.get("one", "en", "de", MODEL)
+
+    key_size = len(TranslationCache.key("one", "en", "de", MODEL))
+    cache.max_size_bytes = 2 * key_size + len("ONE") + len("THREE")
+    cache.evict()
+    cache._memory.clear()
+
+    assert cache.get("one", "en", "de", MODEL) == "ONE"
+    assert cache.get("three", "en", "de", MODEL) == "THREE"
+    assert cache.get("two", "en", "de", MODEL) is None
+
+
+def test_lookups_and_stores_of_a_transcript_take_one_write(cache: TranslationCache):
+    cache.put_many({"one": "eins", "two": "zwei"}, "en", "de", MODEL)
+    cache.get("two", "en", "de", MODEL)
+    cache._memory.clear()
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+
+    found = cache.get_many(["one", "two", "three"], "en", "de", MODEL)
+    assert found == {"one": "eins", "two": "zwei"}
+    # Lookups do not write
+    assert not any(statement.startswith("BEGIN") for statement in statements)
+
+    cache.put_many({"three": "drei"}, "en", "de", MODEL)
+    assert [s for s in statements if s.startswith("BEGIN")] == ["BEGIN IMMEDIATE"]
+    cache._connection().set_trace_callback(None)
+
+
+def test_uses_are_recorded_for_memory_hits(cache: TranslationCache):
+    cache.put("Hello", "en", "de", MODEL, "Hallo")
+    key = TranslationCache.key("Hello", "en", "de", MODEL)
+
+    def used_at():
+        return (
+            cache._connection()
+            .execute("SELECT used_at FROM translations WHERE key = ?", (key,))
+            .fetchone()[0]
+        )
+
+    stored_at = used_at()
+    time.sleep(0.01)
+    assert cache.get("Hello", "en", "de", MODEL) == "Hallo"
+    assert cache.memory_hits == 1
+    assert used_at() == stored_at
+
+    cache.put_many({}, "en", "de", MODEL)
+    assert used_at() > stored_at
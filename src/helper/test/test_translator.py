@@ -0,0 +1,236 @@
+"""This File contains tests for the Translator class."""
+
+import os
+from typing import List
+from unittest.mock import MagicMock, patch
+
+import pytest
+import torch
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from transformers import BatchEncoding
+
+from src.helper.SM4T_translate import Translator, pack_batches, resolve_dtype
+from src.helper.translation_cache import TranslationCache
+
+TEST_DB_PATH = os.getcwd() + "/src/helper/test/test_translator_cache.db"
+
+
+class WordTokenizer:
+    """Tokenizes by words, the ids of a word are its position in a vocabulary."""
+
+    def __init__(self):
+        self.vocabulary: List[str] = ["<pad>"]
+
+    def _ids(self, text: str) -> List[int]:
+        ids = []
+        for word in text.split():
+            if word not in self.vocabulary:
+                self.vocabulary.append(word)
+            ids.append(self.vocabulary.index(word))
+        return ids
+
+    def __call__(self, texts, return_tensors=None, padding=False, src_lang=None):
+        if isinstance(texts, str):
+            texts = [texts]
+        input_ids = [self._ids(text) for text in texts]
+        if return_tensors is None:
+            return {"input_ids": input_ids}
+        longest = max(len(ids) for ids in input_ids)
+        padded = [ids + [0] * (longest - len(ids)) for ids in input_ids]
+        return BatchEncoding({"input_ids": torch.tensor(padded)})
+
+    def batch_decode(self, outputs, skip_special_tokens=True):
+        return [
+            " ".join(self.vocabulary[i] for i in ids.tolist() if i != 0)
+            for ids in outputs
+        ]
+
+
+class UpperCaseModel:
+    """Translates by upper casing, records the shape of every batch."""
+
+    def __init__(self, tokenizer: WordTokenizer):
+        self.tokenizer = tokenizer
+        self.batches = []
+
+    def generate(self, input_ids, tgt_lang):
+        self.batches.append(tuple(input_ids.shape))
+        words = [
+            [self.tokenizer.vocabulary[i].upper() for i in ids.tolist() if i != 0]
+            for ids in input_ids
+        ]
+        return self.tokenizer(
+            [" ".join(text) for text in words], return_tensors="pt", padding=True
+        )["input_ids"]
+
+
+def create_translator(batch_tokens: int) -> Translator:
+    translator = Translator.__new__(Translator)
+    translator.device = "cpu"
+    translator.tokenizer = WordTokenizer()
+    translator.model = UpperCaseModel(translator.tokenizer)
+    translator.batch_tokens = batch_tokens
+    translator.text_splitter = RecursiveCharacterTextSplitter(chunk_size=512)
+    translator.model_name = "upper-case"
+    translator.cache_model = "upper-case"
+    translator.cache = None
+    return translator
+
+
+@pytest.fixture
+def cache():
+    """Creates an empty translation cache and deletes it after the test."""
+    yield TranslationCache(TEST_DB_PATH)
+    for suffix in ["", "-wal", "-shm"]:
+        if os.path.exists(TEST_DB_PATH + suffix):
+            os.remove(TEST_DB_PATH + suffix)
+
+
+def test_pack_batches_sorts_by_length():
+    assert pack_batches([3, 1, 2, 1], 100) == [[1, 3, 2, 0]]
+
+
+def test_pack_batches_respects_token_budget():
+    lengths = [5, 1, 4, 2, 3, 1]
+    batches = pack_batches(lengths, 6)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(6))
+    for batch in batches:
+        longest = max(lengths[i] for i in batch)
+        assert len(batch) == 1 or len(batch) * longest <= 6
+
+
+def test_pack_batches_gives_long_inputs_their_own_batch():
+    assert pack_batches([10, 1], 4) == [[1], [0]]
+    assert pack_batches([], 4) == []
+
+
+def test_translate_batch_keeps_order():
+    translator = create_translator(batch_tokens=8)
+    texts = ["one two three four", "five", "six seven", "", "eight nine ten"]
+
+    translated = translator.translate_batch(texts, "en", "de")
+
+    assert translated == [
+        "ONE TWO THREE FOUR",
+        "FIVE",
+        "SIX SEVEN",
+        "",
+        "EIGHT NINE TEN",
+    ]
+    # Several inputs per generate call, each within the token budget
+    assert len(translator.model.batches) < 4
+    assert all(size * length <= 8 for size, length in translator.model.batches)
+
+
+def test_translate_batch_uses_cache(cache: TranslationCache):
+    translator = create_translator(batch_tokens=64)
+    translator.cache = cache
+    cache.put("cached text", "en", "de", "upper-case", "aus dem cache")
+
+    translated = translator.translate_batch(
+        ["intro", "cached text", "intro", "outro"], "en", "de"
+    )
+
+    assert translated == ["INTRO", "aus dem cache", "INTRO", "OUTRO"]
+    # The repeated intro is translated once
+    assert translator.model.batches == [(2, 1)]
+
+    translator.model.batches = []
+    assert translator.translate_text("outro", "en", "de") == "OUTRO"
+    assert translator.translate_batch(["intro", "outro"], "en", "de") == [
+        "INTRO",
+        "OUTRO",
+    ]
+    assert translator.model.batches == []
+
+
+@patch("src.helper.SM4T_translate.create_translation_cache", return_value=None)
+@patch("src.helper.SM4T_translate.SeamlessM4Tv2ForTextToText")
+@patch("src.helper.SM4T_translate.SeamlessM4TTokenizer")
+def test_model_is_loaded_on_first_use(tokenizer_class, model_class, _):
+    tokenizer = WordTokenizer()
+    tokenizer_class.from_pretrained.return_value = tokenizer
+    model = MagicMock()
+    model.to.return_value = UpperCaseModel(tokenizer)
+    model_class.from_pretrained.return_value = model
+
+    translator = Translator(
+        {
+            "translation_device": "cpu",
+            "translation_model": "seamless",
+            "translation_dtype": "bfloat16",
+            "translation_idle_unload_seconds": 60,
+        }
+    )
+    model_class.from_pretrained.assert_not_called()
+
+    assert translator.translate_batch(["hello"], "en", "de") == ["HELLO"]
+    assert translator.translate_text("world", "en", "de") == "WORLD"
+    model_class.from_pretrained.assert_called_once()
+    assert model_class.from_pretrained.call_args.kwargs["torch_dtype"] == (
+        torch.bfloat16
+    )
+
+    assert not translator.unload_if_idle()
+    translator.last_used -= 61
+    assert translator.unload_if_idle()
+    assert translator.model is None
+
+    assert translator.translate_text("again", "en", "de") == "AGAIN"
+    assert model_class.from_pretrained.call_count == 2
+    tokenizer_class.from_pretrained.assert_called_once()
+
+    # A translation that outlasts the timeout keeps the model loaded
+    generate = translator.model.generate
+
+    def slow_generate(**kwargs):
+        translator.last_used -= 61
+        return generate(**kwargs)
+
+    translator.model.generate = slow_generate
+    assert translator.translate_text("long", "en", "de") == "LONG"
+    assert not translator.unload_if_idle()
+    assert translator.translate_batch(["longer"], "en", "de") == ["LONGER"]
+    assert not translator.unload_if_idle()
+    assert model_class.from_pretrained.call_count == 2
+
+
+def test_resolve_dtype_falls_back_to_supported_dtypes():
+    assert resolve_dtype("cpu", "float32", "none") == torch.float32
+    assert resolve_dtype("cpu", "bfloat16", "none") == torch.bfloat16
+    assert resolve_dtype("cpu", "float16", "none") == torch.float32
+    assert resolve_dtype("cpu", "float16", "int8") == torch.float32
+    with patch("torch.cuda.is_bf16_supported", return_value=False):
+        assert resolve_dtype("cuda:0", "bfloat16", "none") == torch.float16
+    with pytest.raises(ValueError):
+        resolve_dtype("cuda:0", "float32", "int8")
+    with pytest.raises(ValueError):
+        resolve_dtype("cpu", "float8", "none")
+
+
+def test_translations_are_cached_per_precision(cache: TranslationCache):
+    def create(dtype: str, quantization: str) -> Translator:
+        with patch(
+            "src.helper.SM4T_translate.create_translation_cache", return_value=cache
+        ):
+            return Translator(
+                {
+                    "translation_device": "cpu",
+                    "translation_model": "seamless",
+                    "translation_dtype": dtype,
+                    "translation_quantization": quantization,
+                }
+            )
+
+    create("float32", "none")._store({"hello": "hallo"}, "en", "de")
+
+    assert create("float32", "none")._get_cached(["hello"], "en", "de") == {
+        "hello": "hallo"
+    }
+    assert create("bfloat16", "none")._get_cached(["hello"], "en", "de") == {}
+    assert create("float32", "int8")._get_cached(["hello"], "en", "de") == {}
+    # float16 falls back to float32 on CPU, it is the same precision
+    assert create("float16", "none")._get_cached(["hello"], "en", "de") == {
+        "hello": "hallo"
+    }
@@ -11,11 +11,15 @@ DATA_HANDLER = DataHandler()
 
 @pytest.fixture(autouse=True)
 def cleanup_data():
-    """deletes all .json in the status folder and all .wav in the audio folder"""
+    """deletes all .json in the status and result folders, all .wav in the audio folder and the job index"""
     yield
+    DATA_HANDLER.job_queue.clear()
     for file in os.listdir(DATA_HANDLER.status_path):
         if file.endswith(".json"):
             os.remove(os.path.join(DATA_HANDLER.status_path, file))
+    for file in os.listdir(DATA_HANDLER.result_path):
+        if file.endswith(".json") or file.endswith(".json.gz"):
+            os.remove(os.path.join(DATA_HANDLER.result_path, file))
     for file in os.listdir(DATA_HANDLER.audio_file_path):
         if file.endswith(".wav"):
             os.remove(os.path.join(DATA_HANDLER.audio_file_path, file))
@@ -0,0 +1,275 @@
+"""This module contains a persistent cache of translated texts."""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, NamedTuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds a connection waits for a lock held by another process
+BUSY_TIMEOUT_SECONDS = 30
+
+# Stores between two evictions of expired and least recently used translations
+EVICT_EVERY_STORES = 100
+
+# Keys that are looked up on disk with one query
+LOOKUP_BATCH_SIZE = 500
+
+
+class CachedTranslation(NamedTuple):
+    translation: str
+    # Seconds since the epoch, translations expire `ttl_seconds` after it
+    created_at: float
+
+
+class TranslationCache:
+    """
+    Translations keyed by (text, source language, target language, model).
+
+    The translations are stored in a SQLite (WAL mode) database that is shared by all
+    runners and survives restarts, the `max_memory_entries` most recently used ones
+    are kept in memory in front of it. Translations expire `ttl_seconds` after they
+    were stored. The database is kept below `max_size_bytes` of translated text by
+    dropping the least recently used translations, so the budget is exceeded by at
+    most the stores since the last eviction.
+
+    Lookups only read the database. The use of a translation, from memory or disk, is
+    recorded in memory and written together with the next stores or eviction, so the
+    lookups and stores of a transcript take one write transaction.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_memory_entries: int = 10000,
+        max_size_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 30 * 24 * 3600,
+    ):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_size_bytes = max_size_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict[str, CachedTranslation] = OrderedDict()
+        # Last use of the translations since the last write, by key
+        self._used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stores = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._setup()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns a connection for the current process and thread."""
+        connection = getattr(self._local, "connection", None)
+        # Connections must not be shared with forked processes
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _setup(self) -> None:
+        """Creates the table and indexes if they do not exist."""
+        connection = self._connection()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS translations_used ON translations (used_at)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS translations_created ON translations (created_at)"
+        )
+
+    @staticmethod
+    def key(text: str, from_code: str, to_code: str, model: str) -> str:
+        """Digest of everything the translation depends on."""
+        return hashlib.blake2b(
+            "\0".join([model, from_code, to_code, text]).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+
+    def get(self, text: str, from_code: str, to_code: str, model: str) -> str | None:
+        """Returns the cached translation, None if there is none or it expired."""
+        return self.get_many([text], from_code, to_code, model).get(text)
+
+    def get_many(
+        self, texts: Iterable[str], from_code: str, to_code: str, model: str
+    ) -> Dict[str, str]:
+        """Returns the cached translations by text, texts without one are left out."""
+        keys = {
+            TranslationCache.key(text, from_code, to_code, model): text
+            for text in texts
+        }
+        now = time.time()
+        found: Dict[str, str] = {}
+        lookup = []
+        with self._lock:
+            for key, text in keys.items():
+                cached = self._memory.get(key)
+                if cached is None or self._expired(cached, now):
+                    lookup.append(key)
+                    continue
+                self._memory.move_to_end(key)
+                self._used[key] = now
+                self.memory_hits += 1
+                found[text] = cached.translation
+
+        rows: Dict[str, CachedTranslation] = {}
+        connection = self._connection()
+        for i in range(0, len(lookup), LOOKUP_BATCH_SIZE):
+            batch = lookup[i : i + LOOKUP_BATCH_SIZE]
+            for key, translation, created_at in connection.execute(
+                "SELECT key, translation, created_at FROM translations "
+                + f"WHERE key IN ({', '.join('?' * len(batch))})",
+                batch,
+            ):
+                rows[key] = CachedTranslation(translation, created_at)
+
+        with self._lock:
+            for key in lookup:
+                cached = rows.get(key)
+                if cached is None or self._expired(cached, now):
+                    self._memory.pop(key, None)
+                    self.misses += 1
+                    continue
+                self._remember(key, cached)
+                self._used[key] = now
+                self.disk_hits += 1
+                found[keys[key]] = cached.translation
+        return found
+
+    def put(
+        self, text: str, from_code: str, to_code: str, model: str, translation: str
+    ) -> None:
+        """Stores a translation, replacing an older one of the same text."""
+        self.put_many({text: translation}, from_code, to_code, model)
+
+    def put_many(
+        self, translations: Dict[str, str], from_code: str, to_code: str, model: str
+    ) -> None:
+        """
+        Stores translations by text, replacing older ones of the same texts.
+
+        The recorded uses of cached translations are written in the same transaction,
+        so this is called after the lookups of a transcript even without new ones.
+        """
+        created_at = time.time()
+        rows = []
+        for text, translation in translations.items():
+            key = TranslationCache.key(text, from_code, to_code, model)
+            size = len(key) + len(translation.encode("utf-8"))
+            rows.append((key, translation, size, created_at, created_at))
+        with self._lock:
+            for key, translation, *_ in rows:
+                self._remember(key, CachedTranslation(translation, created_at))
+                self._used.pop(key, None)
+            used, self._used = self._used, {}
+            self._stores += len(rows)
+            evict = self._stores >= EVICT_EVERY_STORES
+            if evict:
+                self._stores = 0
+        if not rows and not used:
+            return
+
+        with self._transaction() as connection:
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO translations
+                    (key, translation, size, created_at, used_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            TranslationCache._write_used(connection, used)
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Deletes the expired translations and the least recently used over budget."""
+        with self._lock:
+            used, self._used = self._used, {}
+        with self._transaction() as connection:
+            # The recorded uses decide which translations are the least recently used
+            TranslationCache._write_used(connection, used)
+            connection.execute(
+                "DELETE FROM translations WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            connection.execute(
+                """
+                DELETE FROM translations WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY used_at DESC, key
+                        ) AS total_size
+                        FROM translations
+                    )
+                    WHERE total_size > ?
+                )
+                """,
+                (self.max_size_bytes,),
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """Runs the enclosed statements in one write transaction."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _write_used(connection: sqlite3.Connection, used: Dict[str, float]) -> None:
+        # Another runner may have used a translation more recently
+        connection.executemany(
+            "UPDATE translations SET used_at = MAX(used_at, ?) WHERE key = ?",
+            [(used_at, key) for key, used_at in used.items()],
+        )
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the hits and misses since the start and the resulting hit rate."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def _expired(self, cached: CachedTranslation, now: float) -> bool:
+        return cached.created_at < now - self.ttl_seconds
+
+    def _remember(self, key: str, cached: CachedTranslation) -> None:
+        """Puts a translation in the memory front, must hold the lock."""
+        self._memory[key] = cached
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
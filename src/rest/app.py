@@ -1,10 +1,12 @@
+import asyncio
 import json
 import logging
-import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
 from random import choice
-from typing import List, Literal
+from typing import Any, Callable, List, Literal
 
 from fastapi import (
     Body,
@@ -13,6 +15,7 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Query,
     Security,
     UploadFile,
 )
@@ -23,7 +26,6 @@ from starlette.status import HTTP_401_UNAUTHORIZED
 
 from src.helper.config import CONFIG, ConfigResponse
 from src.helper.data_handler import DataHandler
-from src.helper.file_handler import FileHandler
 from src.helper.SM4T_translate import check_language_supported_guard
 from src.helper.time_it import time_it
 from src.helper.types.transcription_data import (
@@ -38,9 +40,23 @@ from src.helper.types.transcription_data import (
 from src.helper.types.transcription_status import TranscriptionStatus
 from src.helper.types.translation_consts import TranslationPostResults
 from src.helper.util import load_example_translation
+from src.rest.audio_ingest import AudioIngest
+from src.rest.job_notifier import JobNotifier
+from src.rest.status_cache import StatusCache
 
 LOGGER = logging.getLogger(__name__)
 DATA_HANDLER = DataHandler()
+# Answers list requests from memory, follows the job index of DATA_HANDLER
+STATUS_CACHE = StatusCache(DATA_HANDLER.job_queue)
+# Converts uploads in a bounded pool of threads, off the event loop
+AUDIO_INGEST = AudioIngest()
+# Runs the blocking file system work of the handlers, see run_blocking
+IO_EXECUTOR = ThreadPoolExecutor(
+    max_workers=CONFIG["api_io_workers"], thread_name_prefix="api_io"
+)
+# Set by the REST entry point, wakes up the runners on new jobs
+JOB_NOTIFIER: JobNotifier | None = None
+TRANSLATION_NOTIFIER: JobNotifier | None = None
 
 config = CONFIG
 
@@ -56,6 +72,38 @@ app.add_middleware(
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
 
 
+def set_job_notifier(
+    job_notifier: JobNotifier | None,
+    translation_notifier: JobNotifier | None = None,
+) -> None:
+    """
+    Sets the notifiers that are used to wake up the runners on new jobs, translation
+    jobs wake up the translation runners if they have a notifier of their own.
+    """
+    global JOB_NOTIFIER, TRANSLATION_NOTIFIER
+    JOB_NOTIFIER = job_notifier
+    TRANSLATION_NOTIFIER = translation_notifier
+
+
+def notify_runners(translation: bool = False) -> None:
+    """
+    Wakes up idle runners, if a notifier is set. Takes the lock of the notifier, so
+    the handlers call it through run_blocking.
+    """
+    notifier = JOB_NOTIFIER
+    if translation and TRANSLATION_NOTIFIER is not None:
+        notifier = TRANSLATION_NOTIFIER
+    if notifier is not None:
+        notifier.notify()
+
+
+async def run_blocking(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs blocking work in the IO_EXECUTOR, so the event loop stays responsive."""
+    return await asyncio.get_running_loop().run_in_executor(
+        IO_EXECUTOR, partial(function, *args, **kwargs)
+    )
+
+
 def custom_openapi():
     """Modify the openapi definition to include our auth schema"""
     if not app.openapi_schema:
@@ -84,7 +132,7 @@ async def require_api_key(api_key: str = Security(api_key_header)):
 
 def require_translation_enabled():
     """Dependency to require translation to be enabled."""
-    if not any(
+    if not CONFIG["translation_workers"] and not any(
         runner_config.get("translation_enabled", False)
         for runner_config in CONFIG["rest_runner"]
     ):
@@ -127,22 +175,21 @@ async def health_check():
     dependencies=[Depends(require_api_key)],
     response_model=List[TranscriptionListResponse],
 )
-async def get_transcriptions():
-    """Get all transcriptions and their statuses."""
-    transcriptions = []
-    for file_name in DATA_HANDLER.get_all_status_filenames():
-        try:
-            file_name = file_name[:-5]  # remove .json
-            data = DATA_HANDLER.get_status_file_by_id(file_name)
-            transcriptions.append(
-                {
-                    "transcription_id": data["transcription_id"],
-                    "status": data["status"],
-                }
-            )
-        except Exception as e:
-            LOGGER.error(f"Error while reading status file {file_name}: {e}")
-            DATA_HANDLER.delete_status_file(file_name)
+async def get_transcriptions(
+    status: TranscriptionStatus | None = None,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1),
+):
+    """Get all transcriptions and their statuses, optionally filtered by status."""
+    transcriptions = [
+        {"transcription_id": entry.transcription_id, "status": entry.status}
+        for entry in await run_blocking(
+            STATUS_CACHE.list,
+            status.value if status else None,
+            offset=offset,
+            limit=limit,
+        )
+    ]
     return JSONResponse(content=transcriptions, status_code=200)
 
 
@@ -154,7 +201,7 @@ async def get_transcriptions():
 )
 async def get_transcriptions_id(transcription_id: str):
     """Get the status of a transcription by ID."""
-    file = DATA_HANDLER.get_status_file_by_id(transcription_id)
+    file = await run_blocking(DATA_HANDLER.get_transcription_by_id, transcription_id)
     if file:
         return JSONResponse(content=file, status_code=200)
     raise HTTPException(status_code=404, detail="Transcription ID not found")
@@ -191,34 +238,28 @@ async def post_transcription(
             detail=f'Requested Model not available. Requested: {model} Configured Models: {", ".join(config["rest_models"])}. A teapot cannot brew coffee.',
         )
 
+    if task.endswith("align") and (not text or not language):
+        missing_field = "text" if not text else "language"
+        raise HTTPException(
+            status_code=400,
+            detail=f"property {missing_field} is required for task align",
+        )
+
     transcription_id = str(uuid.uuid4())
     try:
-        audio, validation_erros = FileHandler.load_into_valid_audiosegment(file)
+        validation_erros = await AUDIO_INGEST.ingest(file, transcription_id)
         if len(validation_erros) > 0:
             LOGGER.debug("File upload was rejected due to validation errors.")
             raise HTTPException(
                 status_code=400,
                 detail=validation_erros,
             )
-        result = DATA_HANDLER.save_audio_file(audio, transcription_id)
-        if not result["success"]:
-            # If file could not be saved something is very wrong
-            raise Exception(result["message"])
     except HTTPException as e:
         raise e
     except Exception as e:
         LOGGER.error(f"Audio processing error: {e}")
         raise HTTPException(status_code=500, detail="Something went wrong")
 
-    time.sleep(0.1)  # TODO: Remove this line...
-
-    if task.endswith("align") and (not text or not language):
-        missing_field = "text" if not text else "language"
-        raise HTTPException(
-            status_code=400,
-            detail=f"property {missing_field} is required for task align",
-        )
-
     settings_dict = json.loads(settings) if settings else None
     data = TranscriptionData(
         transcription_id=transcription_id,
@@ -231,7 +272,8 @@ async def post_transcription(
         language=language,
     )
 
-    DATA_HANDLER.write_status_file(transcription_id, data)
+    await run_blocking(DATA_HANDLER.write_status_file, transcription_id, data)
+    await run_blocking(notify_runners)
     return JSONResponse(content=data, status_code=200)
 
 
@@ -243,7 +285,7 @@ async def post_transcription(
 )
 async def get_stream_transcript_export(transcription_id: str):
     """Get the transcription JSON for a specific ID."""
-    file = DATA_HANDLER.get_export_json_by_id(transcription_id)
+    file = await run_blocking(DATA_HANDLER.get_export_json_by_id, transcription_id)
     if file:
         return JSONResponse(content=file, status_code=200)
     raise HTTPException(status_code=404, detail="Transcription ID not found")
@@ -257,7 +299,7 @@ async def get_stream_transcript_export(transcription_id: str):
 )
 async def get_stream_audio_export(transcription_id: str):
     """Get the audio WAV file for a specific transcription ID."""
-    file = DATA_HANDLER.get_audio_file_by_id(transcription_id)
+    file = await run_blocking(DATA_HANDLER.get_audio_file_by_id, transcription_id)
 
     if file is None:
         raise HTTPException(status_code=404, detail="File not found")
@@ -300,7 +342,14 @@ async def translate(
     transcription.start_time = (
         datetime.now(timezone.utc).replace(microsecond=0).isoformat()
     )
-    DATA_HANDLER.write_status_file(transcription_id, transcription.model_dump())
+    status_data = transcription.model_dump()
+    # The transcript is the payload of the job, the status file stays small
+    if not await run_blocking(
+        DATA_HANDLER.write_input_file, transcription_id, status_data.pop("transcript")
+    ):
+        raise HTTPException(status_code=500, detail="Could not store the transcript.")
+    await run_blocking(DATA_HANDLER.write_status_file, transcription_id, status_data)
+    await run_blocking(notify_runners, translation=True)
 
     return JSONResponse(content={"id": transcription_id}, status_code=200)
 
@@ -314,7 +363,7 @@ async def translate(
 )
 async def get_translated(transcription_id: str):
     """Get the translated file for a specific ID."""
-    file = DATA_HANDLER.get_status_file_by_id(transcription_id)
+    file = await run_blocking(DATA_HANDLER.get_status_file_by_id, transcription_id)
 
     if file:
         if file["status"] != TranscriptionStatus.FINISHED.value:
@@ -322,5 +371,8 @@ async def get_translated(transcription_id: str):
                 key: value for key, value in file.items() if key != "transcript"
             }
             return JSONResponse(content=filtered_file, status_code=200)
+        file = await run_blocking(
+            DATA_HANDLER.get_transcription_by_id, transcription_id
+        )
         return JSONResponse(content=file, status_code=200)
     raise HTTPException(status_code=404, detail="Transcription ID not found")
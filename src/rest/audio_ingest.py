@@ -0,0 +1,160 @@
+"""This module contains the ingest of uploaded audio files for the REST API."""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List
+
+from fastapi import UploadFile
+from pydub.utils import get_encoder_name, get_prober_name
+
+from src.helper.config import CONFIG
+from src.helper.file_handler import MAX_AUDIO_LENGTH, TEMP_FILE_SUFFIX
+
+LOGGER = logging.getLogger(__name__)
+
+# Bytes copied at once while spooling an upload to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class AudioIngest:
+    """
+    Stores uploaded audio files as 16 kHz mono WAV files in the audio folder.
+
+    Uploads are spooled to disk in chunks, validated by their container metadata
+    (ffprobe) and converted by an ffmpeg process. Neither step decodes the audio in
+    the API process, so its memory stays bounded by the chunk size. All blocking work
+    runs in a bounded pool of threads, the event loop only awaits the result.
+    """
+
+    def __init__(
+        self,
+        audio_file_path: str = CONFIG["audio_file_path"],
+        audio_file_format: str = CONFIG["audio_file_format"],
+        max_workers: int = CONFIG["upload_conversion_workers"],
+    ):
+        self.audio_file_path = os.path.join(os.getcwd(), audio_file_path)
+        self.audio_file_format = audio_file_format
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="audio_ingest"
+        )
+        os.makedirs(self.audio_file_path, exist_ok=True)
+
+    async def ingest(self, file: UploadFile, transcription_id: str) -> List[str]:
+        """
+        Stores the uploaded file as audio file of the given transcription_id.
+
+        Returns:
+            The validation errors, the file is only stored if there are none.
+        Raises:
+            Exception if a valid file could not be converted.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._ingest, file.file, transcription_id
+        )
+
+    def _ingest(self, source: BinaryIO, transcription_id: str) -> List[str]:
+        """Spools, validates and converts an upload, runs in the worker pool."""
+        upload_path = os.path.join(
+            self.audio_file_path, f".{transcription_id}.upload{TEMP_FILE_SUFFIX}"
+        )
+        try:
+            source.seek(0)
+            with open(upload_path, "wb") as upload:
+                shutil.copyfileobj(source, upload, UPLOAD_CHUNK_SIZE)
+
+            errors = AudioIngest.validate(AudioIngest.probe(upload_path))
+            if errors:
+                return errors
+            self._convert(upload_path, transcription_id)
+            return []
+        finally:
+            if os.path.exists(upload_path):
+                os.remove(upload_path)
+
+    @staticmethod
+    def probe(file_path: str) -> dict | None:
+        """Reads the container metadata of a file, None if it is no media file."""
+        process = subprocess.run(
+            [
+                get_prober_name(),
+                "-v",
+                "error",
+                "-print_format",
+                "json",
+                "-show_format",
+                "-show_streams",
+                file_path,
+            ],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+        )
+        if process.returncode != 0:
+            return None
+        return json.loads(process.stdout)
+
+    @staticmethod
+    def validate(metadata: dict | None) -> List[str]:
+        """Checks the metadata of an upload against the limits of the service."""
+        if metadata is None or not any(
+            stream.get("codec_type") == "audio"
+            for stream in metadata.get("streams", [])
+        ):
+            return [
+                "Could not decode file using ffprobe. This is an indicator that the uploaded file is corrupted or not supported."
+            ]
+        try:
+            duration = float(metadata.get("format", {}).get("duration"))
+        except (TypeError, ValueError):
+            # ffprobe reports no duration (or "N/A") for truncated streams
+            duration = 0
+        if not duration > 0:
+            return [
+                "Could not determine the audio length. This is an indicator that the uploaded file is corrupted or not supported."
+            ]
+        if duration > MAX_AUDIO_LENGTH:
+            return [
+                f"Maximum allowed audio length exceeded. Max audio length is at {MAX_AUDIO_LENGTH} seconds."
+            ]
+        return []
+
+    def _convert(self, upload_path: str, transcription_id: str) -> None:
+        """Converts an upload to a 16 kHz mono WAV file with ffmpeg."""
+        target_path = os.path.join(
+            self.audio_file_path, f"{transcription_id}{self.audio_file_format}"
+        )
+        temp_path = f"{target_path}{TEMP_FILE_SUFFIX}"
+        process = subprocess.run(
+            [
+                get_encoder_name(),
+                "-nostdin",
+                "-v",
+                "error",
+                "-y",
+                "-i",
+                upload_path,
+                "-vn",
+                "-ac",
+                "1",
+                "-ar",
+                "16000",
+                "-c:a",
+                "pcm_s16le",
+                "-f",
+                "wav",
+                temp_path,
+            ],
+            capture_output=True,
+        )
+        if process.returncode != 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise Exception(
+                f"Audio File creation failed for: {process.stderr.decode(errors='replace')}"
+            )
+        # The runners only see complete audio files
+        os.replace(temp_path, target_path)
@@ -0,0 +1,39 @@
+"""This module contains the wakeup signal between the REST API and its runners."""
+
+import multiprocessing
+
+
+class JobNotifier:
+    """
+    Wakes up idle runners as soon as a new job is posted to the REST API.
+
+    The notifier has to be created before the API and runner processes are started and
+    passed to them. A generation counter guards against lost wakeups: a runner remembers
+    the generation before it looks for a job and only sleeps while no job was posted since.
+    """
+
+    def __init__(self):
+        self._condition = multiprocessing.Condition()
+        self._generation = multiprocessing.Value("Q", 0, lock=False)
+
+    def generation(self) -> int:
+        """Returns the number of notifications so far."""
+        with self._condition:
+            return self._generation.value
+
+    def notify(self) -> None:
+        """Signals all waiting runners that a new job was posted."""
+        with self._condition:
+            self._generation.value += 1
+            self._condition.notify_all()
+
+    def wait(self, seen_generation: int, timeout: float) -> bool:
+        """
+        Blocks until a job was posted after `seen_generation` or the timeout passed.
+
+        Returns True if a notification arrived.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._generation.value != seen_generation, timeout
+            )
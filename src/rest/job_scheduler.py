@@ -0,0 +1,89 @@
+"""This module contains the model affinity aware job selection of the REST runners."""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+
+from src.helper.job_queue import JobCandidate
+
+LOGGER = logging.getLogger(__name__)
+
+
+def start_timestamp(start_time: str) -> float:
+    """Converts the ISO start time of a job to seconds since the epoch."""
+    start = datetime.fromisoformat(start_time)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start.timestamp()
+
+
+class JobScheduler:
+    """
+    Chooses the next job of a runner by weighing its age against a model switch.
+
+    A job for a model that is not loaded is treated as if it was posted
+    `model_switch_cost_seconds` later, so jobs for the loaded models are batched as
+    long as the other jobs are not much older. Jobs that waited `max_job_wait_seconds`
+    are claimed first regardless of their model, which bounds the starvation.
+    Priorities always come first.
+
+    The scheduler also collects the queue wait time of the claimed jobs.
+    """
+
+    def __init__(self, config: dict):
+        # possible config options:
+        #   model_switch_cost_seconds: 60
+        #   max_job_wait_seconds: 900
+        self.model_switch_cost_seconds = config.get("model_switch_cost_seconds", 60)
+        self.max_job_wait_seconds = config.get("max_job_wait_seconds", 900)
+
+        self.claimed_jobs = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def ranker(
+        self, loaded_models: List[str | None], default_model: str | None = None
+    ) -> Callable[[JobCandidate], tuple]:
+        """
+        Returns the rank function for `JobQueue.claim_next` given the loaded models,
+        transcription jobs without a model are processed with the `default_model`.
+        """
+        now = time.time()
+
+        def rank(candidate: JobCandidate) -> tuple:
+            start = start_timestamp(candidate.start_time)
+            if now - start >= self.max_job_wait_seconds:
+                # Starving jobs first, the oldest of them first
+                return (-candidate.priority, 0, start)
+            model = candidate.model
+            if model is None and candidate.task != "translate":
+                model = default_model
+            # Translation jobs do not switch the model
+            if model is not None and model not in loaded_models:
+                start += self.model_switch_cost_seconds
+            return (-candidate.priority, 1, start)
+
+        return rank
+
+    def record_claim(self, start_time: str | None) -> float:
+        """Records the queue wait time of a claimed job and returns it."""
+        if start_time is None:
+            return 0.0
+        wait_seconds = max(0.0, time.time() - start_timestamp(start_time))
+        self.claimed_jobs += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return wait_seconds
+
+    def get_stats(self) -> dict:
+        """Returns the wait time statistics of the claimed jobs."""
+        return {
+            "claimed_jobs": self.claimed_jobs,
+            "mean_wait_seconds": (
+                self.total_wait_seconds / self.claimed_jobs
+                if self.claimed_jobs
+                else 0.0
+            ),
+            "max_wait_seconds": self.max_wait_seconds,
+        }
@@ -1,7 +1,11 @@
 """Module to handle the transcription process"""
 
+import gc
 import logging
+import os
+from collections import OrderedDict
 from dataclasses import asdict
+from typing import List
 
 from src.helper.forced_alignment import align_ground_truth
 from faster_whisper import WhisperModel, BatchedInferencePipeline
@@ -29,6 +33,8 @@ class Transcriber:
         #   num_workers: 1
         #   cpu_threads: 4
         #   transcription_mode: default
+        #   max_loaded_models: 2
+        #   model_memory_budget_mb: 8000
 
         self.device = config.get("device", "cpu")
 
@@ -46,6 +52,12 @@ class Transcriber:
 
         self.transcription_mode = config.get("transcription_mode", "default")
 
+        # Models are kept loaded (LRU) to avoid reloading them on every switch
+        self.max_loaded_models = max(1, config.get("max_loaded_models", 2))
+
+        # Optional limit of the loaded models, estimated by their size on disk
+        self.model_memory_budget_mb = config.get("model_memory_budget_mb", None)
+
         # Avoiding Compute Type mismatch
         if (
             (self.device == "cpu" and self.compute_type == "int8")
@@ -62,6 +74,11 @@ class Transcriber:
             self.compute_type = "int8"
 
         self.model: WhisperModel = None
+        # Least recently used first
+        self.loaded_models: OrderedDict[str, WhisperModel] = OrderedDict()
+        self.model_sizes_mb: dict[str, float] = {}
+        # Loads of a model while another one was loaded already
+        self.model_switches = 0
         ModelHandler().setup_model(self.supported_models[-1])
         self.loaded_model_name = None
         self.load_model(self.supported_models[-1])
@@ -72,14 +89,25 @@ class Transcriber:
     def get_preferred_model(self) -> str:
         return self.supported_models[-1]
 
+    def get_loaded_models(self) -> List[str]:
+        """Returns the names of the loaded models, the most recently used first."""
+        return list(reversed(self.loaded_models))
+
     def load_model(self, model) -> bool:
-        """loads the model if not loaded"""
+        """loads the model if not loaded, evicts the least recently used models"""
 
-        if self.loaded_model_name == model:
+        if model in self.loaded_models:
+            self.loaded_models.move_to_end(model)
+            self.model = self.loaded_models[model]
+            self.loaded_model_name = model
             return True
 
         ModelHandler().setup_model(model)
+        if self.loaded_models:
+            self.model_switches += 1
+        self.evict_models(self.get_model_size_mb(model))
 
+        LOGGER.info(f"Loading model {model}")
         self.model = stable_whisper.load_faster_whisper(
             ModelHandler().get_model_path(model),
             local_files_only=True,
@@ -90,10 +118,43 @@ class Transcriber:
             cpu_threads=self.cpu_threads,
         )
 
+        self.loaded_models[model] = self.model
         self.loaded_model_name = model
 
         return True
 
+    def evict_models(self, required_mb: float) -> None:
+        """Unloads the least recently used models until a model of `required_mb` fits."""
+
+        def exceeds_budget() -> bool:
+            if len(self.loaded_models) >= self.max_loaded_models:
+                return True
+            if self.model_memory_budget_mb is None:
+                return False
+            loaded_mb = sum(self.get_model_size_mb(name) for name in self.loaded_models)
+            return loaded_mb + required_mb > self.model_memory_budget_mb
+
+        evicted = False
+        while self.loaded_models and exceeds_budget():
+            name, _ = self.loaded_models.popitem(last=False)
+            LOGGER.info(f"Unloading model {name}")
+            evicted = True
+        if evicted:
+            self.model = None
+            self.loaded_model_name = None
+            # Frees the memory of the unloaded models before the next one is loaded
+            gc.collect()
+
+    def get_model_size_mb(self, model: str) -> float:
+        """Estimates the memory of a model by the size of its files."""
+        if model not in self.model_sizes_mb:
+            model_path = ModelHandler().get_model_path(model)
+            size = 0
+            for root, _, files in os.walk(model_path):
+                size += sum(os.path.getsize(os.path.join(root, file)) for file in files)
+            self.model_sizes_mb[model] = size / (1024 * 1024)
+        return self.model_sizes_mb[model]
+
     @time_it
     def transcribe_audio_file(
         self, audio_file_path: str, model:str, settings: dict = None
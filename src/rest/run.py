@@ -2,11 +2,13 @@
 
 import logging
 import multiprocessing
+from typing import List
 
 import uvicorn
 
 from src.helper.config import CONFIG
-from src.rest.app import app
+from src.rest.app import app, set_job_notifier
+from src.rest.job_notifier import JobNotifier
 from src.rest.runner import Runner
 
 LOGGER = logging.getLogger(__name__)
@@ -14,14 +16,19 @@ LOGGER = logging.getLogger(__name__)
 
 def run_rest_api(port, host) -> dict:
     """Returns the models.yaml file as dict."""
+    # Shared between the API and the runners to wake up idle runners on new jobs,
+    # translation jobs only wake up the translation runners
+    job_notifier = JobNotifier()
+    translation_notifier = JobNotifier()
+
     app_process = multiprocessing.Process(
         target=run_app,
-        args=(port, host),
+        args=(port, host, job_notifier, translation_notifier),
     )
 
     runner_process = multiprocessing.Process(
         target=start_runners,
-        args=(),
+        args=(job_notifier, translation_notifier),
     )
 
     app_process.start()
@@ -30,21 +37,63 @@ def run_rest_api(port, host) -> dict:
     runner_process.join()
 
 
-def run_app(port, host):
+def run_app(
+    port,
+    host,
+    job_notifier: JobNotifier = None,
+    translation_notifier: JobNotifier = None,
+):
     """Starts the flask app for production."""
+    set_job_notifier(job_notifier, translation_notifier)
     LOGGER.info(f"Starting FastAPI app prod on '{host}:{port}'")
     uvicorn.run(app, port=port, host=host, log_config=None)
 
 
-def start_runners() -> dict:
-    """Returns the models.yaml file as dict."""
+def runner_configs(
+    rest_runner: List[dict], translation_workers: List[dict]
+) -> List[dict]:
+    """
+    Returns the config of every runner process.
+
+    A rest_runner entry with transcription and translation enabled is split into a
+    transcription runner and a translation runner, so a long job of one kind does not
+    block the jobs of the other one. Every translation_workers entry adds
+    `concurrency` translation runners.
+    """
+    configs = []
+    for config in rest_runner:
+        if config.get("transcription_enabled") and config.get("translation_enabled"):
+            configs.append({**config, "translation_enabled": False})
+            configs.append({**config, "transcription_enabled": False})
+        else:
+            configs.append(config)
+    for worker in translation_workers:
+        config = {key: value for key, value in worker.items() if key != "concurrency"}
+        config = {
+            "device": config["translation_device"],
+            "device_index": 0,
+            **config,
+            "transcription_enabled": False,
+            "translation_enabled": True,
+        }
+        configs += [config] * max(1, worker.get("concurrency", 1))
+    return configs
+
+
+def start_runners(
+    job_notifier: JobNotifier = None, translation_notifier: JobNotifier = None
+) -> dict:
+    """Starts a process per runner and waits for them."""
     new_runner = []
     runner_id = 1
-    for config in CONFIG["rest_runner"]:
+    for config in runner_configs(CONFIG["rest_runner"], CONFIG["translation_workers"]):
+        notifier = job_notifier
+        if not config.get("transcription_enabled"):
+            notifier = translation_notifier or job_notifier
         new_runner.append(
             multiprocessing.Process(
                 target=start_runner,
-                args=(config, runner_id),
+                args=(config, runner_id, notifier),
             )
         )
         runner_id += 1
@@ -55,8 +104,10 @@ def start_runners() -> dict:
         runner.join()
 
 
-def start_runner(config: dict, identifier: int) -> None:
+def start_runner(
+    config: dict, identifier: int, job_notifier: JobNotifier = None
+) -> None:
     """Starts a file transcriber."""
     LOGGER.info(f"Starting REST runner with config: {config}..")
-    runner = Runner(config, identifier)
+    runner = Runner(config, identifier, job_notifier)
     runner.run()
@@ -1,7 +1,7 @@
 """This module contains the handler for the transcription process."""
 
 import os
-import random
+import socket
 import time
 from datetime import datetime, timezone
 from typing import Tuple
@@ -12,23 +12,38 @@ from src.helper.config import CONFIG
 from src.helper.data_handler import DataHandler
 from src.helper.SM4T_translate import Translator
 from src.helper.types.transcription_status import TranscriptionStatus
+from src.rest.job_notifier import JobNotifier
+from src.rest.job_scheduler import JobScheduler
 from src.rest.rest_transcriber import Transcriber
 
+TRANSCRIPTION_TASKS = ["transcribe", "align", "force-align"]
+
+# Fallback wait while idle, e.g. to pick up jobs with expired leases
+IDLE_WAIT_SECONDS = 10
+
 
 class Runner:
     """
     This class handles the transcription process by running whisper continuously.
     """
 
-    def __init__(self, config: dict, identifier: int):
+    def __init__(
+        self, config: dict, identifier: int, job_notifier: JobNotifier = None
+    ):
         """Constructor of the Runner class."""
         self.identifier = identifier
+        self.job_notifier = job_notifier
         self.transcriber = (
             Transcriber(config) if config.get("transcription_enabled") else None
         )
 
         self.log = logger.get_logger_with_id(__name__, identifier)
         self.data_handler = DataHandler()
+        # Identifies the leases of this runner across processes and hosts
+        self.lease_owner = f"{socket.gethostname()}:{os.getpid()}:{identifier}"
+        self.lease_seconds = CONFIG["job_lease_seconds"]
+        self.scheduler = JobScheduler(config)
+        # The translation model is loaded on the first translation job
         self.translator = (
             Translator(config) if config.get("translation_enabled") else None
         )
@@ -44,29 +59,41 @@ class Runner:
             if now > start_time + schedule:
                 self.data_handler.clean_up_audio_and_status_files()
                 self.log.info("Status files cleaned up.")
+                self.log_scheduler_stats()
                 start_time = now
 
-            task_id, task = self.get_oldest_status_file_in_query()
+            seen_generation = (
+                self.job_notifier.generation() if self.job_notifier else 0
+            )
+            task_id, task = self.get_next_job_in_query()
 
             if task_id == "None":
-                time.sleep(10)
+                if self.translator is not None:
+                    self.translator.unload_if_idle()
+                self.wait_for_new_job(seen_generation)
                 continue
 
-            self.log.debug("Processing file: " + task_id)
+            status_file = self.data_handler.get_status_file_by_id(task_id)
+            wait_seconds = self.scheduler.record_claim(
+                status_file.get("start_time") if status_file else None
+            )
+            self.log.debug(f"Processing file: {task_id} (waited {wait_seconds:.1f}s)")
             try:
-                self.data_handler.update_status_file(
-                    TranscriptionStatus.IN_PROGRESS.value, task_id
-                )
-                if task == "transcribe" or task.endswith("align"):
-                    self.transcribe_or_align(task_id)
-                if task == "translate":
-                    self.translate(task_id)
+                with self.data_handler.job_queue.hold_lease(
+                    task_id, self.lease_owner, self.lease_seconds
+                ):
+                    if task == "transcribe" or task.endswith("align"):
+                        self.transcribe_or_align(task_id)
+                    if task == "translate":
+                        self.translate(task_id)
 
             except Exception as e:
                 self.log.error(f"Runner Exception of type {type(e).__name__}: {str(e)}")
-                self.data_handler.update_status_file(
-                    TranscriptionStatus.ERROR.value, task_id, str(e)
-                )
+                # Another runner may have taken over and finished the job meanwhile
+                if self.holds_lease(task_id):
+                    self.data_handler.update_status_file(
+                        TranscriptionStatus.ERROR.value, task_id, str(e)
+                    )
                 continue
 
     def transcribe_or_align(self, transcription_id) -> None:
@@ -79,7 +106,7 @@ class Runner:
 
         assert self.transcriber is not None
 
-        model = status_file.get("model", self.transcriber.get_preferred_model())
+        model = status_file.get("model") or self.transcriber.get_preferred_model()
 
         response = None
         if task == "transcribe":
@@ -95,6 +122,8 @@ class Runner:
                 audio_file_path, status_file["text"], model, status_file["language"]
             )
 
+        if not self.holds_lease(transcription_id):
+            return
         self.data_handler.delete_audio_file(transcription_id)
         if response["success"] is False or (response["data"]["segments"] is None):
             self.data_handler.update_status_file(
@@ -103,11 +132,23 @@ class Runner:
                 response["data"],
             )
             return
-        self.data_handler.merge_transcript_to_status(transcription_id, response["data"])
+        self.data_handler.store_transcript(transcription_id, response["data"])
 
     def translate(self, task_id) -> None:
         """Translates the audio file with the given transcription_id."""
         transcription = self.data_handler.get_status_file_by_id(task_id)
+        # The transcript to translate is stored apart from the status file and result
+        transcription["transcript"] = self.data_handler.get_input_file_by_id(task_id)
+        if transcription["transcript"] is None:
+            # Posted by an older version next to the result, moved before it is
+            # overwritten, so a repeated run does not translate the translation
+            transcription["transcript"] = self.data_handler.get_transcript_by_id(
+                task_id
+            )
+            if not self.data_handler.write_input_file(
+                task_id, transcription["transcript"]
+            ):
+                raise IOError(f"Could not store the transcript of {task_id}")
 
         transcription["start_time"] = (
             datetime.now(timezone.utc).replace(microsecond=0).isoformat()
@@ -127,13 +168,16 @@ class Runner:
             )
         elif transcription["method"] == "segmented":
             transcription["transcript"]["text"] = ""
+            segments = transcription["transcript"]["segments"]
+            # All segments are translated at once, in batches of similar length
+            translated_texts = self.translator.translate_batch(
+                [segment["text"] for segment in segments],
+                transcription["language"],
+                transcription["target_language"],
+            )
             # next_segment_starting_small = True
-            for segment in transcription["transcript"]["segments"]:
-                segment["text"] = self.translator.translate_text(
-                    segment["text"],
-                    transcription["language"],
-                    transcription["target_language"],
-                )
+            for segment, translated_text in zip(segments, translated_texts):
+                segment["text"] = translated_text
 
                 #! Read in research README why this is not actively implemented.
                 # Simplified bad fix for context loss capitalization without sentence starts
@@ -159,81 +203,75 @@ class Runner:
         )
         transcription["status"] = TranscriptionStatus.FINISHED.value
 
+        if not self.holds_lease(task_id):
+            return
+        if not self.data_handler.write_result_file(
+            task_id, transcription.pop("transcript")
+        ):
+            raise IOError(f"Could not store the translation of {task_id}")
         self.data_handler.write_status_file(task_id, transcription)
         self.log.debug("finished translation task: " + task_id)
 
-    def get_oldest_status_file_in_query(
-        self,
-        race_condition_sleep: float = 5.0,
-        data_handler: DataHandler = DataHandler(),
-    ) -> Tuple[str, str]:
-        """Gets the oldest transcription in query."""
-        oldest_start_time = None
-        oldest_transcription_id: str = None
-        task = {}
-
-        files = os.listdir(data_handler.status_path)
-        if len(files) == 0:
-            return ("None", "None")
-
-        # wait to avoid race conditions between runners
-        time.sleep(random.uniform(0, race_condition_sleep))
-
-        for filename in os.listdir(data_handler.status_path):
-            try:
-                if filename.endswith(".json"):
-                    data = data_handler.file_handler.read_json(
-                        os.path.join(data_handler.status_path, filename)
-                    )
-                    current_status = data.get("status")
-                    start_time = data.get("start_time")
-                    model = data.get("model")
-
-                    if (
-                        start_time is None
-                        or current_status is None
-                        or current_status != TranscriptionStatus.IN_QUERY.value
-                    ):
-                        continue
-
-                    if (
-                        data.get("task") == "transcribe"
-                        or data.get("task") == "align"
-                        or data.get("task") == "force-align"
-                    ):
-                        if self.transcriber is None:
-                            continue
-                        if (
-                            not self.transcriber.supports_model(model)
-                            and model is not None
-                        ):
-                            continue
-
-                    if self.translator is None and data.get("task") == "translate":
-                        continue
-
-                    current_datetime = datetime.fromisoformat(start_time)
-                    if (
-                        oldest_start_time is None
-                        or current_datetime < oldest_start_time
-                    ):
-                        oldest_start_time = current_datetime
-                        oldest_transcription_id = data.get("transcription_id")
-                        task = data.get("task")
-
-            except Exception as e:
-                self.log.error(
-                    f"Caught Exception of type {type(e).__name__}"
-                    + f" while getting oldest status file: {str(e)}"
-                )
-                transcription_id = filename.split(".")[0]
-                data_handler.delete_status_file(transcription_id)
-                # This throws an error if it is a translation task, but no good way to check
-                data_handler.delete_audio_file(transcription_id)
-                continue
+    def wait_for_new_job(self, seen_generation: int) -> None:
+        """Sleeps until a new job is posted, falls back to polling without notifier."""
+        if self.job_notifier is None:
+            time.sleep(IDLE_WAIT_SECONDS)
+            return
+        if self.job_notifier.wait(seen_generation, IDLE_WAIT_SECONDS):
+            self.log.debug("Woken up by a new job")
+
+    def holds_lease(self, task_id: str) -> bool:
+        """Checks that no other runner took over the job before storing its result."""
+        if self.data_handler.job_queue.holds_lease(task_id, self.lease_owner):
+            return True
+        self.log.error(f"Lease of {task_id} was lost, discarding the result")
+        return False
+
+    def log_scheduler_stats(self) -> None:
+        """Logs the queue wait times and model switches of this runner."""
+        stats = self.scheduler.get_stats()
+        model_switches = self.transcriber.model_switches if self.transcriber else 0
+        self.log.info(
+            f"Claimed {stats['claimed_jobs']} jobs, "
+            + f"mean queue wait {stats['mean_wait_seconds']:.1f}s, "
+            + f"max queue wait {stats['max_wait_seconds']:.1f}s, "
+            + f"model switches {model_switches}"
+        )
+        if self.translator is not None and self.translator.cache is not None:
+            cache_stats = self.translator.cache.get_stats()
+            self.log.info(
+                f"Translation cache: {cache_stats['memory_hits']} memory hits, "
+                + f"{cache_stats['disk_hits']} disk hits, "
+                + f"{cache_stats['misses']} misses, "
+                + f"hit rate {cache_stats['hit_rate']:.0%}"
+            )
 
-        return (
-            (oldest_transcription_id, task)
-            if oldest_transcription_id and task
-            else ("None", task)
+    def get_next_job_in_query(self) -> Tuple[str, str]:
+        """
+        Claims the next job in query that this runner is able to process, weighing
+        the age of the jobs against switching the loaded model (see JobScheduler).
+        """
+        tasks = []
+        models = []
+        loaded_models = []
+        default_model = None
+        if self.transcriber is not None:
+            tasks += TRANSCRIPTION_TASKS
+            # Jobs without a model are processed with the preferred model
+            models += self.transcriber.supported_models + [None]
+            loaded_models = self.transcriber.get_loaded_models()
+            default_model = self.transcriber.get_preferred_model()
+        if self.translator is not None:
+            tasks.append("translate")
+            # Translation jobs are not bound to a whisper model
+            if None not in models:
+                models.append(None)
+
+        job = self.data_handler.claim_next_job(
+            tasks,
+            models,
+            self.lease_owner,
+            self.lease_seconds,
+            self.scheduler.ranker(loaded_models, default_model),
         )
+        return job if job else ("None", "None")
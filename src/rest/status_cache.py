@@ -0,0 +1,79 @@
+"""This module contains an in-memory view of the job statuses for the REST API."""
+
+import logging
+import threading
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple
+
+from src.helper.job_queue import JobQueue
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StatusEntry(NamedTuple):
+    """Status of a job as listed by the REST API."""
+
+    transcription_id: str
+    status: str
+    # Time of the last change of the job, seconds since the epoch
+    mtime: float | None
+    # Size of the status file in bytes
+    size: int | None
+
+
+class StatusCache:
+    """
+    Keeps the status of all jobs in memory, so listing them does not read any files.
+
+    The cache follows the job index: every refresh only fetches the rows that changed
+    since the last refresh. Removals are not tracked row by row, a new generation of the
+    index causes a full reload instead.
+    """
+
+    def __init__(self, job_queue: JobQueue):
+        self.job_queue = job_queue
+        # Insertion ordered, jobs are listed in the order they were created
+        self.entries: Dict[str, StatusEntry] = {}
+        self._seq = 0
+        self._generation: int | None = None
+        # Requests are served by several threads
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Applies the changes of the job index since the last refresh."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        seq, generation = self.job_queue.get_state()
+        if generation != self._generation:
+            self.entries = {}
+            changes = self.job_queue.get_changes()
+            self._generation = generation
+        elif seq != self._seq:
+            changes = self.job_queue.get_changes(self._seq)
+        else:
+            return
+        # Rows may already be newer than `seq`, applying them again later is harmless
+        self._seq = seq
+        for change in changes:
+            if change.status is None:
+                # Not a job, e.g. a foreign json file in the status folder
+                self.entries.pop(change.transcription_id, None)
+                continue
+            self.entries[change.transcription_id] = StatusEntry(
+                change.transcription_id, change.status, change.updated_at, change.size
+            )
+
+    def list(
+        self, status: str | None = None, offset: int = 0, limit: int | None = None
+    ) -> List[StatusEntry]:
+        """Returns the cached jobs, optionally filtered by status and paginated."""
+        with self._lock:
+            self._refresh()
+            # Snapshot, the entries may be refreshed by another thread meanwhile
+            entries: Iterator[StatusEntry] = iter(list(self.entries.values()))
+        if status is not None:
+            entries = (entry for entry in entries if entry.status == status)
+        stop = None if limit is None else offset + limit
+        return list(islice(entries, offset, stop))
@@ -12,7 +12,8 @@ from fastapi.testclient import TestClient  # Import TestClient from FastAPI
 from src.helper.config import CONFIG
 from src.helper.data_handler import DataHandler
 from src.helper.test_base.cleanup_data_fixture import cleanup_data  # is required
-from src.rest.app import app
+from src.rest.app import app, set_job_notifier
+from src.rest.job_notifier import JobNotifier
 
 EXAMPLE_AUDIO_FILE_PATH = os.path.join(
     os.getcwd(), "src", "helper", "test_base", "example.wav"
@@ -254,6 +255,37 @@ def test_get_transcriptions_without_files(rest_client):
     assert response.json() == []
 
 
+def test_get_transcriptions_with_status_filter_and_pagination(
+    rest_client, transcription_id
+):
+    """Test listing transcriptions by status and page"""
+    second_id = rest_client.post(
+        "/transcriptions",
+        headers={"Authorization": EXAMPLE_AUTH_KEY},
+        files={"file": open(EXAMPLE_AUDIO_FILE_PATH, "rb")},
+    ).json()["transcription_id"]
+    DATA_HANDLER.update_status_file("finished", transcription_id)
+
+    response = rest_client.get(
+        "/transcriptions", headers={"Authorization": EXAMPLE_AUTH_KEY}
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {"transcription_id": transcription_id, "status": "finished"},
+        {"transcription_id": second_id, "status": "in_query"},
+    ]
+
+    response = rest_client.get(
+        "/transcriptions?status=in_query", headers={"Authorization": EXAMPLE_AUTH_KEY}
+    )
+    assert response.json() == [{"transcription_id": second_id, "status": "in_query"}]
+
+    response = rest_client.get(
+        "/transcriptions?offset=1&limit=1", headers={"Authorization": EXAMPLE_AUTH_KEY}
+    )
+    assert response.json() == [{"transcription_id": second_id, "status": "in_query"}]
+
+
 def test_post_transcription_with_settings_model(rest_client):
     """Test the post transcription endpoint with settings and model"""
     configured_model = CONFIG["rest_models"][0]
@@ -334,6 +366,30 @@ def test_working_translation(rest_client):
     )
     assert response.status_code == 200
     assert response.json()["id"] is not None
+    # The transcript is stored apart from the status file and the result
+    translation_id = response.json()["id"]
+    assert "transcript" not in DATA_HANDLER.get_status_file_by_id(translation_id)
+    assert (
+        DATA_HANDLER.get_input_file_by_id(translation_id)
+        == EXAMPLE_TRANSCRIPT["transcript"]
+    )
+    assert DATA_HANDLER.get_result_file_by_id(translation_id) is None
+
+
+def test_posting_job_notifies_runners(rest_client):
+    """Test that posting a job wakes up the runners"""
+    job_notifier = JobNotifier()
+    set_job_notifier(job_notifier)
+    try:
+        response = rest_client.post(
+            "/translate",
+            headers={"Authorization": EXAMPLE_AUTH_KEY},
+            json=EXAMPLE_TRANSCRIPT,
+        )
+        assert response.status_code == 200
+        assert job_notifier.generation() == 1
+    finally:
+        set_job_notifier(None)
 
 
 def test_fail_translate_with_nsupported_original_language(rest_client):
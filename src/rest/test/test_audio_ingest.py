@@ -0,0 +1,55 @@
+"""This File contains tests for the AudioIngest class."""
+
+import asyncio
+import io
+import os
+
+from fastapi import UploadFile
+from pydub import AudioSegment
+
+from src.helper.file_handler import MAX_AUDIO_LENGTH
+from src.rest.audio_ingest import AudioIngest
+
+EXAMPLE_RESAMPLED_AUDIO_FILE_PATH = os.path.join(
+    os.getcwd(), "src", "helper", "test_base", "example_resampled.wav"
+)
+TEST_AUDIO_PATH = os.path.join("src", "rest", "test", "test_audio_ingest")
+
+
+def test_ingest_converts_to_16khz_mono():
+    """Tests that an upload is stored as 16 kHz mono WAV file."""
+    audio_ingest = AudioIngest(TEST_AUDIO_PATH, ".wav", max_workers=1)
+    with open(EXAMPLE_RESAMPLED_AUDIO_FILE_PATH, "rb") as audio_file:
+        upload = UploadFile(io.BytesIO(audio_file.read()))
+    try:
+        assert asyncio.run(audio_ingest.ingest(upload, "converted")) == []
+        audio = AudioSegment.from_wav(os.path.join(TEST_AUDIO_PATH, "converted.wav"))
+        assert audio.frame_rate == 16000
+        assert audio.channels == 1
+        # Only the converted file is left
+        assert os.listdir(TEST_AUDIO_PATH) == ["converted.wav"]
+    finally:
+        for file in os.listdir(TEST_AUDIO_PATH):
+            os.remove(os.path.join(TEST_AUDIO_PATH, file))
+        os.rmdir(TEST_AUDIO_PATH)
+
+
+def test_validate_rejects_invalid_uploads():
+    """Tests the validation of the upload metadata."""
+    audio_stream = {"streams": [{"codec_type": "audio"}]}
+    assert AudioIngest.validate(None)
+    assert AudioIngest.validate({"streams": [{"codec_type": "video"}]})
+    assert AudioIngest.validate(
+        {**audio_stream, "format": {"duration": str(MAX_AUDIO_LENGTH + 1)}}
+    )
+    assert AudioIngest.validate({**audio_stream, "format": {"duration": "11.0"}}) == []
+
+
+def test_validate_rejects_uploads_without_duration():
+    """Tests that truncated or undecodable streams without a length are rejected."""
+    audio_stream = {"streams": [{"codec_type": "audio"}]}
+    assert AudioIngest.validate(audio_stream)
+    assert AudioIngest.validate({**audio_stream, "format": {}})
+    assert AudioIngest.validate({**audio_stream, "format": {"duration": "N/A"}})
+    assert AudioIngest.validate({**audio_stream, "format": {"duration": "0.000000"}})
+    assert AudioIngest.validate({**audio_stream, "format": {"duration": "-1.5"}})
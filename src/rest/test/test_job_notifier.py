@@ -0,0 +1,42 @@
+"""This File contains tests for the JobNotifier class."""
+
+import multiprocessing
+import time
+
+from src.rest.job_notifier import JobNotifier
+
+
+def wait_and_report(job_notifier: JobNotifier, seen_generation: int, result) -> None:
+    result.value = job_notifier.wait(seen_generation, 10)
+
+
+def test_wait_times_out_without_notification():
+    """Tests that waiting returns False if no job was posted."""
+    job_notifier = JobNotifier()
+    assert job_notifier.wait(job_notifier.generation(), 0.1) is False
+
+
+def test_wait_returns_on_missed_notification():
+    """Tests that a notification before waiting is not lost."""
+    job_notifier = JobNotifier()
+    seen_generation = job_notifier.generation()
+    job_notifier.notify()
+    assert job_notifier.wait(seen_generation, 10) is True
+
+
+def test_notify_wakes_up_other_process():
+    """Tests that a waiting runner process is woken up immediately."""
+    job_notifier = JobNotifier()
+    result = multiprocessing.Value("b", False)
+    waiter = multiprocessing.Process(
+        target=wait_and_report, args=(job_notifier, job_notifier.generation(), result)
+    )
+    waiter.start()
+    time.sleep(0.2)
+
+    start_time = time.time()
+    job_notifier.notify()
+    waiter.join(5)
+
+    assert result.value
+    assert time.time() - start_time < 1
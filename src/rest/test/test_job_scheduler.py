@@ -0,0 +1,60 @@
+"""This File contains tests for the JobScheduler class."""
+
+from datetime import datetime, timedelta, timezone
+
+from src.helper.job_queue import JobCandidate
+from src.rest.job_scheduler import JobScheduler
+
+CONFIG = {"model_switch_cost_seconds": 60, "max_job_wait_seconds": 600}
+
+
+def posted_ago(seconds: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+
+def candidate(
+    model: str | None, waited: float, priority: int = 0, task: str = "transcribe"
+) -> JobCandidate:
+    return JobCandidate(f"{model}-{waited}", task, model, priority, posted_ago(waited))
+
+
+def test_loaded_model_is_preferred_within_switch_cost():
+    """Tests that a younger job for the loaded model beats a slightly older job."""
+    rank = JobScheduler(CONFIG).ranker(["tiny"])
+    assert rank(candidate("tiny", 10)) < rank(candidate("small", 50))
+    # The switch pays off once the other job is older by more than the switch cost
+    assert rank(candidate("small", 100)) < rank(candidate("tiny", 10))
+
+
+def test_starving_jobs_come_first():
+    """Tests that jobs waiting longer than the max wait are claimed first."""
+    rank = JobScheduler(CONFIG).ranker(["tiny"])
+    assert rank(candidate("small", 700)) < rank(candidate("tiny", 590))
+    # Priorities still come first
+    assert rank(candidate("tiny", 10, priority=1)) < rank(candidate("small", 700))
+
+
+def test_translation_jobs_do_not_switch():
+    """Tests that translation jobs are not penalized."""
+    rank = JobScheduler(CONFIG).ranker(["tiny"], "large-v3")
+    assert rank(candidate(None, 20, task="translate")) < rank(candidate("tiny", 10))
+
+
+def test_jobs_without_model_use_default_model():
+    """Tests that jobs without a model are ranked by the default model."""
+    rank = JobScheduler(CONFIG).ranker(["tiny"], "large-v3")
+    assert rank(candidate("tiny", 10)) < rank(candidate(None, 20))
+
+    rank = JobScheduler(CONFIG).ranker(["large-v3"], "large-v3")
+    assert rank(candidate(None, 20)) < rank(candidate("tiny", 10))
+
+
+def test_record_claim_collects_wait_times():
+    """Tests the wait time statistics of the claimed jobs."""
+    scheduler = JobScheduler(CONFIG)
+    assert scheduler.record_claim(posted_ago(10)) >= 10
+    scheduler.record_claim(posted_ago(30))
+    stats = scheduler.get_stats()
+    assert stats["claimed_jobs"] == 2
+    assert 20 <= stats["mean_wait_seconds"] < 25
+    assert 30 <= stats["max_wait_seconds"] < 35
@@ -0,0 +1,68 @@
+"""This File contains tests for the runner processes of the REST API."""
+
+from unittest.mock import Mock
+
+from src.rest import app
+from src.rest.run import runner_configs
+
+TRANSCRIPTION_RUNNER = {
+    "device": "cpu",
+    "models": ["tiny"],
+    "transcription_enabled": True,
+}
+TRANSLATION_SETTINGS = {
+    "translation_model": "facebook/seamless-m4t-v2-large",
+    "translation_device": "cpu",
+}
+
+
+def test_runner_with_both_workloads_is_split():
+    configs = runner_configs(
+        [{**TRANSCRIPTION_RUNNER, **TRANSLATION_SETTINGS, "translation_enabled": True}],
+        [],
+    )
+
+    assert [
+        (config["transcription_enabled"], config["translation_enabled"])
+        for config in configs
+    ] == [(True, False), (False, True)]
+    assert configs[1]["translation_model"] == TRANSLATION_SETTINGS["translation_model"]
+
+
+def test_single_workload_runners_are_kept():
+    configs = runner_configs([TRANSCRIPTION_RUNNER], [])
+
+    assert configs == [TRANSCRIPTION_RUNNER]
+
+
+def test_translation_workers_start_concurrency_runners():
+    configs = runner_configs(
+        [TRANSCRIPTION_RUNNER],
+        [{**TRANSLATION_SETTINGS, "concurrency": 2}],
+    )
+
+    assert len(configs) == 3
+    for config in configs[1:]:
+        assert config["transcription_enabled"] is False
+        assert config["translation_enabled"] is True
+        assert config["device"] == "cpu"
+        assert "concurrency" not in config
+
+
+def test_translation_jobs_wake_up_translation_runners():
+    job_notifier, translation_notifier = Mock(), Mock()
+    app.set_job_notifier(job_notifier, translation_notifier)
+    try:
+        app.notify_runners(translation=True)
+        translation_notifier.notify.assert_called_once()
+        job_notifier.notify.assert_not_called()
+
+        app.notify_runners()
+        job_notifier.notify.assert_called_once()
+
+        # Without a notifier of their own the translation runners share the one
+        app.set_job_notifier(job_notifier)
+        app.notify_runners(translation=True)
+        assert job_notifier.notify.call_count == 2
+    finally:
+        app.set_job_notifier(None)
@@ -1,5 +1,7 @@
 from src.helper.config import CONFIG
+from src.helper.model_handler import ModelHandler
 from src.rest.rest_transcriber import Transcriber
+import stable_whisper
 from pytest import raises
 
 def test_gpu_check():
@@ -16,3 +18,52 @@ def test_gpu_check():
 def test_preferred_model():
     testable = Transcriber(CONFIG["rest_runner"][0])
     assert testable.get_preferred_model() == CONFIG["rest_runner"][0].get("models", ["False"])[-1]
+
+def test_models_stay_loaded_up_to_the_limit(monkeypatch):
+    monkeypatch.setattr(ModelHandler, "setup_model", lambda self, model: False)
+    monkeypatch.setattr(
+        stable_whisper, "load_faster_whisper", lambda path, **kwargs: object()
+    )
+    config = {"device": "cpu", "models": ["tiny", "small", "medium"], "max_loaded_models": 2}
+    testable = Transcriber(config)
+
+    testable.load_model("small")
+    small = testable.model
+    testable.load_model("medium")
+    assert testable.get_loaded_models() == ["medium", "small"]
+
+    # Switching back to a loaded model does not reload it
+    testable.load_model("small")
+    assert testable.model is small
+    assert testable.get_loaded_models() == ["small", "medium"]
+
+    # The least recently used model is unloaded
+    testable.load_model("tiny")
+    assert testable.get_loaded_models() == ["tiny", "small"]
+    assert testable.model_switches == 2
+
+def test_models_are_unloaded_to_fit_the_memory_budget(monkeypatch):
+    monkeypatch.setattr(ModelHandler, "setup_model", lambda self, model: False)
+    monkeypatch.setattr(
+        stable_whisper, "load_faster_whisper", lambda path, **kwargs: object()
+    )
+    model_sizes_mb = {"tiny": 100, "small": 500, "medium": 1500}
+    monkeypatch.setattr(
+        Transcriber, "get_model_size_mb", lambda self, model: model_sizes_mb[model]
+    )
+    config = {
+        "device": "cpu",
+        "models": ["tiny", "small", "medium"],
+        "max_loaded_models": 3,
+        "model_memory_budget_mb": 1700,
+    }
+    testable = Transcriber(config)
+    testable.load_model("tiny")
+    assert testable.get_loaded_models() == ["tiny", "medium"]
+
+    # medium has to go to fit small
+    testable.load_model("small")
+    assert testable.get_loaded_models() == ["small", "tiny"]
+
+    testable.load_model("medium")
+    assert testable.get_loaded_models() == ["medium"]
@@ -0,0 +1,113 @@
+"""This module contains the admission of websocket clients to the seats of the workers."""
+
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, NamedTuple
+
+# Waiting clients are reminded of their position in the queue at least this often
+QUEUE_POSITION_UPDATE_SECONDS = 10
+WAITING_MESSAGE = "No transcription workers available. Position in queue: {position}"
+QUEUE_FULL_MESSAGE = "No transcription workers available and the queue is full"
+
+
+class QueueFullError(Exception):
+    """Raised if a client can not wait for a seat as the queue is full."""
+
+
+class Waiter(NamedTuple):
+    future: asyncio.Future
+    position_changed: asyncio.Event
+
+
+class AdmissionQueue:
+    """
+    First come, first served admission of clients to the seats of the worker pools.
+
+    Of the pools with a free seat the one with the lowest `rank` is used, without a
+    rank function the first one in the given order, e.g. GPU before CPU. A client only
+    takes a free seat if nobody is waiting, otherwise it is queued. A released seat is
+    handed to the first waiting client directly, so no seat stays idle while clients
+    wait and no client overtakes another one. All methods run on the event loop of the
+    server, so the seat accounting needs no locks.
+    """
+
+    def __init__(
+        self,
+        seats: Dict[str, int],
+        max_queue_size: int = 100,
+        rank: Callable[[str], Any] | None = None,
+    ):
+        self.free_seats = dict(seats)
+        self.max_queue_size = max_queue_size
+        self.rank = rank
+        self._waiters: Deque[Waiter] = deque()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(
+        self,
+        on_position: Callable[[int], Awaitable[None]] | None = None,
+        update_seconds: float = 10,
+    ) -> str:
+        """
+        Waits for a seat and returns the name of its pool.
+
+        `on_position` is awaited with the position in the queue whenever it changes and
+        at least every `update_seconds` while waiting.
+
+        Raises:
+            QueueFullError if max_queue_size clients are waiting already.
+        """
+        if not self._waiters:
+            pool = self._take_free_seat()
+            if pool is not None:
+                return pool
+        if len(self._waiters) >= self.max_queue_size:
+            raise QueueFullError()
+
+        waiter = Waiter(asyncio.get_running_loop().create_future(), asyncio.Event())
+        self._waiters.append(waiter)
+        try:
+            while not waiter.future.done():
+                if on_position is not None:
+                    await on_position(self._waiters.index(waiter) + 1)
+                waiter.position_changed.clear()
+                changed = asyncio.ensure_future(waiter.position_changed.wait())
+                try:
+                    await asyncio.wait(
+                        [waiter.future, changed],
+                        timeout=update_seconds,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    changed.cancel()
+            return waiter.future.result()
+        except BaseException:
+            # The client left, e.g. it disconnected or was cancelled
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._notify_waiters()
+            elif waiter.future.done():
+                self.release(waiter.future.result())
+            raise
+
+    def release(self, pool: str) -> None:
+        """Returns a seat, it goes to the first waiting client if there is one."""
+        if self._waiters:
+            self._waiters.popleft().future.set_result(pool)
+            self._notify_waiters()
+            return
+        self.free_seats[pool] += 1
+
+    def _take_free_seat(self) -> str | None:
+        pools = [pool for pool, seats in self.free_seats.items() if seats > 0]
+        if not pools:
+            return None
+        pool = pools[0] if self.rank is None else min(pools, key=self.rank)
+        self.free_seats[pool] -= 1
+        return pool
+
+    def _notify_waiters(self) -> None:
+        for waiter in self._waiters:
+            waiter.position_changed.set()
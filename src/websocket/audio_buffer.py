@@ -0,0 +1,86 @@
+"""This module contains the ring buffer holding the audio window of a stream."""
+
+import numpy as np
+
+# Scale of 16 bit PCM samples to the [-1, 1) range expected by Whisper
+INT16_SCALE = 1 / 32768
+
+
+def pcm16_to_float32(data: bytes | np.ndarray) -> np.ndarray:
+    """Converts 16 bit PCM audio to normalized float32 samples in a single pass."""
+    if isinstance(data, np.ndarray) and data.dtype == np.int16:
+        samples = data
+    else:
+        data = memoryview(data).cast("B")
+        samples = np.frombuffer(data[: len(data) - len(data) % 2], dtype=np.int16)
+    return np.multiply(samples, INT16_SCALE, dtype=np.float32)
+
+
+class AudioRingBuffer:
+    """
+    Preallocated ring buffer of raw audio bytes.
+
+    Appending copies only the new bytes and dropping the oldest bytes just moves the
+    start of the buffer, so neither depends on the amount of buffered audio. The
+    buffer grows (doubling its capacity) if more audio is appended than it can hold.
+    """
+
+    def __init__(self, capacity: int):
+        self._buffer = np.zeros(max(1, capacity), dtype=np.uint8)
+        self._start = 0
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def append(self, data: bytes) -> None:
+        """Appends bytes at the end of the buffer."""
+        if self._length + len(data) > self.capacity:
+            self._grow(self._length + len(data))
+        chunk = np.frombuffer(data, dtype=np.uint8)
+        end = (self._start + self._length) % self.capacity
+        first_part = min(len(chunk), self.capacity - end)
+        self._buffer[end : end + first_part] = chunk[:first_part]
+        self._buffer[: len(chunk) - first_part] = chunk[first_part:]
+        self._length += len(chunk)
+
+    def discard(self, count: int) -> None:
+        """Drops the oldest `count` bytes."""
+        count = min(count, self._length)
+        self._start = (self._start + count) % self.capacity
+        self._length -= count
+
+    def get_bytes(self) -> bytes:
+        """Returns a copy of the buffered bytes, oldest first."""
+        end = self._start + self._length
+        if end <= self.capacity:
+            return self._buffer[self._start : end].tobytes()
+        return (
+            self._buffer[self._start :].tobytes()
+            + self._buffer[: end - self.capacity].tobytes()
+        )
+
+    def get_samples(self) -> np.ndarray:
+        """Returns the buffered 16 bit PCM audio as normalized float32 samples."""
+        end = self._start + self._length
+        if end <= self.capacity:
+            window = self._buffer[self._start : end]
+        else:
+            window = np.concatenate(
+                [self._buffer[self._start :], self._buffer[: end - self.capacity]]
+            )
+        return pcm16_to_float32(window)
+
+    def _grow(self, required: int) -> None:
+        """Moves the content into a larger buffer, starting at index 0."""
+        capacity = self.capacity
+        while capacity < required:
+            capacity *= 2
+        buffer = np.zeros(capacity, dtype=np.uint8)
+        buffer[: self._length] = np.frombuffer(self.get_bytes(), dtype=np.uint8)
+        self._buffer = buffer
+        self._start = 0
@@ -0,0 +1,94 @@
+"""This module contains the incremental writer of the exported stream audio."""
+
+import tempfile
+from typing import BinaryIO
+
+import numpy as np
+
+# 16000 Hz, 16 bit mono
+SAMPLES_PER_MS = 16
+SAMPLE_WIDTH = 2
+
+# Audio up to this size is kept in memory, longer sessions are spooled to disk
+SPOOL_MAX_MEMORY_BYTES = 32 * 1024 * 1024
+
+
+class AudioExportWriter:
+    """
+    Collects the audio of a stream for the export while it is received.
+
+    Consecutive chunks are joined with a short linear crossfade to avoid click sounds,
+    the same way `AudioSegment.append(crossfade=...)` of pydub does. Only the last
+    `crossfade_ms` of audio are kept in an array as they may still be mixed with the
+    next chunk, everything before is appended to a spooled temporary file. The cost of
+    a chunk therefore only depends on its own size.
+    """
+
+    def __init__(self, crossfade_ms: int = 20):
+        self.crossfade_ms = crossfade_ms
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+        # End of the audio that is not written yet, at most crossfade_ms long
+        self._tail = np.zeros(0, dtype=np.int16)
+        # Odd byte of a chunk that split a sample
+        self._partial_sample = b""
+        self.total_samples = 0
+
+    def append(self, chunk: bytes) -> None:
+        """Appends a chunk of 16 bit PCM audio."""
+        chunk = self._partial_sample + chunk
+        usable = len(chunk) - len(chunk) % SAMPLE_WIDTH
+        self._partial_sample = chunk[usable:]
+        samples = np.frombuffer(chunk[:usable], dtype=np.int16)
+        if len(samples) == 0:
+            return
+
+        # Like pydub, the crossfade is shortened for short audio (lengths in ms)
+        crossfade_ms = min(
+            round(self.total_samples / SAMPLES_PER_MS),
+            round(len(samples) / SAMPLES_PER_MS),
+            self.crossfade_ms,
+        )
+        if crossfade_ms > 0:
+            crossfade = crossfade_ms * SAMPLES_PER_MS
+            fading_out = self._tail[-crossfade:]
+            fading_in = samples[:crossfade]
+            mixed = np.floor(fading_out * AudioExportWriter._ramp(1, len(fading_out)))
+            overlap = min(len(fading_out), len(fading_in))
+            mixed[:overlap] += np.floor(
+                fading_in * AudioExportWriter._ramp(0, len(fading_in))
+            )[:overlap]
+            mixed = np.clip(mixed, -32768, 32767).astype(np.int16)
+            audio = np.concatenate(
+                [
+                    self._tail[: len(self._tail) - len(fading_out)],
+                    mixed,
+                    samples[crossfade:],
+                ]
+            )
+            self.total_samples += len(samples) - len(fading_in)
+        else:
+            audio = np.concatenate([self._tail, samples])
+            self.total_samples += len(samples)
+
+        keep = min(len(audio), self.crossfade_ms * SAMPLES_PER_MS)
+        self._file.write(audio[: len(audio) - keep].tobytes())
+        self._tail = audio[len(audio) - keep :].copy()
+
+    @staticmethod
+    def _ramp(start: int, length: int) -> np.ndarray:
+        """Per sample gain of pydub's fade from `start` (1 or 0) to the other end."""
+        # pydub fades over whole milliseconds and from/to -120 dB instead of silence
+        frames = max(1, round(length / SAMPLES_PER_MS) * SAMPLES_PER_MS)
+        silence = 10 ** (-120 / 20)
+        from_gain, to_gain = (1, silence) if start == 1 else (silence, 1)
+        return from_gain + (to_gain - from_gain) * np.arange(length) / frames
+
+    def finish(self) -> BinaryIO:
+        """Writes the remaining audio and returns the file positioned at its start."""
+        self._file.write(self._tail.tobytes())
+        self._tail = np.zeros(0, dtype=np.int16)
+        self._file.seek(0)
+        return self._file
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,44 @@
+"""This module contains the authentication of new websocket clients."""
+
+import json
+import logging
+
+from fastapi import WebSocket
+
+from src.helper.config import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+
+async def receive_authentication(websocket: WebSocket) -> str | None:
+    """
+    Receives the initial message of a client, which has to contain a valid api key.
+
+    Returns:
+        The message if the api key is valid, None otherwise. The client was told why.
+    """
+    msg = await websocket.receive()
+
+    if "text" not in msg:
+        LOGGER.info("Initial websocket message was not string")
+        await websocket.send_text(
+            "Initial message was not text and therefore did not match the expected auth format"
+        )
+        return None
+
+    msg = msg["text"]
+    authenticated = False
+    try:
+        data = json.loads(msg)
+        if data["Authorization"] in CONFIG["api_keys"]:
+            authenticated = True
+    except Exception:
+        LOGGER.info("Initial websocket message was invalid json")
+        await websocket.send_text("Initial websocket message contained invalid json")
+        return None
+
+    if not authenticated:
+        await websocket.send_text("Provided api key is invalid")
+        return None
+
+    return msg
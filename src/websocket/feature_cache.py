@@ -0,0 +1,109 @@
+"""This module contains the feature extraction that reuses the frames of previous partials."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+from faster_whisper.feature_extractor import FeatureExtractor
+
+# Audio at the start of a waveform that identifies the stream it belongs to
+KEY_SAMPLES = 1600
+
+
+class CachedFrames(NamedTuple):
+    waveform: np.ndarray
+    # log10 mel frames before the normalization, which depends on the whole waveform
+    log_mel: np.ndarray
+
+
+class CachingFeatureExtractor(FeatureExtractor):
+    """
+    Whisper feature extractor that only computes the mel frames of new audio.
+
+    Consecutive partials of a stream transcribe the same window with about a second of
+    new audio at its end. The log mel frames of the last waveforms are kept, keyed by
+    the start of the audio. A frame is reused if all samples it is computed from are
+    part of the common prefix with a cached waveform, only the remaining frames are
+    computed. The result is the same as the one of `FeatureExtractor`.
+
+    The cache is shared by all streams of a transcriber, so it holds `max_entries`
+    waveforms and drops the least recently used one.
+    """
+
+    def __init__(self, max_entries: int = 16, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self._cache: OrderedDict[bytes, CachedFrames] = OrderedDict()
+        self._lock = threading.Lock()
+        self._window = np.hanning(self.n_fft + 1)[:-1].astype("float32")
+        self.computed_frames = 0
+        self.reused_frames = 0
+
+    def __call__(self, waveform: np.ndarray, padding=160, chunk_length=None):
+        """Compute the log-Mel spectrogram of the provided audio."""
+        if chunk_length is not None:
+            self.n_samples = chunk_length * self.sampling_rate
+            self.nb_max_frames = self.n_samples // self.hop_length
+
+        waveform = waveform.astype(np.float32, copy=False)
+        # Only waveforms with the default padding and a full key are cached
+        if padding != 160 or len(waveform) < KEY_SAMPLES:
+            return super().__call__(waveform, padding)
+
+        key = hashlib.blake2b(waveform[:KEY_SAMPLES].tobytes(), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+
+        reusable = 0
+        if cached is not None:
+            reusable = min(
+                cached.log_mel.shape[1],
+                self._reusable_frames(cached.waveform, waveform),
+            )
+        log_mel = self._log_mel(waveform, padding, reusable)
+        if reusable > 0:
+            log_mel = np.concatenate([cached.log_mel[:, :reusable], log_mel], axis=1)
+
+        with self._lock:
+            self._cache[key] = CachedFrames(waveform.copy(), log_mel)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self.reused_frames += reusable
+            self.computed_frames += log_mel.shape[1] - reusable
+
+        log_spec = np.maximum(log_mel, log_mel.max() - 8.0)
+        return (log_spec + 4.0) / 4.0
+
+    def _reusable_frames(self, cached: np.ndarray, waveform: np.ndarray) -> int:
+        """Number of leading frames whose samples are the same in both waveforms."""
+        length = min(len(cached), len(waveform))
+        differences = np.flatnonzero(cached[:length] != waveform[:length])
+        prefix = differences[0] if len(differences) else length
+        # Frame i is centered at sample i * hop_length and spans n_fft samples
+        half_window = self.n_fft // 2
+        # The reflection padding of the first frame reaches up to sample half_window
+        if prefix <= half_window:
+            return 0
+        return (prefix - half_window) // self.hop_length + 1
+
+    def _log_mel(self, waveform: np.ndarray, padding: int, first_frame: int):
+        """log10 mel frames of the waveform starting at `first_frame`."""
+        waveform = np.pad(waveform, (0, padding))
+        half_window = self.n_fft // 2
+        padded = np.pad(waveform, (half_window, half_window), mode="reflect")
+        # Like FeatureExtractor the last frame is dropped
+        frames = (len(padded) - self.n_fft) // self.hop_length
+        count = frames - first_frame
+        start = first_frame * self.hop_length
+        windows = np.lib.stride_tricks.as_strided(
+            padded[start:],
+            (count, self.n_fft),
+            (self.hop_length * padded.strides[0], padded.strides[0]),
+        )
+        stft = np.fft.rfft(windows * self._window, n=self.n_fft, axis=-1)
+        magnitudes = np.abs(stft.astype("complex64").T) ** 2
+        mel_spec = self.mel_filters @ magnitudes
+        return np.log10(np.clip(mel_spec, a_min=1e-10, a_max=None))
@@ -4,11 +4,21 @@ import logging
 
 import uvicorn
 
+from src.helper.config import CONFIG
+from src.websocket.worker_pool import run_websocket_workers
+
 logger = logging.getLogger(__name__)
 
 
 def run_websocket_api(websocket_port, host):
     """Starts the WebSocket API server."""
+    if CONFIG["websocket_stream"].get("workers"):
+        logger.info(
+            f"Starting {len(CONFIG['websocket_stream']['workers'])} Websockets workers on '{host}:{websocket_port}'"
+        )
+        run_websocket_workers(websocket_port, host, CONFIG["websocket_stream"])
+        return
+
     logger.info(f"Starting Websockets server on '{host}:{websocket_port}'")
     uvicorn.run(
         "src.websocket.websockets_server:app",
@@ -8,12 +8,14 @@ import asyncio
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.websockets import WebSocketState
 from faster_whisper.transcribe import Word
-from pydub import AudioSegment
 
 from src.helper import logger
 from src.helper.data_handler import DataHandler
 from src.helper.local_agreement import LocalAgreement
+from src.websocket.audio_buffer import AudioRingBuffer
+from src.websocket.audio_export import AudioExportWriter
 from src.websocket.stream_transcriber import Transcriber
+from src.websocket.stream_vad import StreamingVad
 
 # To Calculate the seconds of audio in a chunk of 16000 Hz, 2 bytes per sample and 1 channel (as typically used in Whisper):
 # 16000 Hz * 2 bytes * 1 channel = 32000 bytes per second
@@ -25,6 +27,10 @@ FINAL_TRANSCRIPTION_THRESHOLD = 6
 # Max size of window defined in bytes
 MAX_WINDOW_SIZE_BYTES = BYTES_PER_SECOND * 15
 
+# The window grows beyond its max size until the next final, this is the headroom
+# preallocated for that
+WINDOW_BUFFER_HEADROOM_BYTES = BYTES_PER_SECOND * 5
+
 # Bytes after which a retranscription of the window is triggered
 PARTIAL_TRANSCRIPTION_BYTE_THRESHOLD = BYTES_PER_SECOND * 1
 
@@ -33,19 +39,27 @@ PARTIAL_TRANSCRIPTION_BYTE_THRESHOLD = BYTES_PER_SECOND * 1
 FINAL_PUBLISH_SECOND_THRESHOLD_FACTOR = 5
 
 class Stream:
-    def __init__(self, transcriber: Transcriber, id: int):
+    def __init__(
+        self,
+        transcriber: Transcriber,
+        id: int,
+        export_audio: bool = True,
+        vad_options: dict | None = None,
+    ):
         self.logger = logger.get_logger_with_id(__name__, f"{id}")
         self.transcriber = transcriber
         self.id = id
         self.close_stream = False
 
-        self.sliding_window = b""
-        self.total_bytes = b""
+        self.sliding_window = AudioRingBuffer(
+            MAX_WINDOW_SIZE_BYTES + WINDOW_BUFFER_HEADROOM_BYTES
+        )
         self.window_start_timestamp = 0
         self.agreement = LocalAgreement()
         self.bytes_received_since_last_transcription = 0
         self.final_transcriptions = []
-        self.export_audio = b""
+        # The audio of the whole session is only kept if it is exported at the end
+        self.export_audio = AudioExportWriter() if export_audio else None
         self.previous_byte_count = 0
 
         self.partial_transcription_byte_threshold = PARTIAL_TRANSCRIPTION_BYTE_THRESHOLD
@@ -56,6 +70,12 @@ class Stream:
 
         self.transcription_tasks = set()
 
+        # Partials are skipped while no speech arrives and speech ends with a final
+        self.vad = StreamingVad(**vad_options) if vad_options is not None else None
+        self.partial_count = 0
+        self.skipped_partial_count = 0
+        self.speech_end_count = 0
+
     async def echo(self, websocket: WebSocket) -> None:
         try:
             while not self.close_stream and websocket.client_state != WebSocketState.DISCONNECTED:
@@ -64,11 +84,11 @@ class Stream:
                 if "bytes" in message:
                     message = message["bytes"]
                     self.bytes_received_since_last_transcription += len(message)
-                    self.sliding_window += message
-                    self.total_bytes += message
-                    self.export_audio = self.concatenate_audio_with_crossfade(
-                        self.export_audio, message
-                    )
+                    self.sliding_window.append(message)
+                    if self.export_audio is not None:
+                        self.export_audio.append(message)
+                    if self.vad is not None:
+                        await asyncio.to_thread(self.vad.process, message)
 
                     if (
                         self.bytes_received_since_last_transcription >= self.partial_transcription_byte_threshold 
@@ -80,18 +100,29 @@ class Stream:
                         # Ensure that no duplicate transcription jobs are running
                         # This additonal check is needed as we are in nested async
                         if len(self.transcription_tasks) < 1:
-                            self.logger.info(
-                                f"NEW PARTIAL: length of current window: {len(self.sliding_window)}"
-                            )
-                            task = asyncio.create_task(
-                                self.transcribe_sliding_window(
-                                    websocket,
-                                    self.sliding_window
-                                ),
-                                name=f"transcription_task_stream_{self.id}"
-                            )
-                            self.transcription_tasks.add(task)
-                            task.add_done_callback(self.transcription_tasks.discard)
+                            if self.vad is not None and not self.vad.consume_new_speech():
+                                self.skipped_partial_count += 1
+                                self.logger.debug("No new speech, skipping partial")
+                            else:
+                                self.logger.info(
+                                    f"NEW PARTIAL: length of current window: {len(self.sliding_window)}"
+                                )
+                                self.partial_count += 1
+                                self.start_transcription_task(
+                                    self.transcribe_sliding_window(
+                                        websocket,
+                                        self.sliding_window.get_samples()
+                                    )
+                                )
+
+                    # Publish everything of an utterance once its speech ended
+                    if (
+                        self.vad is not None
+                        and len(self.transcription_tasks) < 1
+                        and self.vad.consume_speech_end()
+                    ):
+                        self.logger.info("NEW FINAL: speech ended")
+                        self.start_transcription_task(self.finalize_speech(websocket))
 
                     # Send final if either threshold is reached or sentence ended
                     if (
@@ -134,19 +165,50 @@ class Stream:
             await websocket.close()
             for task in self.transcription_tasks:
                 task.cancel()
+            if self.export_audio is not None:
+                self.export_audio.close()
+            self.logger.info(f"Stream stats: {self.get_stats()}")
+
+    def start_transcription_task(self, coroutine) -> None:
+        task = asyncio.create_task(
+            coroutine,
+            name=f"transcription_task_stream_{self.id}"
+        )
+        self.transcription_tasks.add(task)
+        task.add_done_callback(self.transcription_tasks.discard)
+
+    def get_stats(self) -> Dict:
+        """Returns how many partials ran and how many were skipped for lack of speech"""
+        return {
+            "partials": self.partial_count,
+            "skipped_partials": self.skipped_partial_count,
+            "speech_ends": self.speech_end_count,
+        }
 
 
     async def finalize_transcript(self) -> Dict:
         current_transcript = self.agreement.unconfirmed
         return await self.build_result_from_words(current_transcript)
 
+    async def finalize_speech(self, websocket: WebSocket) -> None:
+        """Transcribes the end of an utterance and publishes all of its words as final"""
+        await self.transcribe_sliding_window(
+            websocket, self.sliding_window.get_samples()
+        )
+        # No later partial will confirm the last words of the utterance
+        self.agreement.confirm_unconfirmed()
+        self.speech_end_count += 1
+        await self.flush_final(websocket, flush_all=True)
+
     async def flush_final(
-        self, websocket: WebSocket
+        self, websocket: WebSocket, flush_all: bool = False
     ) -> None:
         """Function to send a final to the client and update the content on the sliding window"""
         try:
             agreed_results = []
-            if self.agreement.contains_has_sentence_end():
+            if flush_all:
+                agreed_results = self.agreement.flush_confirmed()
+            elif self.agreement.contains_has_sentence_end():
                 agreed_results = self.agreement.flush_at_sentence_end()
             else:
                 agreed_results = self.agreement.flush_confirmed()
@@ -163,7 +225,7 @@ class Stream:
                 self.logger.debug(f"Reducing sliding window size by {bytes_to_cut_off} bytes")
                 self.previous_byte_count += bytes_to_cut_off
                 self.window_start_timestamp += bytes_to_cut_off / BYTES_PER_SECOND
-                self.sliding_window = self.sliding_window[bytes_to_cut_off:]
+                self.sliding_window.discard(bytes_to_cut_off)
 
             if not self.close_stream:
                 await websocket.send_text(json.dumps(result, indent=2))
@@ -217,10 +279,8 @@ class Stream:
             result: str = "Missing data"
             self.bytes_received_since_last_transcription = 0
 
-            # Pass the chunk to the transcriber
-            segments = self.transcriber._transcribe(
-                window_content,
-            )
+            # Pass the chunk to the transcriber, the model runs outside of the event loop
+            segments = await self.transcriber.transcribe(window_content)
 
             cutoff_timestamp = 0
             if len(self.final_transcriptions) > 0:
@@ -229,7 +289,7 @@ class Stream:
 
             new_words = []
 
-            for segment in list(segments):
+            for segment in segments:
                 if segment.words is None:
                     continue
                 for word in segment.words:
@@ -283,29 +343,9 @@ class Stream:
     def export_transcription_and_wav(self):
         DATA_HANDLER = DataHandler()
         name = uuid.uuid4().hex
-        DATA_HANDLER.export_wav_file(self.export_audio, name)
+        if self.export_audio is not None:
+            DATA_HANDLER.export_wav_file(self.export_audio.finish(), name)
+            self.export_audio.close()
+            self.export_audio = None
         DATA_HANDLER.export_dict_to_json_file(self.final_transcriptions, name)
         return name
-
-    def concatenate_audio_with_crossfade(
-        self, audio_chunk1: bytes, audio_chunk2: bytes, crossfade_duration=20
-    ) -> bytes:
-        """
-        Concatenates two audio chunks with crossfade to avoid click sounds.
-
-        :param audio_chunk1: First audio chunk in bytes.
-        :param audio_chunk2: Second audio chunk in bytes.
-        :param crossfade_duration: Duration of the crossfade in milliseconds.
-        :return: Concatenated audio chunk in bytes.
-        """
-        segment1 = AudioSegment(
-            data=audio_chunk1, sample_width=2, frame_rate=16000, channels=1
-        )
-        segment2 = AudioSegment(
-            data=audio_chunk2, sample_width=2, frame_rate=16000, channels=1
-        )
-        # Check the length of segments to avoid crossfade errors, when starting the stream
-        if len(segment1) < crossfade_duration or len(segment2) < crossfade_duration:
-            crossfade_duration = min(len(segment1), len(segment2), crossfade_duration)
-        combined = segment1.append(segment2, crossfade=crossfade_duration)
-        return combined.raw_data
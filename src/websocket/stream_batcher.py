@@ -0,0 +1,304 @@
+"""This module contains the micro-batching of stream windows across streams."""
+
+import asyncio
+import logging
+from concurrent.futures import Executor
+from dataclasses import replace
+from functools import partial
+from math import ceil
+from typing import Dict, List, NamedTuple
+
+import ctranslate2
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import (
+    Segment,
+    TranscriptionOptions,
+    Word,
+    get_ctranslate2_storage,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PreparedWindow(NamedTuple):
+    """Features of the speech chunks of a window and how to decode them."""
+
+    features: np.ndarray
+    tokenizer: Tokenizer
+    chunks_metadata: List[dict]
+    options: TranscriptionOptions
+
+
+class PreparingPipeline(BatchedInferencePipeline):
+    """
+    BatchedInferencePipeline that stops before the model decodes the audio.
+
+    `transcribe` still runs the VAD, the feature extraction and the language detection
+    of the pipeline, but returns the prepared window instead of the segment generator.
+    """
+
+    def _batched_segments_generator(
+        self, features, tokenizer, chunks_metadata, batch_size, options, log_progress
+    ):
+        return PreparedWindow(features, tokenizer, chunks_metadata, options)
+
+
+class StreamPipeline(BatchedInferencePipeline):
+    """
+    BatchedInferencePipeline that decodes the speech chunks of several stream windows.
+
+    The encoder and decoder run on all chunks at once, the word timestamps are aligned
+    per window. `add_word_timestamps` carries the end of the last speech from chunk to
+    chunk, which must not leak from the window of one stream into another.
+    """
+
+    def generate_segment_batched(self, features, tokenizer, options):
+        # Kept for the word alignment of forward_windows
+        self._encoder_output, outputs = super().generate_segment_batched(
+            features, tokenizer, options
+        )
+        return self._encoder_output, outputs
+
+    def forward_windows(
+        self,
+        features: np.ndarray,
+        tokenizer: Tokenizer,
+        chunks_metadata: List[dict],
+        options: TranscriptionOptions,
+        windows: List[int],
+        last_speech_timestamps: Dict[int, float],
+    ) -> List[List[dict]]:
+        """
+        Decodes the chunks like `forward`, `windows` holds the window of each chunk.
+
+        `last_speech_timestamps` holds the end of the last speech per window, it is
+        updated for windows whose chunks are split across several calls.
+        """
+        outputs = self.forward(
+            features,
+            tokenizer,
+            chunks_metadata,
+            replace(options, word_timestamps=False),
+        )
+        if not options.word_timestamps:
+            return outputs
+
+        encoder_output = self._encoder_output
+        bounds = [i for i in range(1, len(windows)) if windows[i] != windows[i - 1]]
+        if bounds:
+            # The encoder output is split by window, which needs it on the CPU
+            if encoder_output.device != "cpu":
+                encoder_output = encoder_output.to_device(ctranslate2.Device.cpu)
+            encoder_output = np.array(encoder_output)
+        for start, end in zip([0] + bounds, bounds + [len(windows)]):
+            segment_sizes = [
+                int(
+                    ceil(metadata["end_time"] - metadata["start_time"])
+                    * self.model.frames_per_second
+                )
+                for metadata in chunks_metadata[start:end]
+            ]
+            last_speech_timestamps[windows[start]] = self.model.add_word_timestamps(
+                outputs[start:end],
+                tokenizer,
+                (
+                    get_ctranslate2_storage(encoder_output[start:end])
+                    if bounds
+                    else encoder_output
+                ),
+                segment_sizes,
+                options.prepend_punctuations,
+                options.append_punctuations,
+                last_speech_timestamps.get(windows[start], 0.0),
+            )
+        return outputs
+
+
+class PendingWindow(NamedTuple):
+    window: PreparedWindow
+    future: asyncio.Future
+
+
+class StreamBatcher:
+    """
+    Transcribes the windows of all streams of a transcriber in shared batches.
+
+    Windows that are submitted within `batch_wait_ms` of each other are decoded in one
+    batched encoder/decoder pass of up to `batch_size` speech chunks, the segments are
+    then handed back to each stream. `concurrency` batches run at the same time, one
+    per model worker.
+    """
+
+    def __init__(
+        self,
+        model: WhisperModel,
+        executor: Executor,
+        batch_size: int = 16,
+        batch_wait_ms: int = 50,
+        concurrency: int = 1,
+    ):
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_ms / 1000
+        self._preparer = PreparingPipeline(model=model)
+        # Every running batch needs its own pipeline, it keeps state between chunks
+        self._pipelines = [
+            StreamPipeline(model=model) for _ in range(max(1, concurrency))
+        ]
+        # Created on first use, they belong to the event loop of the server
+        self._queue: asyncio.Queue | None = None
+        self._consumers: List[asyncio.Task] = []
+
+    async def transcribe(self, audio: np.ndarray, settings: dict) -> List[Segment]:
+        """Transcribes a window in the next batch and returns its segments."""
+        loop = asyncio.get_running_loop()
+        window = await loop.run_in_executor(
+            self.executor, partial(self._prepare, audio, settings)
+        )
+        if window is None:
+            return []
+
+        self._start_consumers()
+        future = loop.create_future()
+        await self._queue.put(PendingWindow(window, future))
+        return await future
+
+    def _prepare(self, audio: np.ndarray, settings: dict) -> PreparedWindow | None:
+        """Extracts the features of the speech chunks, None if there is no speech."""
+        window, _ = self._preparer.transcribe(audio, **settings)
+        if len(window.features) == 0:
+            return None
+        return window
+
+    def _start_consumers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._consumers:
+            self._consumers = [
+                asyncio.create_task(self._run_batches(pipeline))
+                for pipeline in self._pipelines
+            ]
+
+    async def _run_batches(self, pipeline: StreamPipeline) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            for windows in StreamBatcher._group(batch).values():
+                try:
+                    results = await loop.run_in_executor(
+                        self.executor,
+                        self._forward,
+                        pipeline,
+                        [pending.window for pending in windows],
+                    )
+                except Exception as e:
+                    for pending in windows:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+                    continue
+                for pending, segments in zip(windows, results):
+                    if not pending.future.done():
+                        pending.future.set_result(segments)
+
+    async def _collect_batch(self) -> List[PendingWindow]:
+        """Waits for a window and collects the windows submitted until the deadline."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        chunks = len(batch[0].window.chunks_metadata)
+        deadline = loop.time() + self.batch_wait_seconds
+        while chunks < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                pending = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(pending)
+            chunks += len(pending.window.chunks_metadata)
+        # Streams that closed in the meantime cancelled their window
+        return [pending for pending in batch if not pending.future.done()]
+
+    @staticmethod
+    def _group(batch: List[PendingWindow]) -> Dict[tuple, List[PendingWindow]]:
+        """Groups the windows that can be decoded with the same prompt tokens."""
+        groups: Dict[tuple, List[PendingWindow]] = {}
+        for pending in batch:
+            tokenizer = pending.window.tokenizer
+            key = (
+                tokenizer.language_code,
+                tokenizer.task,
+                str(pending.window.options.initial_prompt),
+            )
+            groups.setdefault(key, []).append(pending)
+        return groups
+
+    def _forward(
+        self, pipeline: StreamPipeline, windows: List[PreparedWindow]
+    ) -> List[List[Segment]]:
+        """Decodes the chunks of all windows in batches, runs in the executor."""
+        features = np.concatenate([window.features for window in windows])
+        chunks_metadata = [
+            metadata for window in windows for metadata in window.chunks_metadata
+        ]
+        chunk_windows = [
+            index
+            for index, window in enumerate(windows)
+            for _ in window.chunks_metadata
+        ]
+        tokenizer, options = windows[0].tokenizer, windows[0].options
+        LOGGER.debug(
+            f"Decoding {len(chunks_metadata)} chunks of {len(windows)} streams"
+        )
+
+        outputs = []
+        # Each stream window starts without previous speech
+        last_speech_timestamps: Dict[int, float] = {}
+        for i in range(0, len(features), self.batch_size):
+            outputs += pipeline.forward_windows(
+                features[i : i + self.batch_size],
+                tokenizer,
+                chunks_metadata[i : i + self.batch_size],
+                options,
+                chunk_windows[i : i + self.batch_size],
+                last_speech_timestamps,
+            )
+
+        results = []
+        start = 0
+        for window in windows:
+            end = start + len(window.chunks_metadata)
+            results.append(StreamBatcher._to_segments(outputs[start:end], options))
+            start = end
+        return results
+
+    @staticmethod
+    def _to_segments(
+        outputs: List[List[dict]], options: TranscriptionOptions
+    ) -> List[Segment]:
+        """Builds the segments like `BatchedInferencePipeline.transcribe` does."""
+        segments = []
+        for output in outputs:
+            for segment in output:
+                segments.append(
+                    Segment(
+                        seek=segment["seek"],
+                        id=len(segments) + 1,
+                        text=segment["text"],
+                        start=round(segment["start"], 3),
+                        end=round(segment["end"], 3),
+                        words=(
+                            None
+                            if not options.word_timestamps
+                            else [Word(**word) for word in segment["words"]]
+                        ),
+                        tokens=segment["tokens"],
+                        avg_logprob=segment["avg_logprob"],
+                        no_speech_prob=segment["no_speech_prob"],
+                        compression_ratio=segment["compression_ratio"],
+                        temperature=options.temperatures[0],
+                    )
+                )
+        return segments
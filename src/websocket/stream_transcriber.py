@@ -1,18 +1,26 @@
 """Module to handle the transcription process"""
 
-import io
-from typing import Iterable
-import wave
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
 
+import numpy as np
 from faster_whisper import WhisperModel, BatchedInferencePipeline
 from faster_whisper.utils import logging
 from faster_whisper.transcribe import Segment
 
 from src.helper.model_handler import ModelHandler
 from src.helper.transcription_settings import TranscriptionSettings
+from src.websocket.audio_buffer import pcm16_to_float32
+from src.websocket.feature_cache import CachingFeatureExtractor
+from src.websocket.stream_batcher import StreamBatcher
 
 LOGGER = logging.getLogger(__name__)
 
+# Weight of the latest inference time in the moving average of the latency
+LATENCY_SMOOTHING = 0.2
+
 
 class Transcriber:
     def __init__(
@@ -20,10 +28,12 @@ class Transcriber:
         model_name: str,
         device: str,
         compute_type: str,
-        device_index: list,
+        device_index: int | list,
         cpu_threads: int,
         num_workers: int,
         mode: str = "default",
+        batch_size: int = 16,
+        batch_wait_ms: int = 50,
     ):
         """
         This class converts audio to text. You should use it by initializing a Transcriber once and then pass it to all streams that you want to transcribe at.
@@ -31,11 +41,17 @@ class Transcriber:
         Args:
             model_name: Which Whisper model to use.
             device: Which device to use. cuda or CPU.
-            device_index: Which device IDs to use. E.g. for 3 GPUs = [0,1,2]
+            device_index: Which device ID to use, a list of IDs shares one model across GPUs.
+                The websocket server creates one Transcriber per GPU instead.
             compute_type: Quantization of the Whisper model
             cpu_threads: Number of threads to use when running on CPU (4 by default)
             num_workers: Having multiple workers enables true parallelism when running the model
-            should_use_batched: Should use batched inference pipeline
+            mode: "batched" decodes the windows of all streams in shared batches
+            batch_size: Maximum number of speech chunks decoded in one batch
+            batch_wait_ms: How long a window waits for the windows of other streams
+
+        The model runs in a pool of num_workers threads, so the event loop of the
+        websocket server stays responsive and streams are transcribed in parallel.
         """
 
         self._log = LOGGER
@@ -46,14 +62,36 @@ class Transcriber:
         self._cpu_threads = cpu_threads
         self._num_workers = num_workers
         self._model: WhisperModel = self._load_model()
+        # One thread per model worker, more would only wait inside CTranslate2
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, num_workers), thread_name_prefix=f"stream_{device}"
+        )
         self.should_use_batched = mode == "batched"
+        self._batch_size = batch_size
+        # Moving average of the inference time of a window, used to route new streams
+        self.recent_latency = 0.0
         self._batched_model = None
+        self._batcher = None
         if self.should_use_batched:
             self._log.info("Stream transcriber using batched inference pipeline")
             self._batched_model = BatchedInferencePipeline(model=self._model)
+            self._batcher = StreamBatcher(
+                self._model,
+                self._executor,
+                batch_size=batch_size,
+                batch_wait_ms=batch_wait_ms,
+                concurrency=num_workers,
+            )
 
     @classmethod
-    def for_gpu(cls, model_name: str, device_index: list):
+    def for_gpu(
+        cls,
+        model_name: str,
+        device_index: int | list,
+        mode: str = "default",
+        batch_size: int = 16,
+        batch_wait_ms: int = 50,
+    ):
         return cls(
             model_name=model_name,
             device="cuda",
@@ -61,10 +99,21 @@ class Transcriber:
             device_index=device_index,
             cpu_threads=4,
             num_workers=1,
+            mode=mode,
+            batch_size=batch_size,
+            batch_wait_ms=batch_wait_ms,
         )
 
     @classmethod
-    def for_cpu(cls, model_name: str, cpu_threads, num_workers):
+    def for_cpu(
+        cls,
+        model_name: str,
+        cpu_threads,
+        num_workers,
+        mode: str = "default",
+        batch_size: int = 16,
+        batch_wait_ms: int = 50,
+    ):
         return cls(
             model_name=model_name,
             device="cpu",
@@ -72,12 +121,15 @@ class Transcriber:
             compute_type="int8",
             cpu_threads=cpu_threads,
             num_workers=num_workers,
+            mode=mode,
+            batch_size=batch_size,
+            batch_wait_ms=batch_wait_ms,
         )
 
     def _load_model(self) -> None:
         """loads the model if not loaded"""
         ModelHandler().setup_model(self._model_name)
-        return WhisperModel(
+        model = WhisperModel(
             ModelHandler().get_model_path(self._model_name),
             local_files_only=True,
             device=self._device,
@@ -86,27 +138,61 @@ class Transcriber:
             cpu_threads=self._cpu_threads,
             num_workers=self._num_workers,
         )
+        # Consecutive partials of a stream share most of their audio
+        model.feature_extractor = CachingFeatureExtractor(**model.feat_kwargs)
+        return model
 
-    def _transcribe(
+    async def transcribe(
         self,
-        audio_chunk: bytes,
+        audio_chunk: np.ndarray | bytes,
         prompt: str = "",
-    ) -> Iterable[Segment]:
-        """Function to run the transcription process"""
-        sample_rate = 16000
-        num_channels = 1
-        sampwidth = 2
-
-        with io.BytesIO() as wav_io:
-            with wave.open(wav_io, "wb") as wav_file:
-                wav_file.setnchannels(num_channels)
-                wav_file.setsampwidth(sampwidth)
-                wav_file.setframerate(sample_rate)
-                wav_file.writeframes(audio_chunk)
-            wav_io.seek(0)
+    ) -> List[Segment]:
+        """Runs the transcription in the thread pool and awaits the segments"""
+        start = time.perf_counter()
+        if self._batcher is not None:
+            if not (isinstance(audio_chunk, np.ndarray) and audio_chunk.dtype == np.float32):
+                audio_chunk = pcm16_to_float32(audio_chunk)
             settings = TranscriptionSettings().get_and_update_settings(
                 {"initial_prompt": prompt}
             )
-            if self.should_use_batched:
-                return self._batched_model.transcribe(wav_io, batch_size=16, **settings)[0]
-            return self._model.transcribe(wav_io, **settings)[0]
+            segments = await self._batcher.transcribe(audio_chunk, settings)
+        else:
+            segments = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._transcribe_segments, audio_chunk, prompt
+            )
+        self.record_latency(time.perf_counter() - start)
+        return segments
+
+    def record_latency(self, seconds: float) -> None:
+        if self.recent_latency == 0.0:
+            self.recent_latency = seconds
+        else:
+            self.recent_latency += LATENCY_SMOOTHING * (seconds - self.recent_latency)
+
+    def _transcribe_segments(
+        self, audio_chunk: np.ndarray | bytes, prompt: str
+    ) -> List[Segment]:
+        """Consumes the segment generator, the model only runs while it is iterated"""
+        return list(self._transcribe(audio_chunk, prompt))
+
+    def _transcribe(
+        self,
+        audio_chunk: np.ndarray | bytes,
+        prompt: str = "",
+    ) -> Iterable[Segment]:
+        """
+        Function to run the transcription process
+
+        Args:
+            audio_chunk: 16 kHz mono audio, either normalized float32 samples or 16 bit PCM
+            prompt: Initial prompt for the model
+        """
+        # faster-whisper skips decoding for arrays, which are taken as float32 at 16 kHz
+        if not (isinstance(audio_chunk, np.ndarray) and audio_chunk.dtype == np.float32):
+            audio_chunk = pcm16_to_float32(audio_chunk)
+        settings = TranscriptionSettings().get_and_update_settings(
+            {"initial_prompt": prompt}
+        )
+        if self.should_use_batched:
+            return self._batched_model.transcribe(audio_chunk, batch_size=self._batch_size, **settings)[0]
+        return self._model.transcribe(audio_chunk, **settings)[0]
@@ -0,0 +1,95 @@
+"""This module contains the voice activity detection of the incoming audio of a stream."""
+
+import math
+
+import numpy as np
+from faster_whisper.vad import get_vad_model
+
+from src.websocket.audio_buffer import pcm16_to_float32
+
+SAMPLE_RATE = 16000
+
+# Silero VAD processes frames of 512 samples, each with the last 64 samples before it
+FRAME_SAMPLES = 512
+CONTEXT_SAMPLES = 64
+
+
+class StreamingVad:
+    """
+    Silero VAD that runs incrementally on the audio chunks of a stream.
+
+    The state of the model is kept between chunks, so every sample is only processed
+    once. Speech starts with a frame of at least `threshold` speech probability and
+    ends after `min_silence_duration_ms` of frames below `threshold - 0.15`, the same
+    hysteresis faster-whisper uses.
+    """
+
+    def __init__(self, threshold: float = 0.5, min_silence_duration_ms: int = 500):
+        self.threshold = threshold
+        self.neg_threshold = max(threshold - 0.15, 0.01)
+        self.min_silence_frames = math.ceil(
+            min_silence_duration_ms * SAMPLE_RATE / 1000 / FRAME_SAMPLES
+        )
+        self._model = get_vad_model()
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._context = np.zeros(CONTEXT_SAMPLES, dtype=np.float32)
+        # Audio that does not fill a frame yet
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._partial_sample = b""
+
+        self.in_speech = False
+        self._silent_frames = 0
+        self._new_speech = False
+        self._speech_ended = False
+
+    def process(self, chunk: bytes) -> None:
+        """Runs the VAD on a chunk of 16 bit PCM audio."""
+        chunk = self._partial_sample + chunk
+        usable = len(chunk) - len(chunk) % 2
+        self._partial_sample = chunk[usable:]
+        samples = np.concatenate([self._pending, pcm16_to_float32(chunk[:usable])])
+        count = len(samples) // FRAME_SAMPLES
+        self._pending = samples[count * FRAME_SAMPLES :]
+        if count == 0:
+            return
+
+        frames = samples[: count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES)
+        contexts = np.concatenate(
+            [self._context[np.newaxis], frames[:-1, -CONTEXT_SAMPLES:]]
+        )
+        self._context = frames[-1, -CONTEXT_SAMPLES:].copy()
+
+        # The encoder runs on all frames at once, only the decoder carries the state
+        encoder_output = self._model.encoder_session.run(
+            None, {"input": np.concatenate([contexts, frames], axis=1)}
+        )[0].reshape(count, -1)
+        for frame in encoder_output:
+            probability, self._state = self._model.decoder_session.run(
+                None, {"input": frame[np.newaxis], "state": self._state}
+            )
+            self._update(float(probability.squeeze()))
+
+    def _update(self, probability: float) -> None:
+        if probability >= self.threshold:
+            self.in_speech = True
+            self._silent_frames = 0
+        elif self.in_speech and probability < self.neg_threshold:
+            self._silent_frames += 1
+            if self._silent_frames >= self.min_silence_frames:
+                self.in_speech = False
+                self._silent_frames = 0
+                self._speech_ended = True
+        if self.in_speech:
+            self._new_speech = True
+
+    def consume_new_speech(self) -> bool:
+        """Whether speech arrived since the last call."""
+        new_speech = self._new_speech
+        self._new_speech = False
+        return new_speech
+
+    def consume_speech_end(self) -> bool:
+        """Whether speech ended since the last call."""
+        speech_ended = self._speech_ended
+        self._speech_ended = False
+        return speech_ended
@@ -0,0 +1,100 @@
+"""This File contains tests for the AdmissionQueue class."""
+
+import asyncio
+
+import pytest
+
+from src.websocket.admission_queue import AdmissionQueue, QueueFullError
+
+
+def test_free_seats_are_taken_in_pool_order():
+    """Tests that the first pool is used before the second one."""
+    queue = AdmissionQueue({"gpu": 1, "cpu": 1})
+
+    async def run():
+        return [await queue.acquire(), await queue.acquire()]
+
+    assert asyncio.run(run()) == ["gpu", "cpu"]
+    assert queue.free_seats == {"gpu": 0, "cpu": 0}
+
+
+def test_released_seat_is_handed_to_waiters_in_order():
+    """Tests FIFO handoff and the position notifications of the waiters."""
+    queue = AdmissionQueue({"cpu": 1})
+    positions = {"first": [], "second": []}
+    admitted = []
+
+    async def client(name):
+        async def on_position(position):
+            positions[name].append(position)
+
+        await queue.acquire(on_position)
+        admitted.append(name)
+
+    async def run():
+        await queue.acquire()
+        first = asyncio.create_task(client("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(client("second"))
+        await asyncio.sleep(0.01)
+        queue.release("cpu")
+        await first
+        await asyncio.sleep(0.01)
+        queue.release("cpu")
+        await second
+
+    asyncio.run(run())
+
+    assert admitted == ["first", "second"]
+    assert positions == {"first": [1], "second": [2, 1]}
+    # The seat went from client to client without becoming free
+    assert queue.free_seats == {"cpu": 0}
+
+
+def test_full_queue_rejects_clients():
+    """Tests that no more than max_queue_size clients wait."""
+    queue = AdmissionQueue({"cpu": 0}, max_queue_size=1)
+
+    async def run():
+        waiting = asyncio.create_task(queue.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await queue.acquire()
+        waiting.cancel()
+        await asyncio.sleep(0)
+        return len(queue)
+
+    assert asyncio.run(run()) == 0
+
+
+def test_waiter_that_leaves_is_removed():
+    """Tests that a disconnected waiter does not keep its place or a seat."""
+    queue = AdmissionQueue({"cpu": 1})
+
+    async def on_position(position):
+        raise ConnectionError()
+
+    async def run():
+        await queue.acquire()
+        with pytest.raises(ConnectionError):
+            await queue.acquire(on_position)
+        queue.release("cpu")
+
+    asyncio.run(run())
+
+    assert len(queue) == 0
+    assert queue.free_seats == {"cpu": 1}
+
+
+def test_rank_chooses_among_free_pools():
+    """Tests that the free pool with the lowest rank is used."""
+    load = {"gpu:0": 2.0, "gpu:1": 1.0, "cpu": 0.0}
+    queue = AdmissionQueue(
+        {"gpu:0": 1, "gpu:1": 1, "cpu": 1},
+        rank=lambda pool: (pool == "cpu", load[pool]),
+    )
+
+    async def run():
+        return [await queue.acquire() for _ in range(3)]
+
+    assert asyncio.run(run()) == ["gpu:1", "gpu:0", "cpu"]
@@ -0,0 +1,58 @@
+"""This File contains tests for the AudioRingBuffer class."""
+
+import numpy as np
+
+from src.websocket.audio_buffer import AudioRingBuffer, pcm16_to_float32
+
+
+def test_append_and_discard_wrap_around():
+    """Tests that the content stays in order when it wraps around the buffer end."""
+    buffer = AudioRingBuffer(8)
+    buffer.append(b"abcdef")
+    buffer.discard(4)
+    buffer.append(b"ghijk")
+
+    assert len(buffer) == 7
+    assert buffer.capacity == 8
+    assert buffer.get_bytes() == b"efghijk"
+
+
+def test_buffer_grows_when_full():
+    """Tests that appending more than the capacity keeps all bytes."""
+    buffer = AudioRingBuffer(4)
+    buffer.append(b"abc")
+    buffer.discard(2)
+    buffer.append(b"defghij")
+
+    assert buffer.capacity == 8
+    assert buffer.get_bytes() == b"cdefghij"
+
+
+def test_discard_more_than_buffered():
+    """Tests that discarding everything leaves an empty buffer."""
+    buffer = AudioRingBuffer(4)
+    buffer.append(b"ab")
+    buffer.discard(10)
+
+    assert len(buffer) == 0
+    assert buffer.get_bytes() == b""
+
+
+def test_get_samples_wrap_around():
+    """Tests that the samples are normalized float32 and in order across the buffer end."""
+    pcm = np.array([0, -32768, 16384, 32767, -16384], dtype=np.int16).tobytes()
+    buffer = AudioRingBuffer(8)
+    buffer.append(pcm[:6])
+    buffer.discard(2)
+    buffer.append(pcm[6:])
+
+    samples = buffer.get_samples()
+    assert samples.dtype == np.float32
+    assert np.allclose(samples, [-1.0, 0.5, 32767 / 32768, -0.5])
+
+
+def test_pcm16_to_float32_ignores_split_sample():
+    """Tests that a trailing odd byte is not read as a sample."""
+    samples = pcm16_to_float32(np.array([16384], dtype=np.int16).tobytes() + b"\x01")
+
+    assert samples.tolist() == [0.5]
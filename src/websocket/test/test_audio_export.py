@@ -0,0 +1,38 @@
+"""This File contains tests for the AudioExportWriter class."""
+
+import numpy as np
+from pydub import AudioSegment
+
+from src.websocket.audio_export import AudioExportWriter
+
+
+def pydub_concatenate(audio: bytes, chunk: bytes, crossfade: int = 20) -> bytes:
+    """The per chunk concatenation the export used before."""
+    segment1 = AudioSegment(data=audio, sample_width=2, frame_rate=16000, channels=1)
+    segment2 = AudioSegment(data=chunk, sample_width=2, frame_rate=16000, channels=1)
+    crossfade = min(len(segment1), len(segment2), crossfade)
+    return segment1.append(segment2, crossfade=crossfade).raw_data
+
+
+def test_writer_matches_pydub_crossfade():
+    """Tests that the incremental export equals pydub's crossfaded concatenation."""
+    rng = np.random.default_rng(0)
+    expected = b""
+    writer = AudioExportWriter()
+    # Chunks of whole milliseconds, including ones shorter than the crossfade
+    for samples in [1600, 3200, 160, 16, 1600, 4800, 320]:
+        chunk = rng.integers(-32768, 32767, samples, dtype=np.int16).tobytes()
+        expected = pydub_concatenate(expected, chunk)
+        writer.append(chunk)
+
+    assert writer.finish().read() == expected
+
+
+def test_writer_keeps_split_samples():
+    """Tests that a sample split across two chunks is not lost."""
+    writer = AudioExportWriter(crossfade_ms=0)
+    audio = np.arange(100, dtype=np.int16).tobytes()
+    writer.append(audio[:51])
+    writer.append(audio[51:])
+
+    assert writer.finish().read() == audio
@@ -0,0 +1,49 @@
+"""This File contains tests for the CachingFeatureExtractor class."""
+
+import numpy as np
+from faster_whisper.feature_extractor import FeatureExtractor
+
+from src.websocket.feature_cache import CachingFeatureExtractor
+
+SAMPLE_RATE = 16000
+
+
+def example_audio(seconds: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(seconds * SAMPLE_RATE) * 0.1).astype(np.float32)
+
+
+def test_growing_window_matches_feature_extractor():
+    """Tests that reused frames give the same features as a full extraction."""
+    audio = example_audio(6)
+    extractor = FeatureExtractor()
+    caching_extractor = CachingFeatureExtractor()
+
+    for end in range(SAMPLE_RATE, len(audio) + 1, SAMPLE_RATE):
+        expected = extractor(audio[:end])
+        assert np.array_equal(caching_extractor(audio[:end]), expected)
+
+    # Each frame was computed about once, not once per partial
+    assert caching_extractor.computed_frames < 1.05 * expected.shape[-1]
+
+
+def test_changed_audio_is_recomputed():
+    """Tests that frames after a change of the audio are not taken from the cache."""
+    audio = example_audio(3)
+    caching_extractor = CachingFeatureExtractor()
+    caching_extractor(audio)
+
+    changed = audio.copy()
+    changed[SAMPLE_RATE:] *= 0.5
+
+    assert np.array_equal(caching_extractor(changed), FeatureExtractor()(changed))
+
+
+def test_cache_is_bounded():
+    """Tests that only max_entries waveforms are kept."""
+    caching_extractor = CachingFeatureExtractor(max_entries=2)
+    for seed in range(3):
+        rng = np.random.default_rng(seed)
+        caching_extractor(rng.standard_normal(SAMPLE_RATE).astype(np.float32))
+
+    assert len(caching_extractor._cache) == 2
@@ -0,0 +1,178 @@
+"""This File contains tests for the StreamBatcher class."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from unittest.mock import Mock, patch
+
+import ctranslate2
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+
+from src.websocket.stream_batcher import PreparedWindow, StreamBatcher
+
+
+def prepared_window(audio, settings):
+    """Prepares one speech chunk per window, tagged with the stream's audio."""
+    tokenizer = Mock(language_code=settings["language"], task=1)
+    return PreparedWindow(
+        features=np.zeros((1, 80, 3000), dtype=np.float32),
+        tokenizer=tokenizer,
+        chunks_metadata=[{"stream": audio}],
+        options=Mock(initial_prompt=None),
+    )
+
+
+def create_batcher():
+    batcher = StreamBatcher(
+        Mock(), ThreadPoolExecutor(max_workers=1), batch_size=16, batch_wait_ms=200
+    )
+    batcher._prepare = prepared_window
+    batches = []
+
+    def forward(pipeline, windows):
+        batches.append(windows)
+        return [[window.chunks_metadata[0]["stream"]] for window in windows]
+
+    batcher._forward = forward
+    return batcher, batches
+
+
+def test_windows_of_concurrent_streams_share_a_batch():
+    """Tests that concurrent windows are decoded once and fanned back in order."""
+    batcher, batches = create_batcher()
+
+    async def run():
+        return await asyncio.gather(
+            *[batcher.transcribe(stream, {"language": "en"}) for stream in range(3)]
+        )
+
+    assert asyncio.run(run()) == [[0], [1], [2]]
+    assert len(batches) == 1
+    assert len(batches[0]) == 3
+
+
+def test_windows_of_different_languages_are_decoded_separately():
+    """Tests that windows are only batched with the same prompt tokens."""
+    batcher, batches = create_batcher()
+
+    async def run():
+        return await asyncio.gather(
+            batcher.transcribe("a", {"language": "en"}),
+            batcher.transcribe("b", {"language": "de"}),
+            batcher.transcribe("c", {"language": "en"}),
+        )
+
+    assert asyncio.run(run()) == [["a"], ["b"], ["c"]]
+    assert sorted(len(windows) for windows in batches) == [1, 2]
+
+
+@dataclass
+class Options:
+    """The transcription options used by the batcher."""
+
+    word_timestamps: bool = True
+    prepend_punctuations: str = ""
+    append_punctuations: str = ""
+    temperatures: tuple = (0.0,)
+    initial_prompt: str | None = None
+
+
+def speech_window(stream: int, chunks: list) -> PreparedWindow:
+    """A window of `(start_time, end_time)` chunks, its features hold the stream."""
+    return PreparedWindow(
+        features=np.full((len(chunks), 2, 4), stream, dtype=np.float32),
+        tokenizer=Mock(decode=Mock(return_value=" word")),
+        chunks_metadata=[
+            {"start_time": start, "end_time": end} for start, end in chunks
+        ],
+        options=Options(),
+    )
+
+
+def fake_model() -> Mock:
+    """Whisper model whose words start at the last speech, like after a pause."""
+    model = Mock(frames_per_second=100)
+    model._split_segments_by_timestamps.side_effect = (
+        lambda time_offset, segment_duration, **kwargs: (
+            [
+                {
+                    "tokens": [1],
+                    "start": time_offset,
+                    "end": time_offset + segment_duration,
+                }
+            ],
+            0,
+            False,
+        )
+    )
+
+    def add_word_timestamps(
+        segments, tokenizer, encoder_output, num_frames, prepend, append, last_speech
+    ):
+        # The encoder output only holds the chunks of one stream
+        streams = set(np.array(encoder_output).flatten().tolist())
+        assert len(streams) == 1
+        word = f"stream{int(streams.pop())}"
+        for segment in segments:
+            for subsegment in segment:
+                subsegment["words"] = [
+                    {
+                        "word": word,
+                        "start": last_speech,
+                        "end": subsegment["end"],
+                        "probability": 1.0,
+                    }
+                ]
+                last_speech = subsegment["end"]
+        return last_speech
+
+    model.add_word_timestamps.side_effect = add_word_timestamps
+    return model
+
+
+def generate_segment_batched(self, features, tokenizer, options):
+    """Encodes the features as they are and decodes one token per chunk."""
+    outputs = [{"avg_logprob": 0.0, "no_speech_prob": 0.0, "tokens": [1]}] * len(
+        features
+    )
+    return ctranslate2.StorageView.from_array(features), outputs
+
+
+def forward_words(windows: list, batch_size: int = 16) -> list:
+    """Decodes the windows in one batch and returns the words of each window."""
+    batcher = StreamBatcher(
+        fake_model(), ThreadPoolExecutor(max_workers=1), batch_size=batch_size
+    )
+    with patch.object(
+        BatchedInferencePipeline, "generate_segment_batched", generate_segment_batched
+    ):
+        results = batcher._forward(batcher._pipelines[0], windows)
+    return [
+        [
+            (word.word, word.start, word.end)
+            for segment in segments
+            for word in segment.words
+        ]
+        for segments in results
+    ]
+
+
+def test_word_timestamps_of_streams_in_one_batch_do_not_interact():
+    """Tests that each window is aligned on its own, starting without speech."""
+    first, second = speech_window(1, [(0.0, 5.0)]), speech_window(2, [(0.0, 3.0)])
+
+    batched = forward_words([first, second])
+
+    assert batched == [[("stream1", 0.0, 5.0)], [("stream2", 0.0, 3.0)]]
+    assert batched == forward_words([first]) + forward_words([second])
+
+
+def test_word_timestamps_carry_over_within_a_window():
+    """Tests that the chunks of a window split across batches share the last speech."""
+    window = speech_window(1, [(0.0, 2.0), (4.0, 6.0)])
+
+    assert forward_words([speech_window(2, [(0.0, 3.0)]), window], batch_size=2) == [
+        [("stream2", 0.0, 3.0)],
+        [("stream1", 0.0, 2.0), ("stream1", 2.0, 6.0)],
+    ]
@@ -0,0 +1,47 @@
+"""This File contains tests for the stream Transcriber class."""
+
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+from src.websocket.stream_transcriber import Transcriber
+
+TRANSCRIPTION_SECONDS = 0.3
+
+
+def slow_transcription(self, audio_chunk, prompt=""):
+    """Blocks like the model and yields lazily like faster-whisper."""
+    time.sleep(TRANSCRIPTION_SECONDS)
+    yield "segment"
+
+
+@patch("src.websocket.stream_transcriber.Transcriber._load_model", return_value=Mock())
+@patch("src.websocket.stream_transcriber.Transcriber._transcribe", slow_transcription)
+def test_transcribe_does_not_block_event_loop(_):
+    """Tests that transcriptions run in parallel next to a responsive event loop."""
+    transcriber = Transcriber.for_cpu("tiny", cpu_threads=1, num_workers=2)
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            transcriber.transcribe(b"\x00\x00"), transcriber.transcribe(b"\x00\x00")
+        )
+        duration = time.perf_counter() - start
+        ticker.cancel()
+        return results, duration, ticks
+
+    results, duration, ticks = asyncio.run(run())
+
+    assert results == [["segment"], ["segment"]]
+    # Both workers ran at the same time
+    assert duration < 2 * TRANSCRIPTION_SECONDS
+    assert ticks > 5
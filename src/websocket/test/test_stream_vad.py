@@ -0,0 +1,82 @@
+"""This File contains tests for the StreamingVad class."""
+
+import asyncio
+import wave
+from unittest.mock import AsyncMock, Mock
+
+from fastapi import WebSocketDisconnect
+from fastapi.websockets import WebSocketState
+
+from src.websocket.stream import BYTES_PER_SECOND, Stream
+from src.websocket.stream_vad import StreamingVad
+
+EXAMPLE_WAV_FILE = "src/websocket/test/example.wav"
+CHUNK_SIZE = BYTES_PER_SECOND // 4
+
+
+def read_example_audio() -> bytes:
+    with wave.open(EXAMPLE_WAV_FILE, "rb") as wav_file:
+        return wav_file.readframes(wav_file.getnframes())
+
+
+def chunks(audio: bytes):
+    return [audio[i : i + CHUNK_SIZE] for i in range(0, len(audio), CHUNK_SIZE)]
+
+
+def test_speech_and_speech_end_are_detected():
+    """Tests that speech is reported once and its end after the silence."""
+    vad = StreamingVad(min_silence_duration_ms=500)
+    for chunk in chunks(read_example_audio()):
+        vad.process(chunk)
+
+    assert vad.consume_new_speech()
+    assert not vad.consume_new_speech()
+
+    for chunk in chunks(bytes(BYTES_PER_SECOND * 2)):
+        vad.process(chunk)
+
+    assert vad.consume_speech_end()
+    assert not vad.in_speech
+
+    vad.consume_new_speech()
+    for chunk in chunks(bytes(BYTES_PER_SECOND)):
+        vad.process(chunk)
+
+    assert not vad.consume_new_speech()
+    assert not vad.consume_speech_end()
+
+
+def test_silence_has_no_speech():
+    """Tests that silence never counts as speech."""
+    vad = StreamingVad()
+    # Odd chunk sizes split samples and frames
+    silence = bytes(BYTES_PER_SECOND * 2)
+    for i in range(0, len(silence), 1001):
+        vad.process(silence[i : i + 1001])
+
+    assert not vad.consume_new_speech()
+    assert not vad.consume_speech_end()
+
+
+def test_stream_skips_partials_without_speech():
+    """Tests that a stream of silence does not run the model."""
+    transcriber = Mock()
+    transcriber.transcribe = AsyncMock(return_value=[])
+    stream = Stream(transcriber, 1, export_audio=False, vad_options={})
+
+    messages = [{"bytes": chunk} for chunk in chunks(bytes(BYTES_PER_SECOND * 4))]
+    websocket = Mock(client_state=WebSocketState.CONNECTED)
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        raise WebSocketDisconnect()
+
+    websocket.receive = receive
+    websocket.close = AsyncMock()
+
+    asyncio.run(stream.echo(websocket))
+
+    transcriber.transcribe.assert_not_called()
+    assert stream.get_stats()["partials"] == 0
+    assert stream.get_stats()["skipped_partials"] >= 3
@@ -117,10 +117,51 @@ def test_websocket_server_initialization():
 def test_websocket_server_transcribers(mock_for_cpu):
     server = WebSocketServer(config=MOCK_CONFIG)
     mock_for_cpu.assert_called_once_with(
-        model_name="tiny", cpu_threads=1, num_workers=1
+        model_name="tiny",
+        cpu_threads=1,
+        num_workers=1,
+        mode="default",
+        batch_size=16,
+        batch_wait_ms=50,
     )
     assert server.cpu_transcriber is not None
 
+@patch(
+    "src.websocket.stream_transcriber.Transcriber.for_cpu",
+    return_value=Mock(recent_latency=0.0),
+)
+@patch(
+    "src.websocket.stream_transcriber.Transcriber.for_gpu",
+    side_effect=lambda **kwargs: Mock(recent_latency=0.0),
+)
+def test_websocket_server_routes_to_least_loaded_gpu(mock_for_gpu, mock_for_cpu):
+    config = {
+        "websocket_stream": {
+            **MOCK_CONFIG["websocket_stream"],
+            "cuda": {**MOCK_CONFIG["websocket_stream"]["cuda"], "active": True, "device_index": [0, 1], "worker_seats": 2},
+        }
+    }
+    server = WebSocketServer(config=config)
+    assert [call.kwargs["device_index"] for call in mock_for_gpu.call_args_list] == [0, 1]
+    assert server.admission_queue.free_seats == {"gpu:0": 2, "gpu:1": 2, "cpu": 1}
+
+    # gpu:1 has a stream already, one more means 2 * 0.2 s compared to 1 * 0.5 s
+    server.transcribers["gpu:0"].recent_latency = 0.5
+    server.transcribers["gpu:1"].recent_latency = 0.2
+    server.admission_queue.free_seats.update({"gpu:0": 2, "gpu:1": 1})
+    assert server.admission_queue._take_free_seat() == "gpu:1"
+    # gpu:0 has a stream already, one more means 2 * 0.1 s compared to 1 * 0.3 s
+    server.transcribers["gpu:0"].recent_latency = 0.1
+    server.transcribers["gpu:1"].recent_latency = 0.3
+    server.admission_queue.free_seats.update({"gpu:0": 1, "gpu:1": 2})
+    assert server.admission_queue._take_free_seat() == "gpu:0"
+    # Without latencies the device with fewer streams is used
+    server.transcribers["gpu:0"].recent_latency = 0.0
+    server.transcribers["gpu:1"].recent_latency = 0.0
+    server.admission_queue.free_seats.update({"gpu:0": 1, "gpu:1": 2})
+    assert server.admission_queue._take_free_seat() == "gpu:1"
+
+
 def test_invalid_apikey_auth_should_fail():
     client = TestClient(app)
 
@@ -0,0 +1,200 @@
+"""This File contains tests for the multi process mode of the WebSocket API."""
+
+import asyncio
+import json
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+import pytest
+import uvicorn
+from websockets.asyncio.client import connect
+from websockets.asyncio.server import unix_serve
+
+from src.helper.config import CONFIG
+from src.websocket import worker_pool
+from src.websocket.admission_queue import WAITING_MESSAGE
+from src.websocket.worker_pool import (
+    ConnectionRouter,
+    Worker,
+    wait_for_workers,
+    worker_stream_config,
+)
+
+STREAM_CONFIG = {
+    "export_audio": True,
+    "workers": [{"device": "cuda", "device_index": 1}],
+    "cpu": {"active": True, "model": "tiny", "cpu_threads": 4, "worker_seats": 1},
+    "cuda": {
+        "active": False,
+        "model": "large-v3",
+        "device_index": 0,
+        "worker_seats": 4,
+    },
+}
+
+
+def test_worker_stream_config_activates_only_its_device():
+    """Tests that a worker runs the overridden settings of its device only."""
+    config = worker_stream_config(STREAM_CONFIG, {"device": "cuda", "device_index": 1})
+
+    assert "workers" not in config
+    assert config["cuda"] == {
+        "active": True,
+        "model": "large-v3",
+        "device_index": 1,
+        "worker_seats": 4,
+    }
+    assert config["cpu"]["active"] is False
+    assert config["export_audio"] is True
+    # The shared config is not changed
+    assert STREAM_CONFIG["cuda"]["device_index"] == 0
+
+
+def test_new_clients_go_to_the_worker_with_most_free_seats():
+    """Tests that new clients go to the worker with the most free seats."""
+    router = ConnectionRouter([Worker("a", 1), Worker("b", 2)])
+
+    seats = [router.admission_queue._take_free_seat() for _ in range(4)]
+    assert seats == ["1", "0", "1", None]
+
+
+API_KEY = json.dumps({"Authorization": CONFIG["api_keys"][0]})
+
+
+async def start_worker_server(socket_path: str, name: str):
+    """Fake worker that answers its name and then echoes the messages."""
+
+    async def handler(connection):
+        await connection.recv()
+        await connection.send(name)
+        async for message in connection:
+            await connection.send(message)
+
+    return await unix_serve(handler, socket_path)
+
+
+async def start_router(router: ConnectionRouter) -> tuple:
+    server = uvicorn.Server(
+        uvicorn.Config(router.app, host="127.0.0.1", port=0, log_config=None)
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task, server.servers[0].sockets[0].getsockname()[1]
+
+
+async def connect_client(port: int, api_key: str = API_KEY):
+    client = await connect(f"ws://127.0.0.1:{port}/")
+    await client.send(api_key)
+    return client
+
+
+async def seats_returned(router: ConnectionRouter) -> None:
+    while router.admission_queue.free_seats != {"0": 1, "1": 1}:
+        await asyncio.sleep(0.01)
+
+
+def test_seats_are_admitted_globally():
+    """Tests that a seat freed on any worker goes to the first waiting client."""
+
+    async def run(directory):
+        paths = [os.path.join(directory, f"{index}.sock") for index in range(2)]
+        workers = [
+            await start_worker_server(path, f"worker {index}")
+            for index, path in enumerate(paths)
+        ]
+        router = ConnectionRouter([Worker(path, 1) for path in paths])
+        server, task, port = await start_router(router)
+
+        first, second = await connect_client(port), await connect_client(port)
+        first_worker, second_worker = await first.recv(), await second.recv()
+        assert sorted([first_worker, second_worker]) == ["worker 0", "worker 1"]
+        third, fourth = await connect_client(port), await connect_client(port)
+        assert await third.recv() == WAITING_MESSAGE.format(position=1)
+        assert await fourth.recv() == WAITING_MESSAGE.format(position=2)
+
+        # Clients with an invalid api key do not take a seat
+        rejected = await connect_client(port, json.dumps({"Authorization": "-"}))
+        assert await rejected.recv() == "Provided api key is invalid"
+
+        # The seat of the second client goes to the first waiting client, although
+        # nobody waited for its worker in particular
+        await second.close()
+        assert await third.recv() == second_worker
+        assert await fourth.recv() == WAITING_MESSAGE.format(position=1)
+        await third.send("hello")
+        assert await third.recv() == "hello"
+
+        for client in [first, third, fourth]:
+            await client.close()
+        # Every seat is returned once the clients left
+        await asyncio.wait_for(seats_returned(router), 5)
+        server.should_exit = True
+        await task
+        for worker in workers:
+            worker.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(directory))
+
+
+def process(alive: bool) -> Mock:
+    return Mock(is_alive=Mock(return_value=alive), exitcode=None if alive else 1)
+
+
+def test_wait_for_workers_fails_if_a_worker_exits():
+    """Tests that a worker exiting while it loads its model fails at once."""
+    workers = [Worker("/non_existing/a.sock", 1, process(True))]
+    workers.append(Worker("/non_existing/b.sock", 1, process(False)))
+
+    with pytest.raises(RuntimeError, match="worker 1 exited with code 1"):
+        wait_for_workers(workers)
+
+
+def test_exited_workers_are_restarted():
+    """Tests that an exited worker is restarted with its config and socket."""
+    config = {"cpu": {"active": True}}
+    router = ConnectionRouter(
+        [
+            Worker("a.sock", 1, process(True)),
+            Worker("b.sock", 1, process(False), config),
+        ]
+    )
+    restarted = process(True)
+
+    with patch.object(worker_pool, "start_worker", return_value=restarted) as start:
+        router.restart_exited_workers()
+
+    start.assert_called_once_with(config, "b.sock")
+    assert router.workers[1] == Worker("b.sock", 1, restarted, config)
+
+
+def test_restarting_worker_gets_no_clients():
+    """Tests that clients go to workers that listen on their socket first."""
+    with tempfile.TemporaryDirectory() as directory:
+        listening = os.path.join(directory, "a.sock")
+        open(listening, "w").close()
+        router = ConnectionRouter(
+            [
+                Worker(listening, 1, process(True)),
+                Worker(os.path.join(directory, "b.sock"), 4, process(True)),
+            ]
+        )
+        seats = [router.admission_queue._take_free_seat() for _ in range(3)]
+        assert seats == ["0", "1", "1"]
+
+
+def test_socket_dir_is_removed_on_exit():
+    """Tests that the router removes the sockets of its workers when it exits."""
+    socket_dir = tempfile.mkdtemp()
+    stream_config = {**STREAM_CONFIG, "workers": [{"device": "cpu"}]}
+
+    with (
+        patch.object(worker_pool.tempfile, "mkdtemp", return_value=socket_dir),
+        patch.object(worker_pool, "start_worker", return_value=process(False)),
+    ):
+        with pytest.raises(RuntimeError):
+            worker_pool.run_websocket_workers(8394, "127.0.0.1", stream_config)
+
+    assert not os.path.exists(socket_dir)
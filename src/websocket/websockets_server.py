@@ -1,18 +1,21 @@
 """Module to handle the WebSocket server"""
 
-import asyncio
-import json
 import logging
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 
 from src.helper.config import CONFIG
+from src.websocket.admission_queue import (
+    QUEUE_FULL_MESSAGE,
+    QUEUE_POSITION_UPDATE_SECONDS,
+    WAITING_MESSAGE,
+    AdmissionQueue,
+    QueueFullError,
+)
+from src.websocket.authentication import receive_authentication
 from src.websocket.stream import Stream
 from src.websocket.stream_transcriber import Transcriber
 
-GET_WORKER_RETRY_TIME_SECONDS = 10
-WAITING_MESSAGE = f"No transcription workers available. Retrying in {GET_WORKER_RETRY_TIME_SECONDS} seconds"
-
 LOGGER = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -24,21 +27,40 @@ class WebSocketServer:
     gpu_config: dict = None
     cpu_config: dict = None
 
-    gpu_transcriber: Transcriber = None
+    gpu_transcriber: Transcriber = None  # Transcriber of the first GPU
     cpu_transcriber: Transcriber = None
 
-    gpu_worker_seats: int = 0  # Counts available GPU worker seats
-    cpu_worker_seats: int = 0  # Counts available CPU worker seats
+    gpu_worker_seats: int = 0  # Number of worker seats of each GPU
+    cpu_worker_seats: int = 0  # Number of CPU worker seats
+
+    # Transcriber and seats of each seat pool, one pool per GPU and one for the CPU
+    transcribers: dict = None
+    pool_seats: dict = None
 
     stream_counter: int = 0
 
+    # Hands out the worker seats to the clients in order of their arrival
+    admission_queue: AdmissionQueue = None
+
+    # Whether the audio of a stream is exported next to its transcript
+    export_audio: bool = True
+
+    # Options of the VAD of each stream, None if it is not active
+    vad_options: dict = None
+
     def __init__(self, config: dict = CONFIG):
+        self.export_audio = config["websocket_stream"].get("export_audio", True)
+        vad_config = dict(config["websocket_stream"].get("vad") or {})
+        if vad_config.pop("active", False):
+            self.vad_options = vad_config
         self.gpu_config = config["websocket_stream"]["cuda"]
         LOGGER.info(f"GPU Config: {self.gpu_config}")
         self.cpu_config = config["websocket_stream"]["cpu"]
         LOGGER.info(f"CPU Config: {self.cpu_config}")
+        self.transcribers = {}
+        self.pool_seats = {}
 
-        # Setup GPU Transcriber
+        # Setup GPU Transcribers, one per device
         if self.gpu_config["active"]:
             if not all(
                 key in list(self.gpu_config.keys())
@@ -46,14 +68,21 @@ class WebSocketServer:
             ):
                 LOGGER.warning("GPU Config is not set correctly")
                 raise ValueError("GPU Config is not set correctly")
-            self.gpu_transcriber = Transcriber.for_gpu(
-                model_name=self.gpu_config["model"],
-                device_index=self.gpu_config["device_index"],
-            )
+            device_indexes = self.gpu_config["device_index"]
+            if not isinstance(device_indexes, list):
+                device_indexes = [device_indexes]
             self.gpu_worker_seats = self.gpu_config["worker_seats"]
-            LOGGER.info(
-                f"GPU Stream Transcriber is active, Worker Seats: {self.gpu_worker_seats}"
-            )
+            for device_index in device_indexes:
+                self.transcribers[f"gpu:{device_index}"] = Transcriber.for_gpu(
+                    model_name=self.gpu_config["model"],
+                    device_index=device_index,
+                    **WebSocketServer.batching_options(self.gpu_config),
+                )
+                self.pool_seats[f"gpu:{device_index}"] = self.gpu_worker_seats
+                LOGGER.info(
+                    f"GPU {device_index} Stream Transcriber is active, Worker Seats: {self.gpu_worker_seats}"
+                )
+            self.gpu_transcriber = self.transcribers[f"gpu:{device_indexes[0]}"]
 
         # Setup CPU Transcriber
         if self.cpu_config["active"]:
@@ -67,36 +96,42 @@ class WebSocketServer:
                 model_name=self.cpu_config["model"],
                 cpu_threads=self.cpu_config["cpu_threads"],
                 num_workers=self.cpu_config["worker_seats"],
+                **WebSocketServer.batching_options(self.cpu_config),
             )
             self.cpu_worker_seats = self.cpu_config["worker_seats"]
+            self.transcribers["cpu"] = self.cpu_transcriber
+            self.pool_seats["cpu"] = self.cpu_worker_seats
             LOGGER.info(
                 f"CPU Stream Transcriber is active, Worker Seats: {self.cpu_worker_seats}"
             )
 
-    async def authenticate_new_client(self, websocket: WebSocket) -> bool:
-        msg = await websocket.receive()
-
-        if "text" not in msg:
-            LOGGER.info("Initial websocket message was not string")
-            await websocket.send_text("Initial message was not text and therefore did not match the expected auth format")
-            return False
+        self.admission_queue = AdmissionQueue(
+            self.pool_seats,
+            max_queue_size=config["websocket_stream"].get("max_queue_size", 100),
+            rank=self.rank_pool,
+        )
 
-        msg = msg["text"]
-        authenticated = False
-        try:
-            data = json.loads(msg)
-            if data["Authorization"] in CONFIG["api_keys"]:
-                authenticated = True
-        except Exception:
-            LOGGER.info("Initial websocket message was invalid json")
-            await websocket.send_text("Initial websocket message contained invalid json")
-            return False
+    def rank_pool(self, pool: str) -> tuple:
+        """Orders the pools with free seats for a new stream, the lowest is used"""
+        active_streams = self.pool_seats[pool] - self.admission_queue.free_seats[pool]
+        # GPUs before the CPU, then the device a new stream has to share the least
+        return (
+            pool == "cpu",
+            (active_streams + 1) * self.transcribers[pool].recent_latency,
+            active_streams,
+        )
 
-        if not authenticated:
-            await websocket.send_text("Provided api key is invalid")
-            return False
+    @staticmethod
+    def batching_options(device_config: dict) -> dict:
+        """Returns the transcription mode and batching settings of a device config"""
+        return {
+            "mode": device_config.get("transcription_mode", "default"),
+            "batch_size": device_config.get("batch_size", 16),
+            "batch_wait_ms": device_config.get("batch_wait_ms", 50),
+        }
 
-        return True
+    async def authenticate_new_client(self, websocket: WebSocket) -> bool:
+        return await receive_authentication(websocket) is not None
 
     async def handle_new_client(self, websocket: WebSocket):
         """Function to handle a new client connection"""
@@ -106,59 +141,40 @@ class WebSocketServer:
             f"New client connected: {websocket.client}, Stream ID: {client_id}"
         )
 
-        searching = True
-        while searching:
-            if self.gpu_transcriber and self.gpu_worker_seats > 0:
-                self.gpu_worker_seats -= 1
-                LOGGER.debug(f"Client {client_id} is using GPU worker")
-                searching = False
-                try:
-                    await Stream(
-                        transcriber=self.gpu_transcriber, 
-                        id=client_id,
-                    ).echo(
-                        websocket=websocket
-                    )
-                except Exception as e:
-                    LOGGER.error(
-                        f"Client {client_id} disconnected with an exception while using a worker: {e}"
-                    )
-                finally:
-                    self.gpu_worker_seats += 1
-                    LOGGER.debug(f"Client {client_id} returned GPU worker")
-
-            elif self.cpu_transcriber and self.cpu_worker_seats > 0:
-                self.cpu_worker_seats -= 1
-                LOGGER.debug(f"Client {client_id} is using CPU worker")
-                searching = False
-                try:
-                    await Stream(
-                        transcriber=self.cpu_transcriber, 
-                        id=client_id,
-                    ).echo(
-                        websocket=websocket
-                    )
-                except Exception as e:
-                    LOGGER.warning(
-                        f"Client {client_id} disconnected with an exception while using a worker: {e}"
-                    )
-                finally:
-                    self.cpu_worker_seats += 1
-                    LOGGER.debug(f"Client {client_id} returned CPU worker")
-
-            if searching:
-                try:
-                    await websocket.send_text(WAITING_MESSAGE)
-                except WebSocketDisconnect:
-                    LOGGER.debug(
-                        f"Client {client_id} disconnected while waiting for a worker"
-                    )
-                    return
-
-                LOGGER.debug(
-                    f"Client {client_id} is waiting for a worker, available seats - GPU: {self.gpu_worker_seats}, CPU: {self.cpu_worker_seats}"
-                )
-                await asyncio.sleep(GET_WORKER_RETRY_TIME_SECONDS)
+        async def send_position(position: int):
+            LOGGER.debug(
+                f"Client {client_id} is waiting for a worker at position {position}"
+            )
+            await websocket.send_text(WAITING_MESSAGE.format(position=position))
+
+        try:
+            pool = await self.admission_queue.acquire(
+                send_position, QUEUE_POSITION_UPDATE_SECONDS
+            )
+        except QueueFullError:
+            LOGGER.info(f"Client {client_id} rejected, the queue is full")
+            await websocket.send_text(QUEUE_FULL_MESSAGE)
+            await websocket.close()
+            return
+        except WebSocketDisconnect:
+            LOGGER.debug(f"Client {client_id} disconnected while waiting for a worker")
+            return
+
+        LOGGER.debug(f"Client {client_id} is using {pool.upper()} worker")
+        try:
+            await Stream(
+                transcriber=self.transcribers[pool],
+                id=client_id,
+                export_audio=self.export_audio,
+                vad_options=self.vad_options,
+            ).echo(websocket=websocket)
+        except Exception as e:
+            LOGGER.warning(
+                f"Client {client_id} disconnected with an exception while using a worker: {e}"
+            )
+        finally:
+            self.admission_queue.release(pool)
+            LOGGER.debug(f"Client {client_id} returned {pool.upper()} worker")
 
 
 # Initialize WebSocketServer
@@ -0,0 +1,291 @@
+"""This module contains the multi process mode of the WebSocket API."""
+
+import asyncio
+import copy
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import List, NamedTuple
+
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from websockets.asyncio.client import ClientConnection, unix_connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+from src.helper.config import CONFIG
+from src.websocket.admission_queue import (
+    QUEUE_FULL_MESSAGE,
+    QUEUE_POSITION_UPDATE_SECONDS,
+    WAITING_MESSAGE,
+    AdmissionQueue,
+    QueueFullError,
+)
+from src.websocket.authentication import receive_authentication
+
+LOGGER = logging.getLogger(__name__)
+
+# How long the router waits for the workers to load their models
+WORKER_STARTUP_TIMEOUT_SECONDS = 600
+
+# How often the router checks that its workers are still running
+WORKER_CHECK_INTERVAL_SECONDS = 5
+
+
+def worker_stream_config(stream_config: dict, worker: dict) -> dict:
+    """
+    Builds the websocket_stream config of a single worker process.
+
+    The worker runs only the transcriber of its device, its settings are the ones of
+    the cpu or cuda section overridden by the keys of the worker entry.
+    """
+    device = worker["device"]
+    if device not in ["cpu", "cuda"]:
+        raise ValueError(f"Websocket worker device must be cpu or cuda, not {device}")
+    config = copy.deepcopy(stream_config)
+    config.pop("workers", None)
+    other_device = "cuda" if device == "cpu" else "cpu"
+    config[device] = {
+        **config[device],
+        **{key: value for key, value in worker.items() if key != "device"},
+        "active": True,
+    }
+    config[other_device] = {**config[other_device], "active": False}
+    return config
+
+
+def worker_seats(device_config: dict) -> int:
+    """Seats of a worker, the seats of a cuda config are per GPU."""
+    device_index = device_config.get("device_index")
+    devices = len(device_index) if isinstance(device_index, list) else 1
+    return device_config["worker_seats"] * devices
+
+
+def run_worker(stream_config: dict, socket_path: str) -> None:
+    """Runs a websocket worker process on a unix socket."""
+    # Set before the server module is imported, it creates its transcribers on import
+    CONFIG["websocket_stream"] = stream_config
+    uvicorn.run(
+        "src.websocket.websockets_server:app",
+        uds=socket_path,
+        log_level="info",
+    )
+
+
+def start_worker(stream_config: dict, socket_path: str) -> multiprocessing.Process:
+    """Starts a worker process, the socket of a previous process is removed first."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    process = multiprocessing.Process(
+        target=run_worker, args=(stream_config, socket_path), daemon=True
+    )
+    process.start()
+    return process
+
+
+class Worker(NamedTuple):
+    socket_path: str
+    seats: int
+    process: multiprocessing.Process | None = None
+    # The websocket_stream config of the process, to restart it
+    config: dict | None = None
+
+
+class ConnectionRouter:
+    """
+    Admits the websocket clients to the seats of the worker processes.
+
+    The router authenticates a client and queues it in one AdmissionQueue whose pools
+    are the workers. The clients of all workers are therefore served first come, first
+    served, and a seat that frees on any worker goes to the first waiting client. Only
+    then the router connects to the worker of the seat and relays the messages in both
+    directions, so the worker has a free seat for the client right away. New clients
+    go to the running worker with the most free seats. Workers that exit are
+    restarted, they get clients again once they listen on their socket.
+    """
+
+    def __init__(self, workers: List[Worker], max_queue_size: int = 100):
+        self.workers = workers
+        self.admission_queue = AdmissionQueue(
+            {str(index): worker.seats for index, worker in enumerate(workers)},
+            max_queue_size=max_queue_size,
+            rank=self.rank_worker,
+        )
+        self.client_counter = 0
+        self.app = FastAPI()
+        self.app.add_api_websocket_route("/", self.handle_client)
+        self.app.add_api_route(
+            "/health", health_check, methods=["GET", "OPTIONS"], include_in_schema=False
+        )
+
+    def is_running(self, index: int) -> bool:
+        """Whether a worker is running and listens on its socket."""
+        worker = self.workers[index]
+        return worker.process is None or (
+            worker.process.is_alive() and os.path.exists(worker.socket_path)
+        )
+
+    def rank_worker(self, pool: str) -> tuple:
+        """Orders the workers with a free seat for a new client, the lowest is used."""
+        return (not self.is_running(int(pool)), -self.admission_queue.free_seats[pool])
+
+    async def handle_client(self, websocket: WebSocket) -> None:
+        await websocket.accept()
+        self.client_counter += 1
+        client_id = self.client_counter
+        try:
+            auth_message = await receive_authentication(websocket)
+            if auth_message is None:
+                await websocket.close()
+                LOGGER.info("Client disconnected due to invalid auth")
+                return
+
+            async def send_position(position: int):
+                LOGGER.debug(
+                    f"Client {client_id} is waiting for a worker at position {position}"
+                )
+                await websocket.send_text(WAITING_MESSAGE.format(position=position))
+
+            try:
+                pool = await self.admission_queue.acquire(
+                    send_position, QUEUE_POSITION_UPDATE_SECONDS
+                )
+            except QueueFullError:
+                LOGGER.info(f"Client {client_id} rejected, the queue is full")
+                await websocket.send_text(QUEUE_FULL_MESSAGE)
+                await websocket.close()
+                return
+
+            LOGGER.debug(f"Client {client_id} is using websocket worker {pool}")
+            try:
+                await self.relay(websocket, int(pool), auth_message)
+            finally:
+                self.admission_queue.release(pool)
+        except WebSocketDisconnect:
+            LOGGER.debug(f"Client {client_id} disconnected")
+
+    async def relay(self, websocket: WebSocket, index: int, auth_message: str) -> None:
+        """Relays the messages between a client and a worker until one of them leaves."""
+        try:
+            worker = await unix_connect(
+                self.workers[index].socket_path, uri="ws://localhost/", compression=None
+            )
+        except (OSError, WebSocketException) as e:
+            LOGGER.error(f"Could not connect to websocket worker {index}: {e}")
+            await websocket.close(code=1011)
+            return
+
+        async with worker:
+            await worker.send(auth_message)
+            directions = [
+                asyncio.ensure_future(ConnectionRouter._to_worker(websocket, worker)),
+                asyncio.ensure_future(ConnectionRouter._to_client(worker, websocket)),
+            ]
+            try:
+                done, _ = await asyncio.wait(
+                    directions, return_when=asyncio.FIRST_COMPLETED
+                )
+                for direction in done:
+                    direction.result()
+            finally:
+                for direction in directions:
+                    direction.cancel()
+
+    @staticmethod
+    async def _to_worker(websocket: WebSocket, worker: ClientConnection) -> None:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes") is not None:
+                    await worker.send(message["bytes"])
+                elif message.get("text") is not None:
+                    await worker.send(message["text"])
+        except ConnectionClosed:
+            pass
+
+    @staticmethod
+    async def _to_client(worker: ClientConnection, websocket: WebSocket) -> None:
+        try:
+            async for message in worker:
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+            # The worker closed the stream, e.g. after the eof message of the client
+            await websocket.close()
+        except (ConnectionClosed, WebSocketDisconnect):
+            pass
+
+    def restart_exited_workers(self) -> None:
+        """Starts a new process for every worker whose process exited."""
+        for index, worker in enumerate(self.workers):
+            if worker.process is None or worker.process.is_alive():
+                continue
+            LOGGER.error(
+                f"Websocket worker {index} exited with code "
+                + f"{worker.process.exitcode}, restarting it"
+            )
+            self.workers[index] = worker._replace(
+                process=start_worker(worker.config, worker.socket_path)
+            )
+
+    async def monitor_workers(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL_SECONDS)
+            self.restart_exited_workers()
+
+    async def serve(self, host: str, port: int) -> None:
+        monitor = asyncio.create_task(self.monitor_workers())
+        try:
+            await uvicorn.Server(
+                uvicorn.Config(self.app, host=host, port=port, log_config=None)
+            ).serve()
+        finally:
+            monitor.cancel()
+
+
+async def health_check():
+    return {"status": "ok"}
+
+
+def wait_for_workers(workers: List[Worker]) -> None:
+    """Waits until every worker listens on its socket, i.e. loaded its model."""
+    deadline = time.time() + WORKER_STARTUP_TIMEOUT_SECONDS
+    while not all(os.path.exists(worker.socket_path) for worker in workers):
+        for index, worker in enumerate(workers):
+            if worker.process is not None and not worker.process.is_alive():
+                raise RuntimeError(
+                    f"Websocket worker {index} exited with code "
+                    + f"{worker.process.exitcode} while loading its model"
+                )
+        if time.time() > deadline:
+            raise TimeoutError("Websocket workers did not start in time")
+        time.sleep(0.5)
+
+
+def run_websocket_workers(websocket_port: int, host: str, stream_config: dict) -> None:
+    """Starts a worker process per configured worker and routes the clients to them."""
+    socket_dir = tempfile.mkdtemp(prefix="melvin-websocket-")
+    try:
+        workers = []
+        for index, worker in enumerate(stream_config["workers"]):
+            config = worker_stream_config(stream_config, worker)
+            socket_path = os.path.join(socket_dir, f"worker-{index}.sock")
+            process = start_worker(config, socket_path)
+            workers.append(
+                Worker(
+                    socket_path, worker_seats(config[worker["device"]]), process, config
+                )
+            )
+            LOGGER.info(f"Started websocket worker {index} on {worker}")
+
+        wait_for_workers(workers)
+        LOGGER.info(f"Routing websocket clients on '{host}:{websocket_port}'")
+        router = ConnectionRouter(workers, stream_config.get("max_queue_size", 100))
+        asyncio.run(router.serve(host, websocket_port))
+    finally:
+        shutil.rmtree(socket_dir, ignore_errors=True)
@@ -0,0 +1,132 @@
+import argparse
+import json
+import statistics
+import time
+
+from src.helper.align_translation_segments import (
+    align_segments,
+    proportional_word_bounds,
+)
+
+
+def synthetic_transcript(words, words_per_segment=12):
+    # Stands in for a long lecture, e.g. the example-big-en.json transcript
+    segments = []
+    for first in range(0, words, words_per_segment):
+        segment_words = [
+            {
+                "text": f"word{i}",
+                "start": i * 0.3,
+                "end": i * 0.3 + 0.25,
+                "probability": 0.9,
+            }
+            for i in range(first, min(words, first + words_per_segment))
+        ]
+        segments.append(
+            {
+                "text": " ".join(word["text"] for word in segment_words),
+                "start": segment_words[0]["start"],
+                "end": segment_words[-1]["end"],
+                "words": segment_words,
+            }
+        )
+    return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+
+def load_transcript(path):
+    with open(path, "r") as file:
+        data = json.load(file)
+    return data.get("transcript", data)
+
+
+def two_pointer_owners(original_count, translated_count):
+    # Previous mapping: walk both word lists and compare their fraction ranges
+    owners = []
+    i = j = 0
+    while i < original_count and j < translated_count:
+        i_start, i_end = i / original_count, (i + 1) / original_count
+        j_start, j_end = j / translated_count, (j + 1) / translated_count
+        overlap = min(i_end, j_end) - max(i_start, j_start)
+        if overlap > 0:
+            owners.append(i)
+            j += 1
+        if i_end <= j_end:
+            i += 1
+        if i_end >= j_end and overlap <= 0:
+            j += 1
+    return owners
+
+
+def measure(function, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def print_result(name, durations):
+    print(
+        f"{name:<28} median {statistics.median(durations):8.2f} ms, "
+        + f"max {max(durations):8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark align_segments")
+    parser.add_argument(
+        "--transcript",
+        help="JSON transcript (or status file with a transcript), default synthetic",
+    )
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument(
+        "--ratio",
+        type=float,
+        default=1.15,
+        help="translated words per original word",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    transcript = (
+        load_transcript(args.transcript)
+        if args.transcript
+        else synthetic_transcript(args.words)
+    )
+    words = sum(len(segment["words"]) for segment in transcript["segments"])
+    translated_count = max(1, round(words * args.ratio))
+    translated_text = " ".join(f"wort{i}" for i in range(translated_count))
+    print(
+        f"{words} original words in {len(transcript['segments'])} segments, "
+        + f"{translated_count} translated words"
+    )
+
+    print_result(
+        "two pointer mapping",
+        measure(lambda: two_pointer_owners(words, translated_count), args.repeats),
+    )
+    print_result(
+        "searchsorted mapping",
+        measure(
+            lambda: proportional_word_bounds(words, translated_count), args.repeats
+        ),
+    )
+    print_result(
+        "full alignment",
+        measure(lambda: align_segments(transcript, translated_text), args.repeats),
+    )
+
+    def segmented():
+        # Like Runner.translate with the segmented method
+        for segment in transcript["segments"]:
+            text = " ".join(
+                f"wort{i}" for i in range(round(len(segment["words"]) * args.ratio))
+            )
+            align_segments({"segments": [segment]}, text or "wort")
+
+    print_result("segmented alignment", measure(segmented, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+BASE_URL = "http://localhost:8393"
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def probe_health(api_key, stop, latencies, interval):
+    # Latency of the cheapest endpoint shows how long requests wait for the event loop
+    while not stop.is_set():
+        start = time.perf_counter()
+        requests.get(f"{BASE_URL}/health", headers={"Authorization": api_key})
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+
+
+def upload_loop(filepath, api_key, stop, upload_durations):
+    while not stop.is_set():
+        start = time.perf_counter()
+        with open(filepath, "rb") as f:
+            r = requests.post(
+                f"{BASE_URL}/transcriptions",
+                files={"file": f},
+                headers={"Authorization": api_key},
+            )
+        if r.status_code != 200:
+            print(f"Upload failed with {r.status_code}: {r.text}")
+        upload_durations.append(time.perf_counter() - start)
+
+
+def measure(settings, uploads):
+    stop = threading.Event()
+    latencies = []
+    upload_durations = []
+    threads = [
+        threading.Thread(
+            target=probe_health,
+            args=(settings.api_key, stop, latencies, settings.interval),
+        )
+    ]
+    threads += [
+        threading.Thread(
+            target=upload_loop,
+            args=(settings.file, settings.api_key, stop, upload_durations),
+        )
+        for _ in range(uploads)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(settings.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, upload_durations
+
+
+def print_result(name, latencies, upload_durations):
+    print(f"----- {name} -----")
+    print(f"health requests: {len(latencies)}")
+    print(f"health p50: {percentile(latencies, 50):.1f} ms")
+    print(f"health p99: {percentile(latencies, 99):.1f} ms")
+    print(f"health max: {max(latencies):.1f} ms")
+    if upload_durations:
+        print(
+            f"uploads: {len(upload_durations)}, mean duration {statistics.mean(upload_durations):.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "melvin-load-benchmark",
+        description="Measures the latency of GET /health of the rest api while large uploads are in flight",
+    )
+    parser.add_argument(
+        "--file", "-f", required=True, help="Audio file that is uploaded repeatedly"
+    )
+    parser.add_argument(
+        "--uploads",
+        "-u",
+        type=int,
+        default=4,
+        help="Number of concurrent uploads during the load phase",
+    )
+    parser.add_argument(
+        "--duration",
+        "-d",
+        type=float,
+        default=30,
+        help="Seconds each phase (idle and load) runs",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.05,
+        help="Seconds between two health requests",
+    )
+    parser.add_argument(
+        "--api-key",
+        default="shuffle2024",
+        help="Set api key to be used. The default value should work fine for local dev",
+    )
+    settings = parser.parse_args()
+
+    print_result("IDLE", *measure(settings, 0))
+    print_result(f"{settings.uploads} UPLOADS IN FLIGHT", *measure(settings, settings.uploads))
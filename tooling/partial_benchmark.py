@@ -0,0 +1,99 @@
+import argparse
+import io
+import statistics
+import time
+import wave
+
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.feature_extractor import FeatureExtractor
+
+from src.websocket.audio_buffer import AudioRingBuffer
+from src.websocket.feature_cache import CachingFeatureExtractor
+
+SAMPLE_RATE = 16000
+
+
+def wav_decode_input(window: bytes) -> np.ndarray:
+    # Previous path: wrap the window in a WAV container that faster-whisper decodes again
+    with io.BytesIO() as wav_io:
+        with wave.open(wav_io, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(SAMPLE_RATE)
+            wav_file.writeframes(window)
+        wav_io.seek(0)
+        return decode_audio(wav_io, sampling_rate=SAMPLE_RATE)
+
+
+def array_input(buffer: AudioRingBuffer) -> np.ndarray:
+    # Current path: convert the int16 window to float32 once
+    return buffer.get_samples()
+
+
+def partial_windows(samples, repeats):
+    # Consecutive partials of a stream see the same window with one more second of audio
+    step = SAMPLE_RATE
+    length = len(samples)
+    return [samples[: length - step + (i % 2) * step] for i in range(repeats)]
+
+
+def measure_features(extractor, windows):
+    durations = []
+    for window in windows:
+        start = time.perf_counter()
+        extractor(window)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def measure(function, argument, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(argument)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def print_result(name, durations):
+    print(
+        f"{name}: mean {statistics.mean(durations):.3f} ms, "
+        f"median {statistics.median(durations):.3f} ms, max {max(durations):.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        "melvin-partial-benchmark",
+        description="Measures the overhead of preparing the window of a stream partial before the model runs",
+    )
+    parser.add_argument(
+        "--window-seconds",
+        type=float,
+        default=15,
+        help="Length of the sliding window in seconds",
+    )
+    parser.add_argument(
+        "--repeats", "-r", type=int, default=200, help="Number of measured partials"
+    )
+    settings = parser.parse_args()
+
+    samples = int(settings.window_seconds * SAMPLE_RATE)
+    rng = np.random.default_rng(0)
+    window = rng.integers(-32768, 32767, samples, dtype=np.int16).tobytes()
+    buffer = AudioRingBuffer(len(window))
+    buffer.append(window)
+
+    # Both paths have to hand the same audio to the model
+    assert np.allclose(wav_decode_input(window), array_input(buffer), atol=1e-4)
+
+    print(f"window: {settings.window_seconds} s, {settings.repeats} partials")
+    print_result("WAV + decode", measure(wav_decode_input, window, settings.repeats))
+    print_result("float32 array", measure(array_input, buffer, settings.repeats))
+
+    windows = partial_windows(array_input(buffer), settings.repeats)
+    print_result("mel features", measure_features(FeatureExtractor(), windows))
+    print_result(
+        "cached mel features", measure_features(CachingFeatureExtractor(), windows)
+    )
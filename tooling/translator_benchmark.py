@@ -0,0 +1,81 @@
+import argparse
+import multiprocessing
+import resource
+import time
+
+SENTENCES = [
+    "Welcome to the lecture on distributed systems.",
+    "Today we talk about consensus and why it is hard to reach in practice.",
+    "Please remember to submit the exercise sheet before Friday.",
+    "Any questions so far?",
+] * 4
+
+
+def peak_rss_mb():
+    # Linux reports the peak resident set size in KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(config, results):
+    # Runs in its own process, so the peak memory belongs to this variant only
+    start = time.perf_counter()
+    from src.helper.SM4T_translate import Translator
+
+    translator = Translator(config)
+    startup = time.perf_counter() - start
+    startup_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    translator.load()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    translator._translate_batch(SENTENCES, "en", "de")
+    translate = time.perf_counter() - start
+    results.put((startup, startup_rss, load, translate, peak_rss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Startup time and memory of the translator per precision"
+    )
+    parser.add_argument("--model", default="facebook/seamless-m4t-v2-large")
+    parser.add_argument("--device", default="cpu", help="cpu or cuda")
+    parser.add_argument("--device-index", type=int, default=0)
+    args = parser.parse_args()
+
+    variants = [("float32", "none"), ("bfloat16", "none")]
+    if args.device == "cpu":
+        variants.append(("float32", "int8"))
+    else:
+        variants.append(("float16", "none"))
+
+    print(
+        f"{'variant':<16} {'startup':>9} {'startup RSS':>12} "
+        + f"{'first load':>11} {'translate':>10} {'peak RSS':>10}"
+    )
+    context = multiprocessing.get_context("spawn")
+    for dtype, quantization in variants:
+        config = {
+            "translation_model": args.model,
+            "translation_device": args.device,
+            "device_index": args.device_index,
+            "translation_dtype": dtype,
+            "translation_quantization": quantization,
+        }
+        results = context.Queue()
+        process = context.Process(target=run_variant, args=(config, results))
+        process.start()
+        startup, startup_rss, load, translate, rss = results.get()
+        process.join()
+        name = dtype if quantization == "none" else quantization
+        print(
+            f"{name:<16} {startup:>8.2f}s {startup_rss:>9.0f} MB "
+            + f"{load:>10.2f}s {translate:>9.2f}s {rss:>7.0f} MB"
+        )
+    # Before the lazy loading every runner paid "startup + first load" on start
+    # and kept the "peak RSS" of float32 even without translation jobs
+
+
+if __name__ == "__main__":
+    main()